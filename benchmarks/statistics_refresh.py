@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Copyright 2018 Twixes
+
+# This file is part of Somsiad - the Polish Discord bot.
+
+# Somsiad is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# Somsiad is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with Somsiad.
+# If not, see <https://www.gnu.org/licenses/>.
+
+"""Measures how long refreshing the statistics cache of a channel takes depending on the channel's size.
+Uses a temporary storage directory, so the bot's real databases are left untouched.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import datetime as dt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import somsiad
+somsiad.somsiad.storage_dir_path = tempfile.mkdtemp(prefix='somsiad-benchmark-')
+
+from plugins.statistics import Report
+from synthetic_guild import SyntheticGuild
+
+
+CHANNEL_SIZES = (1000, 10000, 100000)
+NEW_MESSAGE_COUNT = 100
+
+
+async def measure(channel_size: int, server_id: int) -> tuple:
+    channel = SyntheticGuild(server_id, channel_size, channel_count=1).text_channels[0]
+    report = Report(None, channel)
+    await report._prepare_statistics_cache(channel.guild, channel)
+
+    start_time = time.perf_counter()
+    await report._update_statistics_cache_for_channel(channel)
+    backfill_time = time.perf_counter() - start_time
+
+    now = dt.datetime.utcnow()
+    channel.send_messages(NEW_MESSAGE_COUNT, now - dt.timedelta(hours=1), now)
+    Report.synced_channel_ids.discard(channel.id)
+    start_time = time.perf_counter()
+    await report._update_statistics_cache_for_channel(channel)
+    refresh_time = time.perf_counter() - start_time
+
+    return backfill_time, refresh_time
+
+
+async def main():
+    print(f'{"Messages":>10} {"Backfill":>12} {f"Refresh (+{NEW_MESSAGE_COUNT})":>16}')
+    for server_id, channel_size in enumerate(CHANNEL_SIZES, 1):
+        backfill_time, refresh_time = await measure(channel_size, server_id)
+        print(f'{channel_size:>10} {backfill_time:>11.3f}s {refresh_time:>15.4f}s')
+
+
+if __name__ == '__main__':
+    asyncio.get_event_loop().run_until_complete(main())
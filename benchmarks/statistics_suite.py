@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# Copyright 2018 Twixes
+
+# This file is part of Somsiad - the Polish Discord bot.
+
+# Somsiad is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# Somsiad is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with Somsiad.
+# If not, see <https://www.gnu.org/licenses/>.
+
+"""Measures every step of the statistics pipeline on synthetic guilds of various sizes
+and saves the results as JSON, so that they can be compared between revisions.
+Uses a temporary storage directory, so the bot's real databases are left untouched.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import calendar
+import platform
+import tempfile
+import datetime as dt
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import somsiad
+somsiad.somsiad.storage_dir_path = tempfile.mkdtemp(prefix='somsiad-benchmark-')
+somsiad.somsiad.cache_dir_path = tempfile.mkdtemp(prefix='somsiad-benchmark-cache-')
+
+from version import __version__
+from server_data import server_data_manager
+from plugins.statistics import Report, TimeWindow
+from synthetic_guild import SyntheticGuild
+
+DEFAULT_MESSAGE_COUNTS = (10000, 100000, 1000000)
+NEW_MESSAGES_PER_CHANNEL = 100
+WINDOW_DAY_COUNT = 30
+
+
+class Stopwatch:
+    """Collects durations of named steps."""
+    def __init__(self):
+        self.durations = {}
+
+    def step(self, name: str) -> 'Stopwatch._Step':
+        return self._Step(self, name)
+
+    class _Step:
+        def __init__(self, stopwatch: 'Stopwatch', name: str):
+            self.stopwatch = stopwatch
+            self.name = name
+            self.start_time = None
+
+        def __enter__(self):
+            self.start_time = time.perf_counter()
+
+        def __exit__(self, *exc_info):
+            self.stopwatch.durations[self.name] = round(time.perf_counter() - self.start_time, 6)
+
+
+def new_report(guild: SyntheticGuild, window: TimeWindow = None) -> Report:
+    """Creates a report about the guild the way Report does for a server, without needing a real Discord guild."""
+    report = Report(None, None, window)
+    report._prepare_active_channels(guild)
+    report._prepare_messages_over_date(guild.created_at)
+    return report
+
+
+async def measure(guild: SyntheticGuild) -> dict:
+    stopwatch = Stopwatch()
+    message_count = guild.message_count
+    report = new_report(guild)
+
+    with stopwatch.step('backfill'):
+        await report._update_statistics_cache(guild)
+    with stopwatch.step('index_flush'):
+        server_data_manager.get_server_db(guild.id).flush()
+
+    Report.statistics_cache.clear()
+    Report.synced_channel_ids.clear()
+    with stopwatch.step('load_from_index'):
+        await report._prepare_statistics_cache(guild)
+
+    guild.send_messages(NEW_MESSAGES_PER_CHANNEL)
+    with stopwatch.step('refresh'):
+        await report._update_statistics_cache(guild)
+
+    channel_caches = Report.statistics_cache[guild.id]
+    with stopwatch.step('aggregate_server'):
+        report._update_statistics(channel_caches)
+
+    busiest_channel = max(guild.text_channels, key=len)
+    with stopwatch.step('aggregate_channel'):
+        new_report(guild)._update_statistics({busiest_channel.id: channel_caches[busiest_channel.id]})
+
+    with stopwatch.step('aggregate_member'):
+        new_report(guild)._update_statistics(channel_caches, author_id=int(guild.author_ids[0]))
+
+    today = dt.date.today()
+    window = TimeWindow(today - dt.timedelta(WINDOW_DAY_COUNT - 1), today)
+    with stopwatch.step('aggregate_server_window'):
+        new_report(guild, window)._update_statistics(channel_caches)
+
+    chart_data = (
+        f'Aktywność na serwerze {guild.name}', report.messages_over_hour, report.messages_over_weekday,
+        report.messages_over_date, list(calendar.day_abbr)
+    )
+    with stopwatch.step('render_chart'):
+        Report.render_activity_chart_png(*chart_data)
+
+    with stopwatch.step('render_chart_in_process'):
+        await Report._render_activity_chart_png_in_process(*chart_data)
+
+    return {
+        'message_count': message_count, 'channel_count': len(guild.text_channels),
+        'author_count': len(guild.author_ids), 'durations_in_seconds': stopwatch.durations
+    }
+
+
+async def main(arguments: argparse.Namespace):
+    Report.warm_up_chart_rendering()
+    results = []
+    for guild_id, message_count in enumerate(arguments.message_counts, 1):
+        guild = SyntheticGuild(
+            guild_id, message_count, channel_count=arguments.channel_count, author_count=arguments.author_count,
+            day_count=arguments.day_count, seed=arguments.seed
+        )
+        result = await measure(guild)
+        results.append(result)
+        print(f'{message_count:>10} messages: ' + ', '.join(
+            f'{step} {duration:.3f} s' for step, duration in result['durations_in_seconds'].items()
+        ))
+        Report.statistics_cache.pop(guild.id, None)
+
+    with open(arguments.output, 'w') as results_file:
+        json.dump({
+            'somsiad_version': __version__, 'python_version': platform.python_version(),
+            'numpy_version': np.__version__, 'platform': platform.platform(),
+            'date': dt.datetime.now().astimezone().isoformat(), 'seed': arguments.seed, 'results': results
+        }, results_file, indent=4)
+    print(f'Results saved to {arguments.output}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'message_counts', nargs='*', type=int, default=DEFAULT_MESSAGE_COUNTS,
+        help='total numbers of messages of synthetic guilds to measure'
+    )
+    parser.add_argument('--channels', dest='channel_count', type=int, default=20)
+    parser.add_argument('--authors', dest='author_count', type=int, default=500)
+    parser.add_argument('--days', dest='day_count', type=int, default=730)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='statistics_benchmark.json')
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
@@ -0,0 +1,111 @@
+# Copyright 2018 Twixes
+
+# This file is part of Somsiad - the Polish Discord bot.
+
+# Somsiad is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# Somsiad is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with Somsiad.
+# If not, see <https://www.gnu.org/licenses/>.
+
+"""Synthetic guilds, channels and message histories for benchmarks.
+Messages are kept column by column and only turned into message-like objects while history is being iterated,
+so that channels with millions of messages fit in memory.
+"""
+
+import datetime as dt
+from types import SimpleNamespace
+import numpy as np
+import discord
+
+DISCORD_EPOCH_IN_MS = 1420070400000
+WORD = 'słowo'
+
+
+class SyntheticChannel:
+    """A text channel stand-in whose history is generated and served from memory."""
+    def __init__(self, guild: 'SyntheticGuild', channel_id: int, author_ids: np.ndarray, random: np.random.RandomState):
+        self.id = channel_id
+        self.name = f'kanał-{channel_id}'
+        self.guild = guild
+        self.created_at = guild.created_at
+        self._author_pool = author_ids
+        self._random = random
+        self._message_ids = np.empty(0, dtype=np.int64)
+        self._author_ids = np.empty(0, dtype=np.int64)
+        self._word_counts = np.empty(0, dtype=np.int64)
+        self._contents = {}
+
+    def __len__(self) -> int:
+        return len(self._message_ids)
+
+    def send_messages(self, count: int, start_datetime: dt.datetime, end_datetime: dt.datetime):
+        """Appends messages sent at random moments between the provided UTC datetimes.
+        Authors are picked with a Zipf-like distribution, so a few of them write most messages.
+        """
+        start_ms = int(start_datetime.replace(tzinfo=dt.timezone.utc).timestamp() * 1000)
+        end_ms = int(end_datetime.replace(tzinfo=dt.timezone.utc).timestamp() * 1000)
+        timestamps_in_ms = np.sort(self._random.randint(start_ms, end_ms, size=count, dtype=np.int64))
+        message_ids = ((timestamps_in_ms - DISCORD_EPOCH_IN_MS) << 22) + np.arange(count, dtype=np.int64) % 4096
+        if len(self._message_ids):
+            message_ids = np.maximum(message_ids, self._message_ids[-1] + 1)
+        # Make IDs strictly increasing even when many messages share a millisecond
+        sequence = np.arange(count, dtype=np.int64)
+        message_ids = np.maximum.accumulate(message_ids - sequence) + sequence
+        author_ranks = np.minimum(self._random.zipf(1.5, size=count) - 1, len(self._author_pool) - 1)
+        self._message_ids = np.concatenate((self._message_ids, message_ids))
+        self._author_ids = np.concatenate((self._author_ids, self._author_pool[author_ranks]))
+        self._word_counts = np.concatenate((self._word_counts, self._random.randint(1, 30, size=count)))
+
+    def _message(self, position: int) -> SimpleNamespace:
+        message_id = int(self._message_ids[position])
+        word_count = int(self._word_counts[position])
+        if word_count not in self._contents:
+            self._contents[word_count] = ' '.join([WORD] * word_count)
+        return SimpleNamespace(
+            id=message_id, type=discord.MessageType.default, author=SimpleNamespace(id=int(self._author_ids[position])),
+            channel=self, created_at=dt.datetime.utcfromtimestamp(((message_id >> 22) + DISCORD_EPOCH_IN_MS) / 1000),
+            clean_content=self._contents[word_count]
+        )
+
+    async def history(self, *, limit: int = None, after: discord.Object = None):
+        start = 0 if after is None else int(np.searchsorted(self._message_ids, after.id, side='right'))
+        end = len(self._message_ids) if limit is None else min(start + limit, len(self._message_ids))
+        for position in range(start, end):
+            yield self._message(position)
+
+
+class SyntheticGuild:
+    """A guild stand-in with text channels of synthetic messages."""
+    def __init__(
+            self, guild_id: int, message_count: int, channel_count: int = 20, author_count: int = 500,
+            day_count: int = 730, seed: int = 0
+    ):
+        self.id = guild_id
+        self.name = f'serwer-{guild_id}'
+        self.created_at = dt.datetime.utcnow() - dt.timedelta(day_count)
+        self.author_ids = np.arange(1, author_count + 1, dtype=np.int64) * 1000 + guild_id
+        self._random = np.random.RandomState(seed)
+        self.text_channels = [
+            SyntheticChannel(self, guild_id * 1000 + channel_number, self.author_ids, self._random)
+            for channel_number in range(channel_count)
+        ]
+        # A few channels take the bulk of the traffic, like on real servers
+        channel_shares = 1 / np.arange(1, channel_count + 1)
+        channel_message_counts = np.floor(channel_shares / channel_shares.sum() * message_count).astype(np.int64)
+        channel_message_counts[0] += message_count - channel_message_counts.sum()
+        for channel, channel_message_count in zip(self.text_channels, channel_message_counts):
+            channel.send_messages(int(channel_message_count), self.created_at, dt.datetime.utcnow())
+
+    @property
+    def message_count(self) -> int:
+        return sum(len(channel) for channel in self.text_channels)
+
+    def send_messages(self, count_per_channel: int):
+        """Appends messages sent in the last hour to every channel."""
+        now = dt.datetime.utcnow()
+        for channel in self.text_channels:
+            channel.send_messages(count_per_channel, now - dt.timedelta(hours=1), now)
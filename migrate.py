@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# Copyright 2018 Twixes
+
+# This file is part of Somsiad - the Polish Discord bot.
+
+# Somsiad is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# Somsiad is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with Somsiad.
+# If not, see <https://www.gnu.org/licenses/>.
+
+"""Applies pending migrations to databases holding server data without starting the bot.
+The bot does this on startup too, so this is mostly for checking migrations with a dry run
+and for copying data of servers from their own database files into the shared servers database,
+before switching the server data storage setting from "per_server" to "shared".
+"""
+
+import time
+import argparse
+import server_data
+from plugins import *
+
+
+def copy_to_shared_db() -> bool:
+    start_time = time.perf_counter()
+    results = server_data.server_data_manager.copy_server_dbs_to_shared_db()
+    for result in results:
+        if result['error'] is not None:
+            print(f'Kopiowanie bazy danych serwera {result["server_id"]} nie powiodło się: {result["error"]}')
+        else:
+            print(
+                f'Skopiowano bazę danych serwera {result["server_id"]}: {result["copied_row_count"]} wierszy '
+                f'({result["duration_in_seconds"]:.3f} s)'
+            )
+    print(f'Skopiowano bazy danych {len(results)} serwerów w {time.perf_counter() - start_time:.3f} s')
+    return all(result['error'] is None for result in results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        '--dry-run', action='store_true', help='apply migrations in transactions that are rolled back afterwards'
+    )
+    group.add_argument(
+        '--copy-to-shared-db', action='store_true',
+        help='copy data of all servers from their own database files into the shared servers database'
+    )
+    arguments = parser.parse_args()
+    if arguments.copy_to_shared_db:
+        if not copy_to_shared_db():
+            raise SystemExit(1)
+    else:
+        results = server_data.migrate_server_dbs(dry_run=arguments.dry_run, verbose=True)
+        if any(result['error'] is not None for result in results):
+            raise SystemExit(1)
@@ -59,29 +59,21 @@ class BirthdayCalendar:
         return cls._comprehend_date(date_string, cls.MONTH_FORMATS).month
 
     @classmethod
-    def is_member_registered(cls, server: discord.Guild, member: discord.Member) -> bool:
+    async def is_member_registered(cls, server: discord.Guild, member: discord.Member) -> bool:
         """Returns the provided member's birthday or None if the member hasn't set their birthday."""
-        server_data_manager.ensure_table_existence_for_server(server.id, cls.TABLE_NAME, cls.TABLE_COLUMNS)
-
-        server_data_manager.servers[server.id]['db_cursor'].execute(
-            'SELECT birthday_date FROM birthday WHERE user_id = ?',
-            (member.id,)
+        result = await server_data_manager.fetch_one_async(
+            server.id, 'SELECT birthday_date FROM birthday WHERE server_id = ? AND user_id = ?', (server.id, member.id)
         )
-        result = server_data_manager.servers[server.id]['db_cursor'].fetchone()
         is_member_registered = False if result is None else True
 
         return is_member_registered
 
     @classmethod
-    def get_birthday_date(cls, server: discord.Guild, member: discord.Member) -> Optional[dt.date]:
+    async def get_birthday_date(cls, server: discord.Guild, member: discord.Member) -> Optional[dt.date]:
         """Returns the provided member's birthday or None if the member hasn't set their birthday."""
-        server_data_manager.ensure_table_existence_for_server(server.id, cls.TABLE_NAME, cls.TABLE_COLUMNS)
-
-        server_data_manager.servers[server.id]['db_cursor'].execute(
-            'SELECT birthday_date FROM birthday WHERE user_id = ?',
-            (member.id,)
+        result = await server_data_manager.fetch_one_async(
+            server.id, 'SELECT birthday_date FROM birthday WHERE server_id = ? AND user_id = ?', (server.id, member.id)
         )
-        result = server_data_manager.servers[server.id]['db_cursor'].fetchone()
         birthday_date = (
             None if result is None or result['birthday_date'] is None
             else dt.datetime.strptime(result['birthday_date'], '%Y-%m-%d').date()
@@ -90,13 +82,11 @@ class BirthdayCalendar:
         return birthday_date
 
     @classmethod
-    def get_members_with_birthday(
+    async def get_members_with_birthday(
             cls, server: discord.Guild, *, year: int = None, month: int = None, day: int = None
     ) -> Tuple[Dict[str, Union[int, dt.date]]]:
-        server_data_manager.ensure_table_existence_for_server(server.id, cls.TABLE_NAME, cls.TABLE_COLUMNS)
-
-        condition_strings = []
-        condition_variables = []
+        condition_strings = ['server_id = ?']
+        condition_variables = [server.id]
         if year is not None:
             condition_strings.append('''CAST(strftime('%Y', birthday_date) AS integer) = ?''')
             condition_variables.append(year)
@@ -108,32 +98,35 @@ class BirthdayCalendar:
             condition_variables.append(day)
 
         combined_condition_string = f'WHERE {" AND ".join(condition_strings)}'
-        server_data_manager.servers[server.id]['db_cursor'].execute(
-            f'SELECT user_id, birthday_date FROM birthday {combined_condition_string if condition_strings else ""}',
-            condition_variables
-        )
-
         rows = (
             {'user_id': row['user_id'], 'birthday_date': dt.datetime.strptime(row['birthday_date'], '%Y-%m-%d').date()}
-            for row in server_data_manager.servers[server.id]['db_cursor'].fetchall()
+            for row in await server_data_manager.fetch_all_async(
+                server.id, f'SELECT user_id, birthday_date FROM birthday {combined_condition_string}',
+                condition_variables
+            )
         )
         sorted_rows = tuple(sorted(rows, key=lambda row: row['birthday_date']))
 
         return sorted_rows
 
     @classmethod
-    def set_birthday(cls, server: discord.Guild, member: discord.Member, birthday_date: Optional[dt.date]):
-        if cls.is_member_registered(server, member):
-            server_data_manager.servers[server.id]['db_cursor'].execute(
-                'UPDATE birthday SET birthday_date = ? WHERE user_id = ?',
-                (None if birthday_date is None else birthday_date.isoformat(), member.id)
-            )
-        else:
-            server_data_manager.servers[server.id]['db_cursor'].execute(
-                'INSERT INTO birthday(user_id, birthday_date) VALUES (?, ?)',
-                (member.id, None if birthday_date is None else birthday_date.isoformat())
-            )
-        server_data_manager.servers[server.id]['db'].commit()
+    async def set_birthday(cls, server: discord.Guild, member: discord.Member, birthday_date: Optional[dt.date]):
+        birthday_date_string = None if birthday_date is None else birthday_date.isoformat()
+
+        def set_birthday(connection):
+            if not connection.execute(
+                    'UPDATE birthday SET birthday_date = ? WHERE server_id = ? AND user_id = ?',
+                    (birthday_date_string, server.id, member.id)
+            ).rowcount:
+                connection.execute(
+                    'INSERT INTO birthday(server_id, user_id, birthday_date) VALUES (?, ?, ?)',
+                    (server.id, member.id, birthday_date_string)
+                )
+
+        await server_data_manager.transaction_async(server.id, set_birthday)
+
+
+server_data_manager.register_table(BirthdayCalendar.TABLE_NAME, BirthdayCalendar.TABLE_COLUMNS)
 
 
 @somsiad.bot.group(aliases=['urodziny'], invoke_without_command=True, case_insensitive=True)
@@ -223,7 +216,7 @@ async def birthday_remember(ctx, *, raw_date_string):
                 )
                 return await ctx.send(ctx.author.mention, embed=embed)
 
-    BirthdayCalendar.set_birthday(ctx.guild, ctx.author, date)
+    await BirthdayCalendar.set_birthday(ctx.guild, ctx.author, date)
 
     if date.year == 1900:
         date_string = date.strftime('%-d %B')
@@ -260,7 +253,7 @@ async def birthday_remember_error(ctx, error):
 )
 @discord.ext.commands.guild_only()
 async def birthday_forget(ctx):
-    BirthdayCalendar.set_birthday(ctx.guild, ctx.author, None)
+    await BirthdayCalendar.set_birthday(ctx.guild, ctx.author, None)
 
     embed = discord.Embed(
         title=f':white_check_mark: Zapomniano twoją datę urodzin',
@@ -279,7 +272,7 @@ async def birthday_when(ctx, *, member: discord.Member = None):
     if member is None:
         member = ctx.author
 
-    date = BirthdayCalendar.get_birthday_date(ctx.guild, member)
+    date = await BirthdayCalendar.get_birthday_date(ctx.guild, member)
 
     if date is None:
         embed = discord.Embed(
@@ -320,7 +313,7 @@ async def birthday_age(ctx, *, member: discord.Member = None):
     if member is None:
         member = ctx.author
 
-    date = BirthdayCalendar.get_birthday_date(ctx.guild, member)
+    date = await BirthdayCalendar.get_birthday_date(ctx.guild, member)
 
     if date is None or date.year <= 1900:
         embed = discord.Embed(
@@ -360,7 +353,7 @@ async def birthday_day(ctx, *, date_string = None):
     else:
         date = BirthdayCalendar.comprehend_date_without_year(date_string)
 
-    members = BirthdayCalendar.get_members_with_birthday(ctx.guild, month=date.month, day=date.day)
+    members = await BirthdayCalendar.get_members_with_birthday(ctx.guild, month=date.month, day=date.day)
 
     if members:
         embed = discord.Embed(
@@ -404,7 +397,7 @@ async def birthday_month(ctx, *, month_string = None):
         except ValueError:
             raise discord.ext.commands.BadArgument
 
-    members = BirthdayCalendar.get_members_with_birthday(ctx.guild, month=month)
+    members = await BirthdayCalendar.get_members_with_birthday(ctx.guild, month=month)
 
     if members:
         embed = discord.Embed(
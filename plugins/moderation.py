@@ -84,7 +84,7 @@ class Files:
             return self.server_id == other.server_id and self.event_id == other.event_id
 
     @classmethod
-    def add_event(
+    async def add_event(
             cls, *, event_type: str, server: discord.Guild, channel: discord.TextChannel = None,
             executing_user: discord.Member = None, subject_user = Union[discord.Guild, discord.TextChannel,
             discord.VoiceChannel, discord.Member, discord.Message], posix_timestamp: int = None, reason: str = None
@@ -95,13 +95,12 @@ class Files:
         if posix_timestamp is None:
             posix_timestamp = int(dt.datetime.utcnow().timestamp())
 
-        server_data_manager.ensure_table_existence_for_server(server.id, cls.TABLE_NAME, cls.TABLE_COLUMNS)
-        server_data_manager.servers[server.id]['db_cursor'].execute(
-            f'''INSERT INTO {cls.TABLE_NAME}(event_type, channel_id, executing_user_id, subject_user_id,
-            posix_timestamp, reason) VALUES (?, ?, ?, ?, ?, ?)''',
-            (event_type, channel_id, executing_user_id, subject_user.id, posix_timestamp, reason)
+        await server_data_manager.execute_async(
+            server.id,
+            f'''INSERT INTO {cls.TABLE_NAME}(server_id, event_type, channel_id, executing_user_id, subject_user_id,
+            posix_timestamp, reason) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (server.id, event_type, channel_id, executing_user_id, subject_user.id, posix_timestamp, reason)
         )
-        server_data_manager.servers[server.id]['db'].commit()
 
     @staticmethod
     def comprehend_event_types(raw_event_types: str) -> list:
@@ -125,16 +124,15 @@ class Files:
         return event_types
 
     @classmethod
-    def get_events(
+    async def get_events(
             cls, *, server: discord.Guild, event_types: Union[str, tuple, list] = None,
             channel: discord.TextChannel = None, subject_user: Union[
                 discord.Guild, discord.TextChannel, discord.VoiceChannel, discord.Member, discord.Message
             ] = None
     ) -> tuple:
         """Returns a list of events on the provided server."""
-        server_data_manager.ensure_table_existence_for_server(server.id, cls.TABLE_NAME, cls.TABLE_COLUMNS)
-        condition_strings = []
-        condition_variables = []
+        condition_strings = ['server_id = ?']
+        condition_variables = [server.id]
         if isinstance(event_types, str):
             condition_strings.append('event_type = ?')
             condition_variables.append(event_types)
@@ -149,13 +147,12 @@ class Files:
             condition_variables.append(subject_user.id)
 
         combined_condition_string = f'WHERE {" AND ".join(condition_strings)}'
-        server_data_manager.servers[server.id]['db_cursor'].execute(
+        results_rows = await server_data_manager.fetch_all_async(
+            server.id,
             f'''SELECT event_id, event_type, channel_id, executing_user_id, subject_user_id,
-            posix_timestamp, reason FROM {cls.TABLE_NAME} {combined_condition_string if condition_strings else ""}''',
+            posix_timestamp, reason FROM {cls.TABLE_NAME} {combined_condition_string} ORDER BY event_id''',
             condition_variables
         )
-
-        results_rows = server_data_manager.servers[server.id]['db_cursor'].fetchall()
         results_dicts = map(server_data_manager.dict_from_row, results_rows)
 
         events = [
@@ -171,28 +168,35 @@ class Files:
         return new_to_old_events
 
 
+server_data_manager.register_table(Files.TABLE_NAME, Files.TABLE_COLUMNS, primary_key_scope='generated')
+server_data_manager.register_migration(
+    Files.TABLE_NAME, 1,
+    'CREATE INDEX IF NOT EXISTS files_subject_user_id_event_type ON files(subject_user_id, event_type)'
+)
+
+
 @somsiad.bot.event
 async def on_member_join(member):
     """Adds the joining event to the member's file."""
-    Files.add_event(event_type='joined', server=member.guild, subject_user=member)
+    await Files.add_event(event_type='joined', server=member.guild, subject_user=member)
 
 
 @somsiad.bot.event
 async def on_member_remove(member):
     """Adds the removal event to the member's file."""
-    Files.add_event(event_type='left', server=member.guild,subject_user=member)
+    await Files.add_event(event_type='left', server=member.guild,subject_user=member)
 
 
 @somsiad.bot.event
 async def on_member_ban(server, member):
     """Adds the unban event to the member's file."""
-    Files.add_event(event_type='banned', server=server, subject_user=member)
+    await Files.add_event(event_type='banned', server=server, subject_user=member)
 
 
 @somsiad.bot.event
 async def on_member_unban(server, member):
     """Adds the unban event to the member's file."""
-    Files.add_event(event_type='unbanned', server=server, subject_user=member)
+    await Files.add_event(event_type='unbanned', server=server, subject_user=member)
 
 
 @somsiad.bot.command(aliases=['ostrzeż', 'ostrzez'])
@@ -203,11 +207,11 @@ async def on_member_unban(server, member):
 @discord.ext.commands.has_permissions(kick_members=True)
 async def warn(ctx, subject_user: discord.Member, *, reason):
     """Warns the specified member."""
-    Files.add_event(
+    await Files.add_event(
         event_type='warned', server=ctx.guild, channel=ctx.channel, executing_user=ctx.author,
         subject_user=subject_user, reason=reason
     )
-    warnings = Files.get_events(server=ctx.guild, event_types='warned', subject_user=subject_user)
+    warnings = await Files.get_events(server=ctx.guild, event_types='warned', subject_user=subject_user)
 
     embed = discord.Embed(
         title=f':white_check_mark: Ostrzeżono {subject_user} po raz {len(warnings)}.',
@@ -256,7 +260,7 @@ async def kick(ctx, subject_user: discord.Member, *, reason):
         )
         return await ctx.send(ctx.author.mention, embed=embed)
 
-    Files.add_event(
+    await Files.add_event(
         event_type='kicked', server=ctx.guild, channel=ctx.channel, executing_user=ctx.author,
         subject_user=subject_user, reason=reason
     )
@@ -353,7 +357,7 @@ async def file(ctx, member: Optional[discord.Member] = None, *, raw_event_types:
     else:
         event_types = Files.comprehend_event_types(raw_event_types)
 
-    entries = Files.get_events(server=ctx.guild, subject_user=member, event_types=event_types)
+    entries = await Files.get_events(server=ctx.guild, subject_user=member, event_types=event_types)
 
     if entries:
         if event_types is None:
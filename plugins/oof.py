@@ -11,10 +11,10 @@
 # You should have received a copy of the GNU General Public License along with Somsiad.
 # If not, see <https://www.gnu.org/licenses/>.
 
-from typing import List, Dict, Union, Optional
+from typing import List, Dict, Union
 import discord
 from somsiad import somsiad
-from server_data import server_data_manager
+from server_data import server_data_manager, CounterService
 from utilities import TextFormatter
 
 
@@ -24,66 +24,36 @@ class Oof:
         'user_id INTEGER NOT NULL PRIMARY KEY',
         'oofs INTEGER NOT NULL DEFAULT 0'
     )
+    INDEX_NAME = 'oof_oofs'
+    INDEX_COLUMNS = ('server_id', 'oofs')
 
     @classmethod
-    def get_oofs(cls, server: discord.Guild, user: Union[discord.User, discord.Member] = None) -> Optional[int]:
+    async def get_oofs(cls, server: discord.Guild, user: Union[discord.User, discord.Member] = None) -> int:
         """Returns the number of times the provided user oofed on the provided server.
         If not provided a user, returns the total number of oofs on the server.
         """
-        server_data_manager.ensure_table_existence_for_server(server.id, cls.TABLE_NAME, cls.TABLE_COLUMNS)
         if user is None:
-            server_data_manager.servers[server.id]['db_cursor'].execute(
-                'SELECT oofs FROM oof',
-            )
-            result = server_data_manager.servers[server.id]['db_cursor'].fetchall()
-            if result:
-                oofs = 0
-                for oofer in result:
-                    oofs += oofer['oofs']
-            else:
-                oofs = None
+            return await oof_counter.get_total(server.id)
         else:
-            server_data_manager.servers[server.id]['db_cursor'].execute(
-                'SELECT oofs FROM oof WHERE user_id = ?',
-                (user.id,)
-            )
-            result = server_data_manager.servers[server.id]['db_cursor'].fetchone()
-            oofs = None if result is None else result['oofs']
-        return oofs
+            return await oof_counter.get(server.id, (user.id,))
 
     @classmethod
-    def get_oofers(cls, server: discord.Guild) -> List[Dict[str, int]]:
-        """Returns a tuple of users who have oofed on the provided server, sorted by the number of oofs, descending."""
-        server_data_manager.ensure_table_existence_for_server(server.id, cls.TABLE_NAME, cls.TABLE_COLUMNS)
-        server_data_manager.servers[server.id]['db_cursor'].execute(
-            'SELECT user_id, oofs FROM oof'
-        )
-        rows = (
-            server_data_manager.dict_from_row(row)
-            for row in server_data_manager.servers[server.id]['db_cursor'].fetchall()
-        )
-        sorted_rows = sorted(rows, key=lambda row: row['oofs'], reverse=True)
-        return sorted_rows
-
-    @classmethod
-    def ensure_user_registration(cls, server: discord.Guild, user: Union[discord.User, discord.Member]):
-        """Ensure that the provided user is a registered oofer on the provided server."""
-        if cls.get_oofs(server, user) is None:
-            server_data_manager.servers[server.id]['db_cursor'].execute(
-                'INSERT INTO oof(user_id) VALUES(?)',
-                (user.id,)
-            )
-            server_data_manager.servers[server.id]['db'].commit()
+    async def get_top_oofers(cls, server: discord.Guild, limit: int = 5) -> List[Dict[str, int]]:
+        """Returns up to limit users who have oofed the most on the provided server, sorted by the number of oofs,
+        descending.
+        """
+        return await oof_counter.get_top(server.id, limit)
 
     @classmethod
     def increment(cls, server: discord.Guild, user: Union[discord.User, discord.Member]):
-        """Increments the number of oofs by 1 for the provided user on the provided server."""
-        cls.ensure_user_registration(server, user)
-        server_data_manager.servers[server.id]['db_cursor'].execute(
-            'UPDATE oof SET oofs = oofs + 1 WHERE user_id = ?',
-            (user.id,)
-        )
-        server_data_manager.servers[server.id]['db'].commit()
+        """Increments the number of oofs by 1 for the provided user on the provided server,
+        registering the user as an oofer if needed. The database is updated in background.
+        """
+        oof_counter.increment(server.id, (user.id,))
+
+
+server_data_manager.register_table(Oof.TABLE_NAME, Oof.TABLE_COLUMNS, {Oof.INDEX_NAME: Oof.INDEX_COLUMNS})
+oof_counter = CounterService(Oof.TABLE_NAME, ('user_id',), 'oofs')
 
 
 @somsiad.bot.group(invoke_without_command=True, case_insensitive=True)
@@ -114,8 +84,7 @@ async def oof_how_many_member(ctx, member: discord.Member = None):
     if member is None:
         member = ctx.author
 
-    oofs = Oof.get_oofs(ctx.guild, member)
-    oofs = 0 if oofs is None else oofs
+    oofs = await Oof.get_oofs(ctx.guild, member)
 
     if member == ctx.author:
         embed = discord.Embed(
@@ -158,23 +127,22 @@ async def oof_how_many_server(ctx):
 )
 @discord.ext.commands.guild_only()
 async def oof_server(ctx):
-    oofers = Oof.get_oofers(ctx.guild)
-    total_oofs = Oof.get_oofs(ctx.guild)
-    total_oofs = 0 if total_oofs is None else total_oofs
+    top_oofers = await Oof.get_top_oofers(ctx.guild, 5)
+    total_oofs = await Oof.get_oofs(ctx.guild)
 
-    top_oofers = []
-    for oofer in enumerate(oofers[:5]):
-        top_oofers.append(
+    top_oofers_lines = []
+    for oofer in enumerate(top_oofers):
+        top_oofers_lines.append(
             f'{oofer[0]+1}. <@{oofer[1]["user_id"]}> – '
             f'{TextFormatter.word_number_variant(oofer[1]["oofs"], "oofnięcie", "oofnięcia", "oofnięć")}'
         )
-    top_oofers_string = '\n'.join(top_oofers)
+    top_oofers_string = '\n'.join(top_oofers_lines)
 
     embed = discord.Embed(
         title=f'Do tej pory oofnięto na serwerze {TextFormatter.word_number_variant(total_oofs, "raz", "razy")}',
         color=somsiad.color
     )
-    if top_oofers:
+    if top_oofers_lines:
         embed.add_field(name='Najaktywniejsi ooferzy', value=top_oofers_string, inline=False)
 
     await ctx.send(ctx.author.mention, embed=embed)
@@ -21,35 +21,26 @@ from utilities import TextFormatter
 class PinArchivesManager:
     def __init__(self):
         """Sets up the table in the database."""
-        server_data_manager.servers_db_cursor.execute(
+        server_data_manager.servers_db.execute(
             '''CREATE TABLE IF NOT EXISTS pin_archive_channels(
                 server_id INTEGER NOT NULL PRIMARY KEY,
                 channel_id INTEGER NOT NULL
             )'''
         )
-        server_data_manager.servers_db.commit()
 
-    def set_archive_channel_id(self, server_id: int, channel_id: int):
+    async def set_archive_channel_id(self, server_id: int, channel_id: int):
         """Sets the ID of the server's pin archive channel."""
-        if self.get_archive_channel_id(server_id) is None:
-            server_data_manager.servers_db_cursor.execute(
-                'INSERT INTO pin_archive_channels(server_id, channel_id) VALUES(?, ?)',
-                (server_id, channel_id)
-            )
-        else:
-            server_data_manager.servers_db_cursor.execute(
-                'UPDATE pin_archive_channels SET channel_id = ? WHERE server_id = ?',
-                (channel_id, server_id)
-            )
-        server_data_manager.servers_db.commit()
+        await server_data_manager.servers_db.execute_async(
+            'INSERT OR REPLACE INTO pin_archive_channels(server_id, channel_id) VALUES(?, ?)',
+            (server_id, channel_id)
+        )
 
-    def get_archive_channel_id(self, server_id: int) -> int:
+    async def get_archive_channel_id(self, server_id: int) -> int:
         """Gets the ID of the server's pin archive channel."""
-        server_data_manager.servers_db_cursor.execute(
+        archive_channel_id = await server_data_manager.servers_db.fetch_one_async(
             'SELECT channel_id FROM pin_archive_channels WHERE server_id = ?',
             (server_id,)
         )
-        archive_channel_id = server_data_manager.servers_db_cursor.fetchone()
 
         if archive_channel_id is None:
             return None
@@ -138,7 +129,7 @@ async def pins_channel(ctx, channel: discord.TextChannel = None):
     if channel is None:
         channel = ctx.channel
 
-    pin_archives_manager.set_archive_channel_id(ctx.guild.id, channel.id)
+    await pin_archives_manager.set_archive_channel_id(ctx.guild.id, channel.id)
 
 
     embed = discord.Embed(
@@ -157,7 +148,7 @@ async def pins_channel(ctx, channel: discord.TextChannel = None):
 @discord.ext.commands.has_permissions(manage_messages=True)
 async def pins_archive(ctx):
     """Archives pins in the channel where the command was invoked."""
-    archive_channel_id = pin_archives_manager.get_archive_channel_id(ctx.guild.id)
+    archive_channel_id = await pin_archives_manager.get_archive_channel_id(ctx.guild.id)
 
     if archive_channel_id:
         archive_channel = ctx.guild.get_channel(archive_channel_id)
@@ -16,37 +16,84 @@ import time
 import datetime as dt
 import secrets
 import asyncio
-import threading
+import concurrent.futures
 import json
 import sqlite3
+from typing import Iterable, Sequence, List, Tuple, Dict, NamedTuple, Optional, Callable, Any
 import discord
 import praw
+import prawcore
 from somsiad import somsiad
 from utilities import TextFormatter
-from server_data import ServerDataManager
+from server_data import Database, server_data_manager
 
 
 class RedditVerifier:
+    """Keeps track of verification of Discord users' Reddit accounts.
+    Every lookup is a single query returning a typed row, with dates converted by SQLite's date adapters,
+    and every write checks its preconditions in its own WHERE clause, so that it needs no lookup beforehand.
+    """
     FOOTER_TEXT = 'Weryfikacja konta na Reddicie'
+    MAX_EMBED_FIELD_COUNT = 25
+    MAX_QUERY_PARAMETER_COUNT = 999
+
+    class PhraseInfo(NamedTuple):
+        """The Discord user a phrase is assigned to. All fields are None if the phrase isn't assigned."""
+        discord_user_id: Optional[int] = None
+        verification_status: Optional[str] = None
+        discord_first_contact_date: Optional[dt.date] = None
+        phrase_gen_date: Optional[dt.date] = None
+
+    class DiscordUserInfo(NamedTuple):
+        """Verification of a Discord user. All fields are None if the user has never requested verification."""
+        reddit_username: Optional[str] = None
+        verification_status: Optional[str] = None
+        discord_first_contact_date: Optional[dt.date] = None
+        reddit_first_contact_date: Optional[dt.date] = None
+        phrase_gen_date: Optional[dt.date] = None
+        verification_rejection_date: Optional[dt.date] = None
+
+    class RedditUserInfo(NamedTuple):
+        """The Discord user a Reddit user is assigned to. All fields are None if the Reddit user is unknown."""
+        discord_user_id: Optional[int] = None
+        verification_status: Optional[str] = None
+        discord_first_contact_date: Optional[dt.date] = None
+        reddit_first_contact_date: Optional[dt.date] = None
+        verification_rejection_date: Optional[dt.date] = None
+
+    PHRASE_INFO_QUERY = '''SELECT phrase, discord_user_id, verification_status, discord_first_contact_date,
+        phrase_gen_date FROM discord_users'''
+    DISCORD_USER_INFO_QUERY = '''SELECT discord_users.reddit_username, verification_status, discord_first_contact_date,
+        reddit_first_contact_date, phrase_gen_date, verification_rejection_date
+        FROM discord_users LEFT JOIN reddit_users ON reddit_users.reddit_username = discord_users.reddit_username'''
+    REDDIT_USER_INFO_QUERY = '''SELECT reddit_users.reddit_username, discord_user_id, verification_status,
+        discord_first_contact_date, reddit_first_contact_date, verification_rejection_date
+        FROM reddit_users LEFT JOIN discord_users ON discord_users.reddit_username = reddit_users.reddit_username'''
+    # Only a phrase which is still assigned can be used, and only by a Reddit user who isn't assigned to anyone yet
+    VERIFY_USER_STATEMENT = '''UPDATE discord_users SET reddit_username = ?, verification_status = 'VERIFIED',
+        verification_rejection_date = ?, phrase = NULL
+        WHERE phrase = ? AND NOT EXISTS (SELECT 1 FROM discord_users WHERE reddit_username = ?)'''
+    REJECT_USER_STATEMENT = '''UPDATE discord_users SET verification_status = ?, verification_rejection_date = ?,
+        phrase = NULL WHERE phrase = ? AND NOT EXISTS (SELECT 1 FROM discord_users WHERE reddit_username = ?)'''
 
     _db = None
-    _db_cursor = None
     _phrase_parts = None
 
     def __init__(self, db_path: str, phrase_parts=None):
         """Connects to the database. Creates it if it doesn't exist yet. Sets up tables. Sets up phrase parts."""
-        self._db = sqlite3.connect(db_path)
-        self._db_cursor = self._db.cursor()
-        self._db_cursor.execute(
-            'PRAGMA foreign_keys = ON'
-        )
-        self._db_cursor.execute(
+        self._db = Database(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.transaction(self._create_tables)
+        self._phrase_parts = phrase_parts
+
+    @staticmethod
+    def _create_tables(connection: sqlite3.Connection):
+        connection.execute(
             '''CREATE TABLE IF NOT EXISTS discord_servers(
                 server_id INTEGER NOT NULL PRIMARY KEY,
                 verified_role_id INTEGER
             )'''
         )
-        self._db_cursor.execute(
+        connection.execute(
             '''CREATE TABLE IF NOT EXISTS discord_users(
                 discord_user_id INTEGER NOT NULL PRIMARY KEY,
                 reddit_username TEXT UNIQUE,
@@ -58,14 +105,20 @@ class RedditVerifier:
                 FOREIGN KEY(reddit_username) REFERENCES reddit_users(reddit_username)
             )'''
         )
-        self._db_cursor.execute(
+        connection.execute(
             '''CREATE TABLE IF NOT EXISTS reddit_users(
                 reddit_username TEXT NOT NULL PRIMARY KEY,
                 reddit_first_contact_date DATE NOT NULL DEFAULT (date('now', 'localtime'))
             )'''
         )
-        self._db.commit()
-        self._phrase_parts = phrase_parts
+        connection.execute(
+            '''CREATE TABLE IF NOT EXISTS verified_role_sync_jobs(
+                server_id INTEGER NOT NULL PRIMARY KEY,
+                role_id INTEGER NOT NULL,
+                channel_id INTEGER,
+                FOREIGN KEY(server_id) REFERENCES discord_servers(server_id)
+            )'''
+        )
 
     @staticmethod
     def is_reddit_user_trustworthy(reddit_user: str):
@@ -77,263 +130,219 @@ class RedditVerifier:
             account_karma >= int(somsiad.conf['reddit_account_min_karma'])
         )
 
-    def phrase_gen(self):
-        """Assembles a unique random phrase from given phrase parts."""
-        is_phrase_unique = False
-        while not is_phrase_unique:
-            chosen_parts = []
-            for _, category_entry in self._phrase_parts.items():
-                chosen_parts.append(secrets.choice(category_entry).capitalize())
-            phrase = ''.join(chosen_parts)
-            if self.phrase_info(phrase)['discord_user_id'] is None:
-                is_phrase_unique = True
-        return phrase
-
-    def discord_server_info(self, server_id: int):
-        """Returns information from the database about the given Discord server."""
-        self._db_cursor.execute(
-            'SELECT verified_role_id FROM discord_servers WHERE server_id = ?',
-            (server_id,)
-        )
-        discord_server_info = self._db_cursor.fetchone()
-        if discord_server_info is not None:
-            was_found = True
-            verified_role_id = discord_server_info[0]
-        else:
-            was_found = False
-            verified_role_id = None
-
-        return {
-            'was_found': was_found,
-            'verified_role_id': verified_role_id
-        }
+    def _generate_phrase(self, connection: sqlite3.Connection) -> str:
+        """Assembles a random phrase from given phrase parts which isn't assigned to anyone."""
+        while True:
+            phrase = ''.join(
+                secrets.choice(category_entry).capitalize() for category_entry in self._phrase_parts.values()
+            )
+            if connection.execute('SELECT 1 FROM discord_users WHERE phrase = ?', (phrase,)).fetchone() is None:
+                return phrase
 
-    def phrase_info(self, phrase: str):
+    def phrase_info(self, phrase: str) -> 'RedditVerifier.PhraseInfo':
         """Returns information from the database about the given phrase."""
-        self._db_cursor.execute(
-            '''SELECT discord_user_id, verification_status, discord_first_contact_date, phrase_gen_date,
-            verification_rejection_date FROM discord_users WHERE phrase = ?''',
-            (phrase,)
-        )
-        phrase_info = self._db_cursor.fetchone()
-        if phrase_info is not None:
-            discord_user_id = int(phrase_info[0]) if phrase_info[0] is not None else None
-            verification_status = phrase_info[1]
-            discord_first_contact_date = dt.datetime.strptime(phrase_info[2], '%Y-%m-%d').date()
-            phrase_gen_date = dt.datetime.strptime(phrase_info[3], '%Y-%m-%d').date()
-        else:
-            discord_user_id = None
-            verification_status = None
-            discord_first_contact_date = None
-            phrase_gen_date = None
-
-        return {
-            'discord_user_id': discord_user_id,
-            'verification_status': verification_status,
-            'discord_first_contact_date': discord_first_contact_date,
-            'phrase_gen_date': phrase_gen_date
-        }
-
-    def discord_user_info(self, discord_user_id: int):
+        return self.phrase_infos((phrase,)).get(phrase, self.PhraseInfo())
+
+    def discord_user_info(self, discord_user_id: int) -> 'RedditVerifier.DiscordUserInfo':
         """Returns information from the database about the given Discord user."""
-        self._db_cursor.execute(
-            '''SELECT reddit_username, verification_status, discord_first_contact_date, phrase_gen_date,
-            verification_rejection_date FROM discord_users WHERE discord_user_id = ?''',
-            (discord_user_id,)
-        )
-        discord_user_info = self._db_cursor.fetchone()
-        if discord_user_info is not None:
-            reddit_username = discord_user_info[0]
-            verification_status = discord_user_info[1]
-            discord_first_contact_date = dt.datetime.strptime(discord_user_info[2], '%Y-%m-%d').date()
-            reddit_first_contact_date = None
-            phrase_gen_date = dt.datetime.strptime(discord_user_info[3], '%Y-%m-%d').date()
-            verification_rejection_date = (
-                None if discord_user_info[4] is None else dt.datetime.strptime(discord_user_info[4], '%Y-%m-%d').date()
-            )
-            if reddit_username is not None:
-                self._db_cursor.execute(
-                    'SELECT reddit_first_contact_date FROM reddit_users WHERE reddit_username = ?',
-                    (reddit_username,)
-                )
-                reddit_first_contact_date = self._db_cursor.fetchone()
-                reddit_first_contact_date = (
-                    dt.datetime.strptime(reddit_first_contact_date[0], '%Y-%m-%d').date()
-                    if reddit_first_contact_date is not None else None
-                )
-        else:
-            reddit_username = None
-            verification_status = None
-            discord_first_contact_date = None
-            reddit_first_contact_date = None
-            phrase_gen_date = None
-            verification_rejection_date = None
-
-        return {
-            'reddit_username': reddit_username,
-            'verification_status': verification_status,
-            'discord_first_contact_date': discord_first_contact_date,
-            'reddit_first_contact_date': reddit_first_contact_date,
-            'phrase_gen_date': phrase_gen_date,
-            'verification_rejection_date': verification_rejection_date
-        }
-
-    def reddit_user_info(self, reddit_username: str):
+        row = self._db.fetch_one(f'{self.DISCORD_USER_INFO_QUERY} WHERE discord_user_id = ?', (discord_user_id,))
+        return self.DiscordUserInfo() if row is None else self.DiscordUserInfo(*row)
+
+    def reddit_user_info(self, reddit_username: str) -> 'RedditVerifier.RedditUserInfo':
         """Returns information from the database about the given Reddit user."""
-        self._db_cursor.execute(
-            'SELECT reddit_first_contact_date FROM reddit_users WHERE reddit_username = ?',
-            (reddit_username,)
-        )
-        reddit_first_contact_date = self._db_cursor.fetchone()
-        reddit_first_contact_date = (
-            dt.datetime.strptime(reddit_first_contact_date[0], '%Y-%m-%d').date()
-            if reddit_first_contact_date is not None else None
-        )
-        self._db_cursor.execute(
-            '''SELECT discord_user_id, verification_status, discord_first_contact_date, verification_rejection_date
-            FROM discord_users WHERE reddit_username = ?''',
-            (reddit_username,)
-        )
-        reddit_user_info = self._db_cursor.fetchone()
-        if reddit_user_info is not None:
-            discord_user_id = int(reddit_user_info[0]) if reddit_user_info[0] is not None else None
-            verification_status = reddit_user_info[1]
-            discord_first_contact_date = dt.datetime.strptime(reddit_user_info[2], '%Y-%m-%d').date()
-            verification_rejection_date = (
-                None if reddit_user_info[3] is None else dt.datetime.strptime(reddit_user_info[3], '%Y-%m-%d').date()
-            )
-        else:
-            discord_user_id = None
-            verification_status = None
-            discord_first_contact_date = None
-            verification_rejection_date = None
-
-        return {
-            'discord_user_id': discord_user_id,
-            'verification_status': verification_status,
-            'discord_first_contact_date': discord_first_contact_date,
-            'reddit_first_contact_date': reddit_first_contact_date,
-            'verification_rejection_date': verification_rejection_date
-        }
-
-    def ensure_discord_server_existence_in_db(self, server_id: int):
-        if not self.discord_server_info(server_id)['was_found']:
-            self._db_cursor.execute(
-                'INSERT INTO discord_servers(server_id) VALUES(?)',
+        return self.reddit_user_infos((reddit_username,))[reddit_username]
+
+    def set_verified_role(self, server_id: int, role_id: Optional[int], channel_id: Optional[int] = None):
+        """Sets the verified role of the server. Unless the role is None, also records a job of giving the role
+        to verified members of the server, replacing the server's previous job, so that it can be resumed
+        after a restart. The job's progress is to be reported in the given channel.
+        """
+        def set_verified_role(connection):
+            connection.execute(
+                'INSERT OR IGNORE INTO discord_servers(server_id) VALUES(?)',
                 (server_id,)
             )
-            self._db.commit()
+            connection.execute(
+                'UPDATE discord_servers SET verified_role_id = ? WHERE server_id = ?',
+                (role_id, server_id)
+            )
+            if role_id is None:
+                connection.execute(
+                    'DELETE FROM verified_role_sync_jobs WHERE server_id = ?',
+                    (server_id,)
+                )
+            else:
+                connection.execute(
+                    'INSERT OR REPLACE INTO verified_role_sync_jobs(server_id, role_id, channel_id) VALUES(?, ?, ?)',
+                    (server_id, role_id, channel_id)
+                )
 
-    def set_discord_server_setting(self, server_id: int, column: str, value):
-        self.ensure_discord_server_existence_in_db(server_id)
-        self._db_cursor.execute(
-            f'UPDATE discord_servers SET {column} = ? WHERE server_id = ?',
-            (value, server_id)
-        )
-        self._db.commit()
+        self._db.transaction(set_verified_role)
 
-    def get_known_servers_ids(self):
-        self._db_cursor.execute(
-            'SELECT server_id FROM discord_servers'
+    def get_verified_role_sync_jobs(self) -> List[Tuple[int, int, Optional[int]]]:
+        """Returns (server_id, role_id, channel_id) of every job of giving the verified role which isn't finished."""
+        return [tuple(row) for row in self._db.fetch_all(
+            'SELECT server_id, role_id, channel_id FROM verified_role_sync_jobs'
+        )]
+
+    def remove_verified_role_sync_job(self, server_id: int, role_id: int):
+        """Removes the server's job of giving the role, unless it has been replaced by a job for another role."""
+        self._db.execute(
+            'DELETE FROM verified_role_sync_jobs WHERE server_id = ? AND role_id = ?',
+            (server_id, role_id)
         )
-        return self._db_cursor.fetchall()
 
     def get_verified_roles(self):
-        self._db_cursor.execute(
+        servers = self._db.fetch_all(
             'SELECT server_id, verified_role_id FROM discord_servers WHERE verified_role_id IS NOT NULL'
         )
-        servers = self._db_cursor.fetchall()
         results = []
         for server in servers:
             results.append({'server_id': server[0], 'verified_role_id': server[1]})
         return results
 
-    def get_verified_role_id_of_server(self, server_id: int) -> int:
-        self._db_cursor.execute(
-            'SELECT verified_role_id FROM discord_servers WHERE server_id = ?',
-            (server_id,)
+    def assign_phrase(self, discord_user_id: int) -> str:
+        """Assigns a new phrase to a Discord user."""
+        def assign_phrase(connection):
+            phrase = self._generate_phrase(connection)
+            if not connection.execute(
+                    '''UPDATE discord_users SET phrase = ?, verification_status = 'AWAITING_MESSAGE',
+                    phrase_gen_date = ? WHERE discord_user_id = ?''',
+                    (phrase, dt.date.today().isoformat(), discord_user_id)
+            ).rowcount:
+                connection.execute(
+                    '''INSERT INTO discord_users(discord_user_id, verification_status, phrase)
+                    VALUES(?, 'AWAITING_MESSAGE', ?)''',
+                    (discord_user_id, phrase)
+                )
+            return phrase
+
+        return self._db.transaction(assign_phrase)
+
+    @classmethod
+    def _fetch_phrase_infos(
+            cls, connection: sqlite3.Connection, phrases: Sequence[str]
+    ) -> Dict[str, 'RedditVerifier.PhraseInfo']:
+        if not phrases:
+            return {}
+        rows = connection.execute(
+            f'{cls.PHRASE_INFO_QUERY} WHERE phrase IN ({", ".join("?" * len(phrases))})',
+            phrases
         )
-        verified_role_id = self._db_cursor.fetchone()
-        if verified_role_id is not None:
-            return verified_role_id[0]
-        else:
-            return None
-
-    def assign_phrase(self, discord_user_id: int):
-        """Assigns a phrase to a Discord user."""
-        phrase = self.phrase_gen()
-
-        if self.discord_user_info(discord_user_id)['verification_status'] is None:
-            self._db_cursor.execute(
-                '''INSERT INTO discord_users(discord_user_id, verification_status, phrase)
-                VALUES(?, 'AWAITING_MESSAGE', ?)''',
-                (discord_user_id, phrase)
-            )
-        else:
-            self._db_cursor.execute(
-                '''UPDATE discord_users SET phrase = ?, verification_status = 'AWAITING_MESSAGE', phrase_gen_date = ?
-                WHERE discord_user_id = ?''',
-                (phrase, dt.date.today().isoformat(), discord_user_id)
+        return {row[0]: cls.PhraseInfo(*row[1:]) for row in rows}
+
+    @classmethod
+    def _fetch_reddit_user_infos(
+            cls, connection: sqlite3.Connection, reddit_usernames: Sequence[str]
+    ) -> Dict[str, 'RedditVerifier.RedditUserInfo']:
+        reddit_user_infos = {reddit_username: cls.RedditUserInfo() for reddit_username in reddit_usernames}
+        if reddit_usernames:
+            rows = connection.execute(
+                f'''{cls.REDDIT_USER_INFO_QUERY}
+                WHERE reddit_users.reddit_username IN ({", ".join("?" * len(reddit_usernames))})''',
+                reddit_usernames
             )
-        self._db.commit()
-        return phrase
-
-    def add_reddit_user(self, reddit_username: str):
-        """Adds the given Reddit user to the database."""
-        if self.reddit_user_info(reddit_username)['reddit_first_contact_date'] is None:
-            self._db_cursor.execute(
-                'INSERT INTO reddit_users(reddit_username) VALUES(?)',
-                (reddit_username,)
+            for row in rows:
+                reddit_user_infos[row[0]] = cls.RedditUserInfo(*row[1:])
+        return reddit_user_infos
+
+    def phrase_infos(self, phrases: Iterable[str]) -> Dict[str, 'RedditVerifier.PhraseInfo']:
+        """Returns information from the database about those of the given phrases which are assigned,
+        looked up with a single query.
+        """
+        phrases = list(set(phrases))
+        return self._db.read(lambda connection: self._fetch_phrase_infos(connection, phrases))
+
+    def reddit_user_infos(self, reddit_usernames: Iterable[str]) -> Dict[str, 'RedditVerifier.RedditUserInfo']:
+        """Returns information from the database about the given Reddit users, looked up with a single query."""
+        reddit_usernames = list(set(reddit_usernames))
+        return self._db.read(lambda connection: self._fetch_reddit_user_infos(connection, reddit_usernames))
+
+    def look_up_verification_attempts(
+            self, reddit_usernames: Iterable[str], phrases: Iterable[str]
+    ) -> Tuple[Dict[str, 'RedditVerifier.RedditUserInfo'], Dict[str, 'RedditVerifier.PhraseInfo']]:
+        """Returns information about the given Reddit users and phrases, looked up within a single read."""
+        reddit_usernames = list(set(reddit_usernames))
+        phrases = list(set(phrases))
+        return self._db.read(lambda connection: (
+            self._fetch_reddit_user_infos(connection, reddit_usernames),
+            self._fetch_phrase_infos(connection, phrases)
+        ))
+
+    def apply_verification_results(
+            self, reddit_usernames: Iterable[str], results: Sequence[Tuple[str, str, str]]
+    ) -> List[bool]:
+        """Adds the given Reddit users which aren't in the database yet and applies (reddit_username, phrase,
+        verification_status) results in order, all in a single transaction.
+        A result is either VERIFIED or a rejection and is only applied if the phrase is still assigned
+        and the Reddit user hasn't been assigned to anyone. Returns whether each of the results has been applied.
+        """
+        today = dt.date.today().isoformat()
+
+        def apply_verification_results(connection):
+            connection.executemany(
+                'INSERT OR IGNORE INTO reddit_users(reddit_username) VALUES(?)',
+                [(reddit_username,) for reddit_username in set(reddit_usernames)]
             )
-            self._db.commit()
-            return self.reddit_user_info(reddit_username)
-        else:
-            return None
-
-    def verify_user(self, reddit_username: str, phrase: str):
-        """Assigns a Reddit username to a Discord user. Also unassigns the phrase."""
-        if self.phrase_info(phrase)['discord_user_id'] is not None:
-            if self.reddit_user_info(reddit_username)['discord_user_id'] is None:
-                self._db_cursor.execute(
-                    '''UPDATE discord_users SET reddit_username = ?, verification_status = 'VERIFIED',
-                    verification_rejection_date = ?, phrase = NULL WHERE phrase = ?''',
-                    (reddit_username, dt.date.today().isoformat(), phrase)
-                )
-                self._db.commit()
-            return self.reddit_user_info(reddit_username)
-        else:
-            return None
-
-    def reject_user(self, reddit_username: str, phrase: str, reason: str):
-        """Assigns a Reddit username to a Discord user. Also unassigns the phrase."""
-        if self.phrase_info(phrase)['discord_user_id'] is not None:
-            if self.reddit_user_info(reddit_username)['discord_user_id'] is None:
-                new_verification_status = f'REJECTED_{str(reason).upper()}'
-                self._db_cursor.execute(
-                    f'''UPDATE discord_users SET verification_status = ?,
-                    verification_rejection_date = ?, phrase = NULL WHERE phrase = ?''',
-                    (new_verification_status, dt.date.today().isoformat(), phrase)
+            are_applied = []
+            for reddit_username, phrase, verification_status in results:
+                if verification_status == 'VERIFIED':
+                    cursor = connection.execute(
+                        self.VERIFY_USER_STATEMENT, (reddit_username, today, phrase, reddit_username)
+                    )
+                else:
+                    cursor = connection.execute(
+                        self.REJECT_USER_STATEMENT, (verification_status, today, phrase, reddit_username)
+                    )
+                are_applied.append(cursor.rowcount > 0)
+            return are_applied
+
+        return self._db.transaction(apply_verification_results)
+
+    def get_verified_reddit_usernames(self, discord_user_ids: Iterable[int]) -> List[Tuple[int, str]]:
+        """Returns (discord_user_id, reddit_username) pairs of those of the given Discord users who are verified.
+        The users are looked up within a single read, in chunks which fit within SQLite's limit of query parameters.
+        """
+        discord_user_ids = list(set(discord_user_ids))
+
+        def get_verified_reddit_usernames(connection):
+            verified_reddit_usernames = []
+            for chunk_start in range(0, len(discord_user_ids), self.MAX_QUERY_PARAMETER_COUNT):
+                chunk = discord_user_ids[chunk_start:chunk_start + self.MAX_QUERY_PARAMETER_COUNT]
+                verified_reddit_usernames.extend(
+                    tuple(row) for row in connection.execute(
+                        f'''SELECT discord_user_id, reddit_username FROM discord_users WHERE
+                        verification_status = 'VERIFIED' AND discord_user_id IN ({", ".join("?" * len(chunk))})''',
+                        chunk
+                    )
                 )
-                self._db.commit()
-            return self.reddit_user_info(reddit_username)
-        else:
-            return None
+            return verified_reddit_usernames
 
-    def update_discord_user_verification_status(self, discord_user_id: int, new_verification_status: str):
-        if self.discord_user_info(discord_user_id)['verification_status'] is not None:
-            self._db_cursor.execute(
-                'UPDATE discord_users SET verification_status = ? WHERE discord_user_id = ?',
-                (new_verification_status, discord_user_id)
-            )
-            self._db.commit()
-        return self.discord_user_info(discord_user_id)
+        return self._db.read(get_verified_reddit_usernames)
+
+    async def get_verified_reddit_usernames_async(self, discord_user_ids: Iterable[int]) -> List[Tuple[int, str]]:
+        return await Database.run_in_read_executor(self.get_verified_reddit_usernames, discord_user_ids)
+
+    async def discord_user_info_async(self, discord_user_id: int):
+        return await Database.run_in_read_executor(self.discord_user_info, discord_user_id)
+
+    async def assign_phrase_async(self, discord_user_id: int):
+        return await asyncio.get_event_loop().run_in_executor(None, self.assign_phrase, discord_user_id)
+
+    async def set_verified_role_async(self, server_id: int, role_id: Optional[int], channel_id: Optional[int] = None):
+        await asyncio.get_event_loop().run_in_executor(None, self.set_verified_role, server_id, role_id, channel_id)
+
+    async def remove_verified_role_sync_job_async(self, server_id: int, role_id: int):
+        await asyncio.get_event_loop().run_in_executor(None, self.remove_verified_role_sync_job, server_id, role_id)
 
     @staticmethod
-    def log_verification_result(
+    async def log_verification_result(
         discord_user_id: int, reddit_username: str, *, success: bool, personal_reason: str = '',
-        log_reason: str = '', thread_server_data_manager: ServerDataManager
+        log_reason: str = ''
     ):
         discord_user = somsiad.bot.get_user(discord_user_id)
+        if discord_user is None:
+            return
 
         if success:
             embed = discord.Embed(
@@ -353,9 +362,10 @@ class RedditVerifier:
         embed.set_footer(text=verifier.FOOTER_TEXT)
         asyncio.ensure_future(discord_user.send(embed=embed))
 
-        for row in thread_server_data_manager.get_log_channels():
+        log_channels = await asyncio.get_event_loop().run_in_executor(None, server_data_manager.get_log_channels)
+        for row in log_channels:
             server = somsiad.bot.get_guild(row['server_id'])
-            if server.get_member(discord_user_id) is not None:
+            if server is not None and server.get_member(discord_user_id) is not None:
                 channel = server.get_channel(row['log_channel_id'])
                 if channel is not None:
                     if success:
@@ -378,157 +388,406 @@ class RedditVerifier:
                     embed.set_footer(text=verifier.FOOTER_TEXT)
                     asyncio.ensure_future(channel.send(embed=embed))
 
-    def add_verified_roles_to_discord_user(self, discord_user_id: int):
-        for row in self.get_verified_roles():
+    async def add_verified_roles_to_discord_user(self, discord_user_id: int):
+        for row in await Database.run_in_read_executor(self.get_verified_roles):
             server = somsiad.bot.get_guild(row['server_id'])
-            member = server.get_member(discord_user_id)
+            member = None if server is None else server.get_member(discord_user_id)
             if member is not None:
                 for role in server.roles:
                     if role.id == row['verified_role_id']:
                         asyncio.ensure_future(member.add_roles(role))
                         break
 
-    async def add_verified_role_to_members_of_discord_server(self, server: discord.Guild):
-        verified_role_id = self.get_verified_role_id_of_server(server.id)
-        verified_role = None
-
-        # get the verified role from server roles using the ID obtained
-        for role in server.roles:
-            if role.id == verified_role_id:
-                verified_role = role
-                break
 
-        # add the verified role to every member that is verified
-        if verified_role is not None:
-            for member in server.members:
-                if self.discord_user_info(member.id)['verification_status'] == 'VERIFIED':
-                    await member.add_roles(verified_role)
+class VerifiedRoleSync:
+    """A background job of giving a server's verified role to its verified members who don't have it yet.
+    The members missing the role are found with a single query and the role is added to up to CONCURRENCY of them
+    at once. discord.py waits out rate limits by itself, and requests which fail nonetheless are retried
+    with exponential backoff. Progress is reported by editing a message no more often than every
+    MIN_EDIT_INTERVAL_IN_SECONDS. Unfinished jobs are stored in the database, so that they are resumed after a restart,
+    with the members missing the role found anew.
+    """
+    CONCURRENCY = 4
+    MAX_ATTEMPT_COUNT = 5
+    INITIAL_RETRY_DELAY_IN_SECONDS = 2
+    MIN_EDIT_INTERVAL_IN_SECONDS = 5
+
+    running_jobs = {}
+
+    def __init__(self, server: discord.Guild, role: discord.Role, channel: discord.TextChannel = None):
+        self.server = server
+        self.role = role
+        self.channel = channel
+        self.member_count = 0
+        self.added_count = 0
+        self.failed_count = 0
+        self.is_forbidden = False
+        self.message = None
+        self.update_time = None
+        self.is_being_updated = False
+
+    @classmethod
+    def start(cls, server: discord.Guild, role: discord.Role, channel: discord.TextChannel = None):
+        """Starts giving the role to verified members of the server, replacing the server's job already running."""
+        cls.cancel(server)
+        job = asyncio.ensure_future(cls(server, role, channel).run())
+        cls.running_jobs[server.id] = job
+
+        def forget_job(_):
+            if cls.running_jobs.get(server.id) is job:
+                del cls.running_jobs[server.id]
+
+        job.add_done_callback(forget_job)
+
+    @classmethod
+    def cancel(cls, server: discord.Guild):
+        """Cancels the server's job, if there is one running."""
+        job = cls.running_jobs.pop(server.id, None)
+        if job is not None:
+            job.cancel()
+
+    @classmethod
+    async def resume(cls):
+        """Resumes unfinished jobs which aren't running, forgetting those of servers or roles which are gone."""
+        for server_id, role_id, channel_id in await Database.run_in_read_executor(verifier.get_verified_role_sync_jobs):
+            if server_id in cls.running_jobs:
+                continue
+            server = somsiad.bot.get_guild(server_id)
+            role = None
+            if server is not None:
+                for server_role in server.roles:
+                    if server_role.id == role_id:
+                        role = server_role
+                        break
+            if role is None:
+                await verifier.remove_verified_role_sync_job_async(server_id, role_id)
+            else:
+                cls.start(server, role, None if channel_id is None else server.get_channel(channel_id))
+
+    async def run(self):
+        """Gives the role to verified members of the server who don't have it and removes the job once it's done."""
+        members_by_id = {member.id: member for member in self.server.members if self.role not in member.roles}
+        verified_reddit_usernames = await verifier.get_verified_reddit_usernames_async(members_by_id.keys())
+        members = [members_by_id[member_id] for member_id, _ in verified_reddit_usernames]
+        self.member_count = len(members)
+        if members:
+            await self.update_message()
+            remaining_members = iter(members)
+            await asyncio.gather(
+                *(self._add_role_to_members(remaining_members) for _ in range(min(self.CONCURRENCY, len(members))))
+            )
+            await self.update_message(is_final=True)
+        # A job which can't be completed due to missing permissions isn't resumed either
+        await verifier.remove_verified_role_sync_job_async(self.server.id, self.role.id)
+
+    async def _add_role_to_members(self, remaining_members: Iterable[discord.Member]):
+        """Takes members from the iterator shared between workers and adds the role to them one by one."""
+        for member in remaining_members:
+            if self.is_forbidden:
+                return
+            try:
+                if await self._add_role(member):
+                    self.added_count += 1
+                else:
+                    self.failed_count += 1
+            except discord.Forbidden:
+                self.is_forbidden = True
+                return
+            await self.update_message()
+
+    async def _add_role(self, member: discord.Member) -> bool:
+        """Adds the role to the member, retrying with exponential backoff. Returns whether the role has been added,
+        which isn't the case if the member has left the server or adding the role has failed every time.
+        """
+        for attempt in range(self.MAX_ATTEMPT_COUNT):
+            try:
+                await member.add_roles(self.role, reason=verifier.FOOTER_TEXT)
+            except discord.Forbidden:
+                raise
+            except discord.NotFound:
+                return False
+            except discord.HTTPException:
+                if attempt < self.MAX_ATTEMPT_COUNT - 1:
+                    await asyncio.sleep(self.INITIAL_RETRY_DELAY_IN_SECONDS * 2 ** attempt)
+            else:
+                return True
+        return False
+
+    async def update_message(self, *, is_final: bool = False):
+        """Sends or edits the progress message if it's been long enough, skipping updates which would come too early.
+        The final update is never skipped, as it's only made once all workers are done.
+        """
+        if self.channel is None:
+            return
+        now = asyncio.get_event_loop().time()
+        if not is_final and (
+                self.is_being_updated or
+                (self.update_time is not None and now - self.update_time < self.MIN_EDIT_INTERVAL_IN_SECONDS)
+        ):
+            return
+        self.is_being_updated = True
+        self.update_time = now
+        progress = f'{self.added_count + self.failed_count} z {self.member_count}'
+        if not is_final:
+            embed = discord.Embed(
+                title=f':hourglass_flowing_sand: Przyznawanie roli {self.role} zweryfikowanym użytkownikom…',
+                description=f'Przetworzono dotąd {progress} zweryfikowanych użytkowników, '
+                'którzy nie mieli tej roli.',
+                color=somsiad.color
+            )
+        elif self.is_forbidden:
+            embed = discord.Embed(
+                title=f':warning: Przerwano przyznawanie roli {self.role} zweryfikowanym użytkownikom',
+                description=f'Brak uprawnień do przyznania tej roli. Przetworzono {progress} zweryfikowanych '
+                'użytkowników, którzy jej nie mieli.',
+                color=somsiad.color
+            )
+        else:
+            embed = discord.Embed(
+                title=f':white_check_mark: Przyznano rolę {self.role} zweryfikowanym użytkownikom',
+                description=f'Przetworzono {progress} zweryfikowanych użytkowników, którzy nie mieli tej roli.',
+                color=somsiad.color
+            )
+        embed.add_field(name='Przyznano', value=self.added_count)
+        if self.failed_count:
+            embed.add_field(name='Nie udało się przyznać', value=self.failed_count)
+        embed.set_footer(text=verifier.FOOTER_TEXT)
+        try:
+            if self.message is None:
+                self.message = await self.channel.send(embed=embed)
+            else:
+                await self.message.edit(embed=embed)
+        except discord.HTTPException:
+            pass
+        finally:
+            self.is_being_updated = False
 
 
 class RedditVerificationMessageScout:
-    _db_path = None
-    _reddit = None
-    _verifier = None
-    _server_data_manager = None
-
-    def __init__(self, db_path):
-        """Runs message processing in a new thread."""
-        self._db_path = db_path
-        loop = asyncio.get_event_loop()
-        thread = threading.Thread(target=self._run, args=(loop,))
-        thread.daemon = True
-        thread.start()
-
-    def _run(self, loop):
-        """Ensures that message processing is running."""
-        asyncio.set_event_loop(loop)
-        self._reddit = praw.Reddit(
+    """Polls the Reddit inbox for verification messages and processes them on the event loop.
+    praw is blocking and not thread-safe, so all of its calls are made in a single thread of their own.
+    Messages are processed in batches, so that rushes of them are handled with few round trips.
+    Failed Reddit requests are retried a few times with exponential backoff, and if they keep failing,
+    the inbox is polled again later, as unprocessed messages stay unread.
+    """
+    POLL_INTERVAL_IN_SECONDS = 15
+    BATCH_SIZE = 100
+    MAX_ATTEMPT_COUNT = 5
+    INITIAL_RETRY_DELAY_IN_SECONDS = 2
+    RETRIABLE_EXCEPTIONS = (prawcore.exceptions.RequestException, prawcore.exceptions.ServerError)
+
+    def __init__(self, verifier: RedditVerifier):
+        self._verifier = verifier
+        self._reddit = None
+        self._reddit_executor = concurrent.futures.ThreadPoolExecutor(1)
+        self._polling = None
+
+    def start(self):
+        if self._polling is None:
+            self._polling = asyncio.ensure_future(self.poll_continuously())
+
+    def _connect(self) -> praw.Reddit:
+        return praw.Reddit(
             client_id=somsiad.conf['reddit_id'],
             client_secret=somsiad.conf['reddit_secret'],
             username=somsiad.conf['reddit_username'],
             password=somsiad.conf['reddit_password'],
             user_agent=somsiad.user_agent
         )
-        self._verifier = RedditVerifier(self._db_path)
-        self._server_data_manager = ServerDataManager()
 
-        while True:
+    def _fetch_unread_messages(self) -> List[praw.models.Message]:
+        if self._reddit is None:
+            self._reddit = self._connect()
+        return list(self._reddit.inbox.unread(limit=None))
+
+    async def _call_reddit(self, function: Callable[..., Any], *args) -> Any:
+        """Calls the function in the praw thread, retrying with exponential backoff if Reddit can't be reached."""
+        loop = asyncio.get_event_loop()
+        for attempt in range(1, self.MAX_ATTEMPT_COUNT + 1):
             try:
-                self._process_unread_messages()
-            except:
-                somsiad.logger.warning(
-                    'Something went wrong while trying to process Reddit verification messages! Trying again...'
-                )
+                return await loop.run_in_executor(self._reddit_executor, function, *args)
+            except self.RETRIABLE_EXCEPTIONS as e:
+                if attempt == self.MAX_ATTEMPT_COUNT:
+                    raise
+                retry_delay = self.INITIAL_RETRY_DELAY_IN_SECONDS * 2 ** (attempt - 1)
+                somsiad.logger.warning(f'Reddit request failed: "{e}". Retrying in {retry_delay} s...')
+                await asyncio.sleep(retry_delay)
 
-    def _process_unread_messages(self):
-        """Processes new messages from the inbox stream and uses them for verification."""
-        # Handle each new message
-        for message in praw.models.util.stream_generator(self._reddit.inbox.unread):
-            self.process_message(message)
-
-    def process_message(self, message: praw.models.Message):
-        reddit_username = str(message.author)
-        self._verifier.add_reddit_user(reddit_username)
-        if message.subject == 'Weryfikacja':
-            # Check if (and when) Reddit account was verified
-            phrase = message.body.strip().strip('"\'')
-            reddit_user_info = self._verifier.reddit_user_info(str(message.author))
-            if reddit_user_info['discord_user_id'] is None:
-                # Check if the phrase is in the database
-
-                if self._verifier.phrase_info(phrase)['discord_user_id'] is None:
-                    message.reply(
-                        'Weryfikacja nie powiodła się. Wysłana fraza nie odpowiada żadnemu użytkownikowi Discorda.'
-                    )
+    @staticmethod
+    async def _call_verifier(function: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_event_loop().run_in_executor(None, function, *args)
 
-                else:
-                    # Check if the phrase was sent the same day it was generated
-                    message_sent_date = dt.date.fromtimestamp(message.created_utc)
-                    phrase_info = self._verifier.phrase_info(phrase)
-                    if message_sent_date == phrase_info['phrase_gen_date']:
-                        if self._verifier.is_reddit_user_trustworthy(message.author):
-                            # If the phrase was indeed sent the same day it was generated
-                            # and the user seems to be trustworthy,
-                            # assign the Reddit username to the Discord user whose secret phrase this was
-                            self._verifier.verify_user(reddit_username, phrase)
-                            discord_user = somsiad.bot.get_user(phrase_info['discord_user_id'])
-                            self._verifier.add_verified_roles_to_discord_user(phrase_info['discord_user_id'])
-                            self._verifier.log_verification_result(
-                                phrase_info['discord_user_id'],
-                                reddit_username,
-                                success=True,
-                                thread_server_data_manager=self._server_data_manager
-                            )
-                            message.reply(
-                                f'Pomyślnie zweryfikowano! Przypisano to konto do użytkownika Discorda '
-                                f'{discord_user}.'
-                            )
-                        else:
-                            self._verifier.reject_user(reddit_username, phrase, 'NOT_TRUSTWORTHY')
-                            account_min_age_in_days = int(somsiad.conf['reddit_account_min_age_in_days'])
-                            self._verifier.log_verification_result(
-                                phrase_info['discord_user_id'],
-                                reddit_username,
-                                success=False,
-                                personal_reason='twoje konto na Reddicie nie spełnia wymagań. '
-                                f'Do weryfikacji potrzebne jest konto założone co najmniej '
-                                f'{TextFormatter.word_number_variant(account_min_age_in_days, "dzień", "dni")} temu '
-                                f'i o karmie nie niższej niż {somsiad.conf["reddit_account_min_karma"]}',
-                                log_reason='jego konto na Reddicie nie spełniło wymagań',
-                                thread_server_data_manager=self._server_data_manager
-                            )
-                            message.reply(
-                                'Weryfikacja nie powiodła się. Twoje konto na Reddicie nie spełnia wymagań. '
-                                f'Do weryfikacji potrzebne jest konto założone co najmniej '
-                                f'{TextFormatter.word_number_variant(account_min_age_in_days, "dzień", "dni")} temu '
-                                f'i o karmie nie niższej niż {somsiad.conf["reddit_account_min_karma"]}.'
-                            )
+    async def poll_continuously(self):
+        """Processes unread messages, then waits until it's time to poll the inbox again."""
+        while True:
+            try:
+                await self.process_unread_messages()
+            except Exception as e:
+                somsiad.logger.error(f'Processing Reddit verification messages failed: "{e}". Trying again later...')
+            await asyncio.sleep(self.POLL_INTERVAL_IN_SECONDS)
 
-                    else:
-                        self._verifier.reject_user(reddit_username, phrase, 'PHRASE_EXPIRED')
-                        self._verifier.log_verification_result(
-                            phrase_info['discord_user_id'],
-                            reddit_username,
-                            success=False,
-                            personal_reason='twoja fraza wygasła. Wygeneruj nową frazę za pomocą komendy '
-                            f'{somsiad.conf["command_prefix"]}weryfikacja zweryfikuj',
-                            log_reason='jego fraza wygasła',
-                            thread_server_data_manager=self._server_data_manager
-                        )
-                        message.reply(
-                            'Weryfikacja nie powiodła się. Wysłana fraza wygasła. Wygeneruj nową frazę '
-                            'na Discordzie.'
-                        )
+    async def process_unread_messages(self):
+        """Drains the inbox in batches of up to BATCH_SIZE messages which haven't been read yet, oldest first."""
+        unread_messages = list(reversed(await self._call_reddit(self._fetch_unread_messages)))
+        for batch_start in range(0, len(unread_messages), self.BATCH_SIZE):
+            await self.process_messages(unread_messages[batch_start:batch_start + self.BATCH_SIZE])
 
-            else:
-                discord_user_id = self._verifier.reddit_user_info(reddit_username)['discord_user_id']
-                discord_user = somsiad.bot.get_user(discord_user_id)
-                message.reply(
+    @staticmethod
+    def _get_phrase(message: praw.models.Message) -> str:
+        return message.body.strip().strip('"\'')
+
+    def _check_trustworthiness(self, messages: Sequence[praw.models.Message]) -> Dict[str, bool]:
+        """Returns whether authors of the messages seem trustworthy, by username. Authors are fetched in bulk,
+        with a request per 100 of them, if praw supports it, and one by one otherwise.
+        Authors who can't be checked, such as suspended ones, are deemed untrustworthy, so that they don't fail
+        the whole batch, while errors of connection to Reddit are raised, so that the check is retried.
+        """
+        authors = {str(message.author): message.author for message in messages}
+        author_fullnames = {getattr(message, 'author_fullname', None) for message in messages}
+        if None not in author_fullnames and hasattr(self._reddit.redditors, 'partial_redditors'):
+            for partial_redditor in self._reddit.redditors.partial_redditors(author_fullnames):
+                authors[partial_redditor.name] = partial_redditor
+        trustworthiness = {}
+        for reddit_username, author in authors.items():
+            try:
+                trustworthiness[reddit_username] = self._verifier.is_reddit_user_trustworthy(author)
+            except self.RETRIABLE_EXCEPTIONS:
+                raise
+            except Exception as e:
+                somsiad.logger.warning(
+                    f'Checking trustworthiness of Reddit user {reddit_username} failed: "{e}". '
+                    'Deeming the user untrustworthy.'
+                )
+                trustworthiness[reddit_username] = False
+        return trustworthiness
+
+    def _mark_read(self, messages: Sequence[praw.models.Message]):
+        self._reddit.inbox.mark_read(list(messages))
+
+    async def process_messages(self, messages: Sequence[praw.models.Message]):
+        """Processes a batch of messages and uses them for verification.
+        Authors and phrases are looked up within a single read, authors who may get verified are fetched from Reddit
+        in bulk and results, along with new authors, are saved in a single transaction. Every message is replied to
+        separately, as Reddit has no way to do it in bulk, and then all of them are marked as read in one request.
+        """
+        verification_messages = [message for message in messages if message.subject == 'Weryfikacja']
+        reddit_user_infos, phrase_infos = await self._call_verifier(
+            self._verifier.look_up_verification_attempts,
+            [str(message.author) for message in verification_messages],
+            [self._get_phrase(message) for message in verification_messages]
+        )
+        today = dt.date.today()
+        trustworthiness_candidates = [
+            message for message in verification_messages
+            if reddit_user_infos[str(message.author)].discord_user_id is None
+            and self._get_phrase(message) in phrase_infos
+            and dt.date.fromtimestamp(message.created_utc) == phrase_infos[self._get_phrase(message)].phrase_gen_date
+        ]
+        trustworthiness = (
+            await self._call_reddit(self._check_trustworthiness, trustworthiness_candidates)
+            if trustworthiness_candidates else {}
+        )
+
+        # Messages are decided on in order, so that a batch has the same outcome as processing them one by one
+        verification_results = []
+        outcomes = []
+        for message in verification_messages:
+            reddit_username = str(message.author)
+            phrase = self._get_phrase(message)
+            reddit_user_info = reddit_user_infos[reddit_username]
+            if reddit_user_info.discord_user_id is not None:
+                discord_user = somsiad.bot.get_user(reddit_user_info.discord_user_id)
+                outcomes.append((
+                    message,
                     f'To konto zostało przypisane do użytkownika Discorda {discord_user} '
-                    f'{reddit_user_info["verification_rejection_date"].strftime("%-d %B %Y")}.'
+                    f'{reddit_user_info.verification_rejection_date.strftime("%-d %B %Y")}.',
+                    None, None
+                ))
+                continue
+            # Either way the phrase can't be used again
+            phrase_info = phrase_infos.pop(phrase, None)
+            if phrase_info is None:
+                outcomes.append((
+                    message,
+                    'Weryfikacja nie powiodła się. Wysłana fraza nie odpowiada żadnemu użytkownikowi Discorda.',
+                    None, None
+                ))
+            elif dt.date.fromtimestamp(message.created_utc) != phrase_info.phrase_gen_date:
+                verification_results.append((reddit_username, phrase, 'REJECTED_PHRASE_EXPIRED'))
+                outcomes.append((
+                    message,
+                    'Weryfikacja nie powiodła się. Wysłana fraza wygasła. Wygeneruj nową frazę na Discordzie.',
+                    len(verification_results) - 1,
+                    {
+                        'discord_user_id': phrase_info.discord_user_id, 'reddit_username': reddit_username,
+                        'success': False,
+                        'personal_reason': 'twoja fraza wygasła. Wygeneruj nową frazę za pomocą komendy '
+                        f'{somsiad.conf["command_prefix"]}weryfikacja zweryfikuj',
+                        'log_reason': 'jego fraza wygasła'
+                    }
+                ))
+            elif trustworthiness[reddit_username]:
+                # If the phrase was indeed sent the same day it was generated and the user seems to be trustworthy,
+                # assign the Reddit username to the Discord user whose secret phrase this was
+                verification_results.append((reddit_username, phrase, 'VERIFIED'))
+                reddit_user_infos[reddit_username] = reddit_user_info._replace(
+                    discord_user_id=phrase_info.discord_user_id, verification_status='VERIFIED',
+                    verification_rejection_date=today
+                )
+                discord_user = somsiad.bot.get_user(phrase_info.discord_user_id)
+                outcomes.append((
+                    message,
+                    f'Pomyślnie zweryfikowano! Przypisano to konto do użytkownika Discorda {discord_user}.',
+                    len(verification_results) - 1,
+                    {
+                        'discord_user_id': phrase_info.discord_user_id, 'reddit_username': reddit_username,
+                        'success': True
+                    }
+                ))
+            else:
+                verification_results.append((reddit_username, phrase, 'REJECTED_NOT_TRUSTWORTHY'))
+                account_min_age_in_days = int(somsiad.conf['reddit_account_min_age_in_days'])
+                requirements = (
+                    'Do weryfikacji potrzebne jest konto założone co najmniej '
+                    f'{TextFormatter.word_number_variant(account_min_age_in_days, "dzień", "dni")} temu '
+                    f'i o karmie nie niższej niż {somsiad.conf["reddit_account_min_karma"]}'
                 )
+                outcomes.append((
+                    message,
+                    f'Weryfikacja nie powiodła się. Twoje konto na Reddicie nie spełnia wymagań. {requirements}.',
+                    len(verification_results) - 1,
+                    {
+                        'discord_user_id': phrase_info.discord_user_id, 'reddit_username': reddit_username,
+                        'success': False,
+                        'personal_reason': f'twoje konto na Reddicie nie spełnia wymagań. {requirements}',
+                        'log_reason': 'jego konto na Reddicie nie spełniło wymagań'
+                    }
+                ))
+
+        are_applied = await self._call_verifier(
+            self._verifier.apply_verification_results, [str(message.author) for message in messages],
+            verification_results
+        )
 
-        message.mark_read()
+        # Results of the whole batch have been saved, so every message is marked as read even if following up on it
+        # fails, as processing it again would be based on its own result
+        for message, reply, result_index, verification_result in outcomes:
+            if result_index is not None and not are_applied[result_index]:
+                # The phrase or the Reddit user has been taken in the meantime, so nothing has actually changed
+                reply = (
+                    'Weryfikacja nie powiodła się. Wysłana fraza nie jest już aktualna lub to konto zostało '
+                    'w międzyczasie przypisane do innego użytkownika Discorda.'
+                )
+                verification_result = None
+            try:
+                if verification_result is not None:
+                    if verification_result['success']:
+                        await self._verifier.add_verified_roles_to_discord_user(verification_result['discord_user_id'])
+                    await self._verifier.log_verification_result(**verification_result)
+                await self._call_reddit(message.reply, reply)
+            except Exception as e:
+                somsiad.logger.error(f'Following up on Reddit verification message {message.id} failed: "{e}"')
+        await self._call_reddit(self._mark_read, messages)
 
 
 phrase_parts_file_path = os.path.join(somsiad.bot_dir_path, 'data', 'reddit_verification_phrase_parts.json')
@@ -560,6 +819,13 @@ async def verification(ctx):
         '(jeśli należy on do serwera na którym użyto komendy) lub, jeśli nie podano argumentu, dla ciebie.',
         inline=False
     )
+    embed.add_field(
+        name=f'prześwietl (przeswietl) everyone|here <?strona>',
+        value='Wyświetla zweryfikowanych członków serwera (everyone) lub kanału (here). Długa lista dzielona jest '
+        'na strony - domyślnie wyświetlana jest pierwsza, a podanie <?strony> pozwala wyświetlić kolejną. '
+        'Działa tylko dla członków mających uprawnienie do zarządzania rolami.',
+        inline=False
+    )
     embed.add_field(
         name=f'rola <?rola>',
         value='Ustawia <?rolę> jako rolę automatycznie nadawaną członkom serwera po pomyślnej weryfikacji konta na '
@@ -578,13 +844,13 @@ async def verification(ctx):
 async def verification_begin(ctx):
     """Starts the Reddit account verification process for the invoking Discord user."""
     discord_user_id = ctx.author.id
-    discord_user_info = verifier.discord_user_info(discord_user_id)
+    discord_user_info = await verifier.discord_user_info_async(discord_user_id)
 
-    if (discord_user_info['verification_status'] is None
-            or str(discord_user_info['verification_status']) == 'REJECTED_PHRASE_EXPIRED'):
+    if (discord_user_info.verification_status is None
+            or str(discord_user_info.verification_status) == 'REJECTED_PHRASE_EXPIRED'):
         # If user has never requested verification or his phrase expired,
         # add him to the database and assign a phrase to him
-        phrase = verifier.assign_phrase(discord_user_id)
+        phrase = await verifier.assign_phrase_async(discord_user_id)
 
         message_url = ('https://www.reddit.com/message/compose/'
             f'?to={somsiad.conf["reddit_username"]}&subject=Weryfikacja&message={phrase}')
@@ -597,17 +863,17 @@ async def verification_begin(ctx):
         )
         embed.add_field(name='Najlepiej skorzystaj z linku', value=message_url)
 
-    elif (discord_user_info['verification_status'] == 'AWAITING_MESSAGE'
-            or discord_user_info['verification_status'] == 'REJECTED_NOT_TRUSTWORTHY'):
-        if discord_user_info['phrase_gen_date'] == dt.date.today():
+    elif (discord_user_info.verification_status == 'AWAITING_MESSAGE'
+            or discord_user_info.verification_status == 'REJECTED_NOT_TRUSTWORTHY'):
+        if discord_user_info.phrase_gen_date == dt.date.today():
             # If user already has requested verification today or has been rejected due to not meeting requirements,
             # fend him off
-            if discord_user_info['verification_status'] == 'AWAITING_MESSAGE':
+            if discord_user_info.verification_status == 'AWAITING_MESSAGE':
                 embed = discord.Embed(title='Już zażądałeś dziś weryfikacji', color=somsiad.color)
                 embed.add_field(
                     name='Sprawdź historię wiadomości', value='Wygenerowana fraza ważna jest do końca dnia.'
                 )
-            elif discord_user_info['verification_status'] == 'REJECTED_NOT_TRUSTWORTHY':
+            elif discord_user_info.verification_status == 'REJECTED_NOT_TRUSTWORTHY':
                 embed = discord.Embed(title='Już zażądałeś dziś weryfikacji', color=somsiad.color)
                 embed.add_field(
                     name='Weryfikacja nie powiodła się dzisiaj, bo twoje konto na Reddicie nie spełnia wymagań',
@@ -621,7 +887,7 @@ async def verification_begin(ctx):
 
         else:
             # If user has requested verification but not today, assign him a new phrase
-            phrase = verifier.assign_phrase(discord_user_id)
+            phrase = await verifier.assign_phrase_async(discord_user_id)
 
             message_url = ('https://www.reddit.com/message/compose/'
                 f'?to={somsiad.conf["reddit_username"]}&subject=Weryfikacja&message={phrase}')
@@ -635,11 +901,11 @@ async def verification_begin(ctx):
             )
             embed.add_field(name='Najlepiej skorzystaj z linku', value=message_url)
 
-    elif discord_user_info['verification_status'] == 'VERIFIED':
+    elif discord_user_info.verification_status == 'VERIFIED':
         embed = discord.Embed(title='Już jesteś zweryfikowany', color=somsiad.color)
         embed.add_field(
-            name=f'Twoje konto na Reddicie to /u/{discord_user_info["reddit_username"]}',
-            value=f'Zweryfikowano {discord_user_info["verification_rejection_date"].strftime("%-d %B %Y")}.'
+            name=f'Twoje konto na Reddicie to /u/{discord_user_info.reddit_username}',
+            value=f'Zweryfikowano {discord_user_info.verification_rejection_date.strftime("%-d %B %Y")}.'
         )
     else:
         embed = discord.Embed(
@@ -650,6 +916,38 @@ async def verification_begin(ctx):
     await ctx.author.send(embed=embed)
 
 
+async def embed_verified_members(
+        title: str, members: Iterable[discord.Member], page_number: int, argument: str
+) -> discord.Embed:
+    """Returns an embed listing the page of verified members among the provided ones.
+    Members are looked up in bulk and listed in alphabetical order, as many per page as an embed can hold.
+    If there's more than one page, usage of the command with the argument and a page number is explained.
+    """
+    members_by_id = {member.id: member for member in members}
+    verified_members = sorted(
+        (
+            (members_by_id[member_id], reddit_username) for member_id, reddit_username
+            in await verifier.get_verified_reddit_usernames_async(members_by_id.keys())
+        ),
+        key=lambda verified_member: str(verified_member[0]).lower()
+    )
+    page_count = max((len(verified_members) - 1) // verifier.MAX_EMBED_FIELD_COUNT + 1, 1)
+    page_number = min(max(page_number, 1), page_count)
+    description = TextFormatter.word_number_variant(
+        len(verified_members), 'zweryfikowany użytkownik', 'zweryfikowanych użytkowników'
+    )
+    if page_count > 1:
+        description += (
+            f'. Strona {page_number} z {page_count} – by zobaczyć inną, użyj komendy '
+            f'{somsiad.conf["command_prefix"]}weryfikacja prześwietl {argument} <strona>'
+        )
+    embed = discord.Embed(title=title, description=f'{description}.', color=somsiad.color)
+    page_start = (page_number - 1) * verifier.MAX_EMBED_FIELD_COUNT
+    for member, reddit_username in verified_members[page_start:page_start + verifier.MAX_EMBED_FIELD_COUNT]:
+        embed.add_field(name=str(member), value=f'/u/{reddit_username}', inline=False)
+    return embed
+
+
 @verification.command(aliases=['prześwietl', 'przeswietl'])
 @discord.ext.commands.cooldown(
     1, somsiad.conf['command_cooldown_per_user_in_seconds'], discord.ext.commands.BucketType.user
@@ -659,40 +957,23 @@ async def verification_xray(ctx, *args):
     """Checks given user's verification status.
     If no user was given, assumes message author.
     If the argument passed was "@here" or "here" or "@everyone" or "everyone",
-    returns a list of verified members of, respectively, the channel or the server.
+    returns a list of verified members of, respectively, the channel or the server,
+    paged if needed, with the page number being the optional second argument.
     """
 
-    if (len(args) == 1 and args[0].strip('@\\') == 'everyone' and
-            ctx.channel.permissions_for(ctx.author).manage_roles
-    ):
-        embed = discord.Embed(
-            title='Zweryfikowani użytkownicy na tym serwerze',
-            color=somsiad.color
-        )
-        for member in ctx.guild.members:
-            discord_user_info = verifier.discord_user_info(member.id)
-            if discord_user_info['verification_status'] == 'VERIFIED':
-                embed.add_field(
-                    name=str(member),
-                    value=f'/u/{discord_user_info["reddit_username"]}',
-                    inline=False
-                )
-
-    elif (len(args) == 1 and args[0].strip('@\\') == 'here' and
-            ctx.channel.permissions_for(ctx.author).manage_roles
+    if (
+            1 <= len(args) <= 2 and args[0].strip('@\\') in ('everyone', 'here') and
+            (len(args) == 1 or args[1].isdigit()) and ctx.channel.permissions_for(ctx.author).manage_roles
     ):
-        embed = discord.Embed(
-            title='Zweryfikowani użytkownicy na tym kanale',
-            color=somsiad.color
-        )
-        for member in ctx.channel.members:
-            discord_user_info = verifier.discord_user_info(member.id)
-            if discord_user_info['verification_status'] == 'VERIFIED':
-                embed.add_field(
-                    name=str(member),
-                    value=f'/u/{discord_user_info["reddit_username"]}',
-                    inline=False
-                )
+        page_number = 1 if len(args) == 1 else int(args[1])
+        if args[0].strip('@\\') == 'everyone':
+            embed = await embed_verified_members(
+                'Zweryfikowani użytkownicy na tym serwerze', ctx.guild.members, page_number, 'everyone'
+            )
+        else:
+            embed = await embed_verified_members(
+                'Zweryfikowani użytkownicy na tym kanale', ctx.channel.members, page_number, 'here'
+            )
 
     else:
         if not args:
@@ -702,20 +983,20 @@ async def verification_xray(ctx, *args):
             argument = ' '.join(args)
             discord_user = await somsiad.member_converter.convert(ctx, argument)
 
-        discord_user_info = verifier.discord_user_info(discord_user.id)
+        discord_user_info = await verifier.discord_user_info_async(discord_user.id)
         # Check if (and when) user has already been verified
-        if discord_user_info['verification_status'] is None:
+        if discord_user_info.verification_status is None:
             embed = discord.Embed(
                 title=':red_circle: Niezweryfikowany',
                 description=f'Użytkownik {discord_user.mention} nigdy nie zażądał weryfikacji.',
                 color=somsiad.color
             )
         else:
-            if discord_user_info['verification_status'] == 'VERIFIED':
+            if discord_user_info.verification_status == 'VERIFIED':
                 if ctx.channel.permissions_for(ctx.author).manage_roles:
-                    more_info = (f' {discord_user_info["verification_rejection_date"].strftime("%-d %B %Y")} '
-                    f'jako [/u/{discord_user_info["reddit_username"]}]'
-                    f'(https://www.reddit.com/user/{discord_user_info["reddit_username"]})')
+                    more_info = (f' {discord_user_info.verification_rejection_date.strftime("%-d %B %Y")} '
+                    f'jako [/u/{discord_user_info.reddit_username}]'
+                    f'(https://www.reddit.com/user/{discord_user_info.reddit_username})')
                 else:
                     more_info = ''
                 embed = discord.Embed(
@@ -723,29 +1004,29 @@ async def verification_xray(ctx, *args):
                     description=f'Użytkownik {discord_user.mention} został zweryfikowany{more_info}.',
                     color=somsiad.color
                 )
-            elif str(discord_user_info['verification_status']) == 'REJECTED_NOT_TRUSTWORTHY':
+            elif str(discord_user_info.verification_status) == 'REJECTED_NOT_TRUSTWORTHY':
                 embed = discord.Embed(
                     title=':red_circle: Niezweryfikowany',
                     description=f'Użytkownik {discord_user.mention} zażądał ostatnio weryfikacji '
-                    f'{discord_user_info["phrase_gen_date"].strftime("%-d %B %Y")} i spróbował się zweryfikować '
-                    f'{discord_user_info["verification_rejection_date"].strftime("%-d %B %Y")}, lecz jego konto '
+                    f'{discord_user_info.phrase_gen_date.strftime("%-d %B %Y")} i spróbował się zweryfikować '
+                    f'{discord_user_info.verification_rejection_date.strftime("%-d %B %Y")}, lecz jego konto '
                     'nie spełniało wymagań.',
                     color=somsiad.color
                 )
-            elif str(discord_user_info['verification_status']) == 'REJECTED_PHRASE_EXPIRED':
+            elif str(discord_user_info.verification_status) == 'REJECTED_PHRASE_EXPIRED':
                 embed = discord.Embed(
                     title=':red_circle: Niezweryfikowany',
                     description=f'Użytkownik {discord_user.mention} zażądał ostatnio weryfikacji '
-                    f'{discord_user_info["phrase_gen_date"].strftime("%-d %B %Y")}, ale nie dokończył jej na Reddicie '
+                    f'{discord_user_info.phrase_gen_date.strftime("%-d %B %Y")}, ale nie dokończył jej na Reddicie '
                     'w wyznaczonym czasie - wysłał wiadomość '
-                    f'{discord_user_info["verification_rejection_date"].strftime("%-d %B %Y")}.',
+                    f'{discord_user_info.verification_rejection_date.strftime("%-d %B %Y")}.',
                     color=somsiad.color
                 )
-            elif str(discord_user_info['verification_status']) == 'AWAITING_MESSAGE':
+            elif str(discord_user_info.verification_status) == 'AWAITING_MESSAGE':
                 embed = discord.Embed(
                     title=':red_circle: Niezweryfikowany',
                     description=f'Użytkownik {discord_user.mention} zażądał ostatnio weryfikacji '
-                    f'{discord_user_info["phrase_gen_date"].strftime("%-d %B %Y")}, ale nie dokończył jej na Reddicie.',
+                    f'{discord_user_info.phrase_gen_date.strftime("%-d %B %Y")}, ale nie dokończył jej na Reddicie.',
                     color=somsiad.color
                 )
             else:
@@ -780,18 +1061,19 @@ async def verification_xray_error(ctx, error):
 async def verification_role(ctx, *, role: discord.Role = None):
     """Sets the role to be given automatically to verified members."""
     if role is None:
-        verifier.set_discord_server_setting(ctx.guild.id, 'verified_role_id', None)
+        await verifier.set_verified_role_async(ctx.guild.id, None)
+        VerifiedRoleSync.cancel(ctx.guild)
         embed = discord.Embed(
             title=':red_circle: Wyłączono przyznawanie roli zweryfikowanym użytkownikom',
             color=somsiad.color
         )
     else:
-        verifier.set_discord_server_setting(ctx.guild.id, 'verified_role_id', role.id)
-        await verifier.add_verified_role_to_members_of_discord_server(ctx.guild)
+        await verifier.set_verified_role_async(ctx.guild.id, role.id, ctx.channel.id)
+        VerifiedRoleSync.start(ctx.guild, role, ctx.channel)
         embed = discord.Embed(
             title=f':white_check_mark: Ustawiono {role} jako rolę weryfikacji',
-            description='Rola została właśnie przyznana już zweryfikowanym użytkownikom. Reszcie zostanie '
-            'przyznana automatycznie, jeśli zweryfikują się.',
+            description='Już zweryfikowanym użytkownikom, którzy nie mają tej roli, zostanie ona przyznana w tle. '
+            'Reszcie zostanie przyznana automatycznie, jeśli zweryfikują się.',
             color=somsiad.color
         )
 
@@ -809,4 +1091,10 @@ async def verification_role_error(ctx, error):
         await ctx.send(ctx.author.mention, embed=embed)
 
 
-reddit_verification_message_scout = RedditVerificationMessageScout(db_path)
+reddit_verification_message_scout = RedditVerificationMessageScout(verifier)
+
+
+@somsiad.bot.listen()
+async def on_ready():
+    reddit_verification_message_scout.start()
+    await VerifiedRoleSync.resume()
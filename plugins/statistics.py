@@ -12,16 +12,295 @@
 # If not, see <https://www.gnu.org/licenses/>.
 
 import io
+import os
+import re
+import json
+import asyncio
+import hashlib
 import datetime as dt
 import calendar
 import locale
-from typing import Union
+import functools
+import collections
+import concurrent.futures
+from typing import Union, Optional, Sequence, List, Dict, Tuple, NamedTuple, Callable, Awaitable
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.ticker as ticker
 import discord
 from somsiad import somsiad
-from utilities import TextFormatter
+from server_data import server_data_manager
+from utilities import TextFormatter, Leaderboard
+
+
+class MessageIndex:
+    """Handles the persistent index of message metadata used for statistics.
+    The in-memory statistics cache is the source of truth while the bot is running, so writes to the index
+    are queued in background instead of being waited for.
+    """
+    TABLE_NAME = 'statistics_messages'
+    TABLE_COLUMNS = (
+        'message_id INTEGER NOT NULL PRIMARY KEY',
+        'author_id INTEGER NOT NULL',
+        'channel_id INTEGER NOT NULL',
+        'posix_timestamp INTEGER NOT NULL',
+        'word_count INTEGER NOT NULL',
+        'character_count INTEGER NOT NULL'
+    )
+    INDEX_NAME = 'statistics_messages_channel_id_message_id'
+    INDEX_COLUMNS = ('channel_id', 'message_id')
+    SYNC_TABLE_NAME = 'statistics_channels'
+    SYNC_TABLE_COLUMNS = (
+        'channel_id INTEGER NOT NULL PRIMARY KEY',
+        'synced_message_id INTEGER NOT NULL'
+    )
+
+    @classmethod
+    async def get_synced_message_id(cls, server_id: int, channel_id: int) -> Optional[int]:
+        """Returns the ID of the newest message up to which the provided channel's history has been indexed
+        or None if the channel's history hasn't been indexed yet.
+        """
+        result = await server_data_manager.fetch_one_async(
+            server_id, 'SELECT synced_message_id FROM statistics_channels WHERE server_id = ? AND channel_id = ?',
+            (server_id, channel_id)
+        )
+        return None if result is None else result['synced_message_id']
+
+    @classmethod
+    def set_synced_message_id(cls, server_id: int, channel_id: int, message_id: int):
+        """Advances the ID of the newest message up to which the provided channel's history has been indexed.
+        Like all writes to the index, this happens in background.
+        """
+        def set_synced_message_id(connection):
+            connection.execute(
+                'INSERT OR IGNORE INTO statistics_channels(server_id, channel_id, synced_message_id) VALUES (?, ?, ?)',
+                (server_id, channel_id, message_id)
+            )
+            connection.execute(
+                '''UPDATE statistics_channels SET synced_message_id = MAX(synced_message_id, ?)
+                WHERE server_id = ? AND channel_id = ?''',
+                (message_id, server_id, channel_id)
+            )
+
+        server_data_manager.submit_in_background(server_id, set_synced_message_id)
+
+    @classmethod
+    async def get_messages(cls, server_id: int, channel_id: int) -> List[Tuple[int, int, int, int, int]]:
+        """Returns (message_id, author_id, posix_timestamp, word_count, character_count) tuples of all indexed
+        messages of the provided channel, ordered old to new.
+        """
+        def get_messages(connection):
+            # Plain tuples are much cheaper than rows for a whole channel's worth of messages
+            cursor = connection.cursor()
+            cursor.row_factory = None
+            return cursor.execute(
+                '''SELECT message_id, author_id, posix_timestamp, word_count, character_count
+                FROM statistics_messages WHERE server_id = ? AND channel_id = ? ORDER BY message_id''',
+                (server_id, channel_id)
+            ).fetchall()
+
+        return await server_data_manager.read_async(server_id, get_messages)
+
+    @classmethod
+    def add_messages(cls, server_id: int, messages: Sequence['Report.Message']):
+        """Adds metadata of the provided messages to the index in a single transaction."""
+        if not messages:
+            return
+        server_data_manager.execute_many_in_background(
+            server_id,
+            '''INSERT OR IGNORE INTO statistics_messages(server_id, message_id, author_id, channel_id, posix_timestamp,
+            word_count, character_count) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            [
+                (
+                    server_id, message.message_id, message.author_id, message.channel_id, message.posix_timestamp,
+                    message.word_count, message.character_count
+                ) for message in messages
+            ]
+        )
+
+    @classmethod
+    def update_message(cls, server_id: int, message_id: int, word_count: int, character_count: int):
+        """Updates word and character counts of the provided message in the index."""
+        server_data_manager.execute_in_background(
+            server_id,
+            'UPDATE statistics_messages SET word_count = ?, character_count = ? WHERE server_id = ? AND message_id = ?',
+            (word_count, character_count, server_id, message_id)
+        )
+
+    @classmethod
+    def remove_messages(cls, server_id: int, message_ids: Sequence[int]):
+        """Removes the provided messages from the index."""
+        server_data_manager.execute_many_in_background(
+            server_id,
+            'DELETE FROM statistics_messages WHERE server_id = ? AND message_id = ?',
+            [(server_id, message_id) for message_id in message_ids]
+        )
+
+    @classmethod
+    def remove_channels_except(cls, server_id: int, existent_channel_ids: Sequence[int]):
+        """Removes messages of channels which no longer exist from the index.
+        Channels to remove are looked up among the server's indexed channels,
+        so that messages of remaining channels and other servers don't have to be scanned.
+        """
+        existent_channel_ids = set(existent_channel_ids)
+
+        def remove_channels_except(connection):
+            removed_channel_ids = [
+                (server_id, row[0]) for row in connection.execute(
+                    'SELECT channel_id FROM statistics_channels WHERE server_id = ?',
+                    (server_id,)
+                ) if row[0] not in existent_channel_ids
+            ]
+            connection.executemany(
+                'DELETE FROM statistics_messages WHERE server_id = ? AND channel_id = ?', removed_channel_ids
+            )
+            connection.executemany(
+                'DELETE FROM statistics_channels WHERE server_id = ? AND channel_id = ?', removed_channel_ids
+            )
+
+        server_data_manager.submit_in_background(server_id, remove_channels_except)
+
+
+server_data_manager.register_table(
+    MessageIndex.TABLE_NAME, MessageIndex.TABLE_COLUMNS, {MessageIndex.INDEX_NAME: MessageIndex.INDEX_COLUMNS},
+    primary_key_scope='global'
+)
+server_data_manager.register_table(
+    MessageIndex.SYNC_TABLE_NAME, MessageIndex.SYNC_TABLE_COLUMNS, primary_key_scope='global'
+)
+
+
+class TimeWindow(discord.ext.commands.Converter):
+    """A range of local dates, both inclusive, which a report is limited to.
+    As a command argument it's either a number of days up to today, e.g. 30d,
+    or a range of dates, e.g. 1.01.2018-31.03.2018 or 2018-01-01..2018-03-31.
+    """
+    DATE_PATTERN = r'\d{1,2}\.\d{1,2}\.\d{4}|\d{4}-\d{1,2}-\d{1,2}'
+    DAYS_PATTERN = re.compile(r'(\d+)d')
+    RANGE_PATTERN = re.compile(rf'({DATE_PATTERN})(?:\.\.|-|–)({DATE_PATTERN})')
+
+    def __init__(self, start_date: dt.date = None, end_date: dt.date = None):
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def __str__(self):
+        return f'{self.start_date.strftime("%-d %b %Y")} – {self.end_date.strftime("%-d %b %Y")}'
+
+    async def convert(self, ctx: discord.ext.commands.Context, argument: str) -> 'TimeWindow':
+        days_match = self.DAYS_PATTERN.fullmatch(argument.lower())
+        if days_match is not None:
+            day_count = int(days_match.group(1))
+            if day_count < 1:
+                raise discord.ext.commands.BadArgument
+            end_date = dt.date.today()
+            return TimeWindow(end_date - dt.timedelta(day_count - 1), end_date)
+        range_match = self.RANGE_PATTERN.fullmatch(argument)
+        if range_match is not None:
+            start_date, end_date = self._parse_date(range_match.group(1)), self._parse_date(range_match.group(2))
+            if start_date <= end_date and start_date <= dt.date.today():
+                return TimeWindow(start_date, end_date)
+        raise discord.ext.commands.BadArgument
+
+    @staticmethod
+    def _parse_date(date_string: str) -> dt.date:
+        try:
+            if '.' in date_string:
+                return dt.datetime.strptime(date_string, '%d.%m.%Y').date()
+            return dt.datetime.strptime(date_string, '%Y-%m-%d').date()
+        except ValueError:
+            raise discord.ext.commands.BadArgument
+
+    @staticmethod
+    def _local_date_to_message_id(date: dt.date) -> int:
+        """Returns the lowest possible ID of a message sent at or after local midnight starting the date."""
+        utc_datetime = dt.datetime.combine(date, dt.time()).astimezone(dt.timezone.utc).replace(tzinfo=None)
+        return discord.utils.time_snowflake(utc_datetime)
+
+    @property
+    def start_message_id(self) -> int:
+        """The lowest possible ID of a message sent within the window."""
+        return self._local_date_to_message_id(self.start_date)
+
+    @property
+    def end_message_id(self) -> int:
+        """The lowest possible ID of a message sent after the window."""
+        return self._local_date_to_message_id(self.end_date + dt.timedelta(1))
+
+
+class ChartCache:
+    """Keeps rendered activity charts as PNG bytes, in memory and optionally on disk, so that charts of reports
+    which haven't changed don't have to be rendered again. Disk is only accessed in executor threads.
+    """
+    _CACHE_DIR_PATH = os.path.join(somsiad.cache_dir_path, 'statistics')
+
+    def __init__(self, max_size_in_memory: int, max_size_on_disk: int = 0):
+        self.max_size_in_memory = max_size_in_memory
+        self.max_size_on_disk = max_size_on_disk
+        self._charts = collections.OrderedDict()
+        if self.max_size_on_disk and not os.path.exists(self._CACHE_DIR_PATH):
+            os.makedirs(self._CACHE_DIR_PATH)
+
+    @staticmethod
+    def key(subject_id: int, *chart_data) -> str:
+        """Returns a digest of the subject and everything the chart is rendered from."""
+        return hashlib.sha256(
+            json.dumps((subject_id, locale.setlocale(locale.LC_ALL), chart_data), sort_keys=True).encode()
+        ).hexdigest()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Returns the chart with the provided key, or None if it isn't cached."""
+        if key in self._charts:
+            self._charts.move_to_end(key)
+            return self._charts[key]
+        if self.max_size_on_disk:
+            chart_bytes = await asyncio.get_event_loop().run_in_executor(None, self._read_from_disk, key)
+            if chart_bytes is not None:
+                self._put_in_memory(key, chart_bytes)
+            return chart_bytes
+        return None
+
+    def put(self, key: str, chart_bytes: bytes):
+        """Caches the chart under the provided key. It's written to disk in background."""
+        self._put_in_memory(key, chart_bytes)
+        if self.max_size_on_disk:
+            asyncio.get_event_loop().run_in_executor(None, self._write_to_disk, key, chart_bytes)
+
+    def _put_in_memory(self, key: str, chart_bytes: bytes):
+        self._charts[key] = chart_bytes
+        self._charts.move_to_end(key)
+        while len(self._charts) > self.max_size_in_memory:
+            self._charts.popitem(last=False)
+
+    def _chart_file_path(self, key: str) -> str:
+        return os.path.join(self._CACHE_DIR_PATH, f'{key}.png')
+
+    def _read_from_disk(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._chart_file_path(key), 'rb') as chart_file:
+                return chart_file.read()
+        except OSError:
+            return None
+
+    def _write_to_disk(self, key: str, chart_bytes: bytes):
+        try:
+            with open(self._chart_file_path(key), 'wb') as chart_file:
+                chart_file.write(chart_bytes)
+            self._prune_disk()
+        except OSError:
+            pass
+
+    def _prune_disk(self):
+        """Removes least recently written charts from disk until there are no more than allowed."""
+        chart_file_paths = [
+            os.path.join(self._CACHE_DIR_PATH, filename) for filename in os.listdir(self._CACHE_DIR_PATH)
+        ]
+        if len(chart_file_paths) > self.max_size_on_disk:
+            chart_file_paths.sort(key=os.path.getmtime)
+            for chart_file_path in chart_file_paths[:-self.max_size_on_disk]:
+                os.remove(chart_file_path)
 
 
 class Report:
@@ -30,19 +309,36 @@ class Report:
     BACKGROUND_COLOR = '#32363c'
     FOREGROUND_COLOR = '#ffffff'
 
+    SYNC_CHUNK_SIZE = 1000
+    SYNC_CONCURRENCY = 4
+    CHART_RENDERING_PROCESS_COUNT = 2
+    CHART_RENDERING_TIMEOUT_IN_SECONDS = 30
+    MAX_PENDING_CHART_COUNT = 6
+    CHART_CACHE_SIZE_IN_MEMORY = 64
+    CHART_CACHE_SIZE_ON_DISK = 512
+
     statistics_cache = {}
+    synced_channel_ids = set()
+    live_messages_during_sync = {}
+    channel_locks = {}
+    chart_rendering_executor = None
+    pending_chart_count = 0
+    chart_cache = ChartCache(CHART_CACHE_SIZE_IN_MEMORY, CHART_CACHE_SIZE_ON_DISK)
 
     plt.style.use('dark_background')
 
     class Message:
+        """A single message, used on its way into the cache."""
+        __slots__ = 'message_id', 'author_id', 'channel_id', 'posix_timestamp', 'word_count', 'character_count'
+
         def __init__(
-                self, message_id: int, author_id: int, channel_id: int, local_datetime: dt.datetime, word_count: int,
+                self, message_id: int, author_id: int, channel_id: int, posix_timestamp: int, word_count: int,
                 character_count: int
         ):
             self.message_id = message_id
             self.author_id = author_id
             self.channel_id = channel_id
-            self.local_datetime = local_datetime
+            self.posix_timestamp = posix_timestamp
             self.word_count = word_count
             self.character_count = character_count
 
@@ -52,9 +348,234 @@ class Report:
             except AttributeError:
                 return False
 
+        @classmethod
+        def from_discord_message(cls, message: discord.Message) -> 'Report.Message':
+            """Creates a message object from a Discord message."""
+            return cls(
+                message.id, message.author.id, message.channel.id,
+                int(message.created_at.replace(tzinfo=dt.timezone.utc).timestamp()),
+                len(message.clean_content.split()), len(message.clean_content)
+            )
+
+    class Columns(NamedTuple):
+        """Parallel arrays of message metadata."""
+        message_ids: np.ndarray
+        author_ids: np.ndarray
+        local_timestamps: np.ndarray
+        word_counts: np.ndarray
+        character_counts: np.ndarray
+
+    class ActivityRollup:
+        """Running activity totals of a channel: message, word and character counts per author per local day
+        and message count histograms by weekday and hour per author.
+        """
+        def __init__(self):
+            self.daily = {}
+            self.hourly = {}
+
+        @classmethod
+        def from_columns(cls, columns: 'Report.Columns') -> 'Report.ActivityRollup':
+            """Builds the rollup from message columns in one pass of vectorized group-bys."""
+            rollup = cls()
+            if not len(columns.message_ids):
+                return rollup
+            local_days = columns.local_timestamps // 86400
+            unique_author_ids, author_indices = np.unique(columns.author_ids, return_inverse=True)
+            author_indices = author_indices.ravel()
+            day_span = int(local_days.max()) + 1
+            unique_keys, key_indices = np.unique(author_indices * day_span + local_days, return_inverse=True)
+            key_indices = key_indices.ravel()
+            message_counts = np.bincount(key_indices)
+            word_counts = np.bincount(key_indices, weights=columns.word_counts).astype(np.int64)
+            character_counts = np.bincount(key_indices, weights=columns.character_counts).astype(np.int64)
+            for key, message_count, word_count, character_count in zip(
+                    unique_keys.tolist(), message_counts.tolist(), word_counts.tolist(), character_counts.tolist()
+            ):
+                author_index, local_day = divmod(key, day_span)
+                rollup.daily.setdefault(int(unique_author_ids[author_index]), {})[local_day] = [
+                    message_count, word_count, character_count
+                ]
+            # 1 January 1970 was a Thursday, which is weekday 3
+            cells = author_indices * 168 + (local_days + 3) % 7 * 24 + columns.local_timestamps // 3600 % 24
+            histograms = np.bincount(cells, minlength=len(unique_author_ids) * 168).reshape(-1, 7, 24)
+            for author_id, histogram in zip(unique_author_ids.tolist(), histograms):
+                rollup.hourly[author_id] = histogram
+            return rollup
+
+        def add(
+                self, author_id: int, local_timestamp: int, word_count: int, character_count: int,
+                message_count: int = 1
+        ):
+            """Adds the provided counts to the totals. Negative counts subtract."""
+            local_day = local_timestamp // 86400
+            author_daily = self.daily.setdefault(author_id, {})
+            totals = author_daily.setdefault(local_day, [0, 0, 0])
+            totals[0] += message_count
+            totals[1] += word_count
+            totals[2] += character_count
+            if totals[0] <= 0:
+                del author_daily[local_day]
+                if not author_daily:
+                    del self.daily[author_id]
+            if message_count:
+                if author_id not in self.hourly:
+                    self.hourly[author_id] = np.zeros((7, 24), dtype=np.int64)
+                self.hourly[author_id][(local_day + 3) % 7, local_timestamp // 3600 % 24] += message_count
+
+    class ChannelCache:
+        """Cached messages of a channel, stored column by column in arrays sorted by message ID,
+        along with the ID of the newest message seen in the channel.
+        """
+        INITIAL_CAPACITY = 64
+
+        def __init__(self, channel_id: int, rows: Sequence[Tuple[int, int, int, int, int]] = ()):
+            """Sets up the cache from (message_id, author_id, posix_timestamp, word_count, character_count) rows
+            sorted by message ID.
+            """
+            self.channel_id = channel_id
+            rows = np.array(rows, dtype=np.int64).reshape(-1, 5)
+            self.size = len(rows)
+            capacity = max(self.INITIAL_CAPACITY, self.size)
+            self._message_ids = np.empty(capacity, dtype=np.int64)
+            self._author_ids = np.empty(capacity, dtype=np.int64)
+            self._local_timestamps = np.empty(capacity, dtype=np.int64)
+            self._word_counts = np.empty(capacity, dtype=np.int32)
+            self._character_counts = np.empty(capacity, dtype=np.int32)
+            self._message_ids[:self.size] = rows[:, 0]
+            self._author_ids[:self.size] = rows[:, 1]
+            self._local_timestamps[:self.size] = Report.local_timestamps(rows[:, 2])
+            self._word_counts[:self.size] = rows[:, 3]
+            self._character_counts[:self.size] = rows[:, 4]
+            self.newest_message_id = int(self._message_ids[self.size-1]) if self.size else None
+            self.rollup = Report.ActivityRollup.from_columns(self.columns())
+
+        def __len__(self) -> int:
+            return self.size
+
+        def __contains__(self, message_id: int) -> bool:
+            return self._find(message_id) is not None
+
+        @property
+        def _arrays(self) -> Tuple[np.ndarray, ...]:
+            return (
+                self._message_ids, self._author_ids, self._local_timestamps, self._word_counts, self._character_counts
+            )
+
+        def _find(self, message_id: int) -> Optional[int]:
+            """Returns the position of the message in the arrays or None if the message isn't cached."""
+            position = int(np.searchsorted(self._message_ids[:self.size], message_id))
+            if position < self.size and self._message_ids[position] == message_id:
+                return position
+            return None
+
+        def columns(self, start_message_id: int = None, end_message_id: int = None) -> 'Report.Columns':
+            """Returns views of the cached columns.
+            If message IDs are provided, only messages from start_message_id inclusive to end_message_id exclusive
+            are included. Since IDs are timestamp-based, this is a binary search for a time range.
+            """
+            start = 0 if start_message_id is None else int(
+                np.searchsorted(self._message_ids[:self.size], start_message_id)
+            )
+            end = self.size if end_message_id is None else int(
+                np.searchsorted(self._message_ids[:self.size], end_message_id)
+            )
+            return Report.Columns(
+                self._message_ids[start:end], self._author_ids[start:end], self._local_timestamps[start:end],
+                self._word_counts[start:end], self._character_counts[start:end]
+            )
+
+        def _grow(self):
+            """Doubles the capacity of the arrays."""
+            capacity = 2 * len(self._message_ids)
+            self._message_ids = np.resize(self._message_ids, capacity)
+            self._author_ids = np.resize(self._author_ids, capacity)
+            self._local_timestamps = np.resize(self._local_timestamps, capacity)
+            self._word_counts = np.resize(self._word_counts, capacity)
+            self._character_counts = np.resize(self._character_counts, capacity)
+
+        def see(self, message_id: int):
+            """Advances the newest seen message ID."""
+            if self.newest_message_id is None or message_id > self.newest_message_id:
+                self.newest_message_id = message_id
+
+        def add(self, message: 'Report.Message') -> bool:
+            """Adds the message to the cache unless it's already there. Returns whether the message was added."""
+            self.see(message.message_id)
+            if self.size == 0 or message.message_id > self._message_ids[self.size-1]:
+                # Messages usually come in order, so this is the common case
+                position = self.size
+            else:
+                position = int(np.searchsorted(self._message_ids[:self.size], message.message_id))
+                if position < self.size and self._message_ids[position] == message.message_id:
+                    return False
+            if self.size == len(self._message_ids):
+                self._grow()
+            if position < self.size:
+                for array in self._arrays:
+                    array[position+1:self.size+1] = array[position:self.size]
+            self._message_ids[position] = message.message_id
+            self._author_ids[position] = message.author_id
+            self._local_timestamps[position] = Report.local_timestamp(message.posix_timestamp)
+            self._word_counts[position] = message.word_count
+            self._character_counts[position] = message.character_count
+            self.size += 1
+            self.rollup.add(
+                message.author_id, int(self._local_timestamps[position]), message.word_count, message.character_count
+            )
+            return True
+
+        def update_counts(self, message_id: int, word_count: int, character_count: int):
+            position = self._find(message_id)
+            if position is not None:
+                self.rollup.add(
+                    int(self._author_ids[position]), int(self._local_timestamps[position]),
+                    word_count - int(self._word_counts[position]),
+                    character_count - int(self._character_counts[position]), message_count=0
+                )
+                self._word_counts[position] = word_count
+                self._character_counts[position] = character_count
+
+        def remove(self, message_id: int):
+            position = self._find(message_id)
+            if position is not None:
+                self.rollup.add(
+                    int(self._author_ids[position]), int(self._local_timestamps[position]),
+                    -int(self._word_counts[position]), -int(self._character_counts[position]), message_count=-1
+                )
+                for array in self._arrays:
+                    array[position:self.size-1] = array[position+1:self.size]
+                self.size -= 1
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _utc_offset_of_utc_day(utc_day: int) -> int:
+        """Returns the local UTC offset in seconds at noon of the provided day since the epoch."""
+        return int(
+            dt.datetime.fromtimestamp(utc_day * 86400 + 43200, dt.timezone.utc).astimezone().utcoffset().total_seconds()
+        )
 
-    def __init__(self, requesting_member: discord.Member, subject: Union[discord.Guild, discord.TextChannel]):
+    @classmethod
+    def local_timestamp(cls, posix_timestamp: int) -> int:
+        """Converts a POSIX timestamp to a local wall-clock timestamp."""
+        return posix_timestamp + cls._utc_offset_of_utc_day(posix_timestamp // 86400)
+
+    @classmethod
+    def local_timestamps(cls, posix_timestamps: np.ndarray) -> np.ndarray:
+        """Converts POSIX timestamps to local wall-clock timestamps.
+        The UTC offset is determined once per day, which is off by an hour only around DST changes at night.
+        """
+        utc_days, inverse = np.unique(posix_timestamps // 86400, return_inverse=True)
+        offsets = np.array([cls._utc_offset_of_utc_day(int(utc_day)) for utc_day in utc_days], dtype=np.int64)
+        return posix_timestamps + offsets[inverse]
+
+    def __init__(
+            self, requesting_member: discord.Member, subject: Union[discord.Guild, discord.TextChannel],
+            window: TimeWindow = None, progress_callback: Callable[['Report'], Awaitable] = None
+    ):
         self.messages_cached = 0
+        self.synced_channel_count = 0
+        self.channel_count = 0
+        self.progress_callback = progress_callback
         self.total_message_count = 0
         self.total_word_count = 0
         self.total_character_count = 0
@@ -68,6 +589,7 @@ class Report:
         self.init_datetime = dt.datetime.now().astimezone()
         self.requesting_member = requesting_member
         self.subject = subject
+        self.window = window
         if isinstance(subject, discord.Guild):
             self._prepare_active_channels(self.subject)
             self._prepare_messages_over_date(self.subject.created_at)
@@ -92,8 +614,11 @@ class Report:
         self._embed_analysis_metastatistics()
         return self.embed
 
-    def render_activity_chart(self) -> discord.File:
-        """Renders a graph presenting activity of or in the subject over time."""
+    async def render_activity_chart(self) -> Optional[discord.File]:
+        """Renders a graph presenting activity of or in the subject over time in a chart rendering process,
+        unless the same chart has already been rendered and is still cached.
+        If too many charts are already pending or rendering takes too long, the report goes without a chart.
+        """
         if isinstance(self.subject, discord.Guild):
             title = f'Aktywność na serwerze {self.subject}'
         elif isinstance(self.subject, discord.TextChannel):
@@ -101,52 +626,161 @@ class Report:
         elif isinstance(self.subject, discord.Member):
             title = f'Aktywność użytkownika {self.subject}'
 
+        chart_data = (
+            title, self.messages_over_hour, self.messages_over_weekday, self.messages_over_date,
+            list(calendar.day_abbr)
+        )
+        chart_key = self.chart_cache.key(self.subject.id, *chart_data)
+        chart_bytes = await self.chart_cache.get(chart_key)
+        if chart_bytes is None:
+            chart_bytes = await self._render_activity_chart_png_in_process(*chart_data)
+            if chart_bytes is None:
+                return None
+            self.chart_cache.put(chart_key, chart_bytes)
+
+        # Create a Discord file and embed it
+        filename = f'activity-{self.init_datetime.now().strftime("%d.%m.%Y-%H.%M.%S")}.png'
+        self.activity_chart_file = discord.File(
+            fp=io.BytesIO(chart_bytes),
+            filename=filename
+        )
+        self.embed.set_image(url=f'attachment://{filename}')
+
+        return self.activity_chart_file
+
+    @classmethod
+    async def _render_activity_chart_png_in_process(cls, *chart_data) -> Optional[bytes]:
+        if cls.pending_chart_count >= cls.MAX_PENDING_CHART_COUNT:
+            return None
+        try:
+            chart_future = asyncio.wrap_future(
+                cls._get_chart_rendering_executor().submit(cls.render_activity_chart_png, *chart_data)
+            )
+        except concurrent.futures.process.BrokenProcessPool:
+            cls._reset_chart_rendering_executor()
+            return None
+        cls._count_pending_chart(chart_future)
+        try:
+            # The rendering itself can't be interrupted, so it's shielded and keeps counting as pending until it's done
+            return await asyncio.wait_for(asyncio.shield(chart_future), cls.CHART_RENDERING_TIMEOUT_IN_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+        except concurrent.futures.process.BrokenProcessPool:
+            cls._reset_chart_rendering_executor()
+            return None
+
+    @classmethod
+    def render_activity_chart_png(
+            cls, title: str, messages_over_hour: Sequence[int], messages_over_weekday: Sequence[int],
+            messages_over_date: Dict[str, int], weekday_names: Sequence[str]
+    ) -> bytes:
+        """Renders the activity chart from plain histogram data and returns it as PNG bytes.
+        Runs in a chart rendering process.
+        """
         # Initialize the chart
         fig, [ax_by_hour, ax_by_weekday, ax_by_date] = plt.subplots(3)
 
         # Make it look nice
         fig.set_tight_layout(True)
-        ax_by_hour.set_title(title, color=self.FOREGROUND_COLOR, fontsize=13, fontweight='bold', y=1.04)
+        ax_by_hour.set_title(title, color=cls.FOREGROUND_COLOR, fontsize=13, fontweight='bold', y=1.04)
 
         # Plot
-        ax_by_hour = self._plot_activity_by_hour(ax_by_hour)
-        ax_by_weekday = self._plot_activity_by_weekday(ax_by_weekday)
-        ax_by_date = self._plot_activity_by_date(ax_by_date)
+        ax_by_hour = cls._plot_activity_by_hour(ax_by_hour, messages_over_hour)
+        ax_by_weekday = cls._plot_activity_by_weekday(ax_by_weekday, messages_over_weekday, weekday_names)
+        ax_by_date = cls._plot_activity_by_date(ax_by_date, messages_over_date)
 
         # Save as bytes
         chart_bytes = io.BytesIO()
-        fig.savefig(chart_bytes, facecolor=self.BACKGROUND_COLOR, edgecolor=self.FOREGROUND_COLOR)
+        fig.savefig(chart_bytes, facecolor=cls.BACKGROUND_COLOR, edgecolor=cls.FOREGROUND_COLOR)
         plt.close(fig)
-        chart_bytes.seek(0)
 
-        # Create a Discord file and embed it
-        filename = f'activity-{self.init_datetime.now().strftime("%d.%m.%Y-%H.%M.%S")}.png'
-        self.activity_chart_file = discord.File(
-            fp=chart_bytes,
-            filename=filename
+        return chart_bytes.getvalue()
+
+    @classmethod
+    def _get_chart_rendering_executor(cls) -> concurrent.futures.ProcessPoolExecutor:
+        # Worker processes are forked from the bot, so they inherit the locale, Matplotlib style and loaded fonts
+        if cls.chart_rendering_executor is None:
+            cls.chart_rendering_executor = concurrent.futures.ProcessPoolExecutor(cls.CHART_RENDERING_PROCESS_COUNT)
+        return cls.chart_rendering_executor
+
+    @classmethod
+    def _reset_chart_rendering_executor(cls):
+        """Discards the chart rendering processes after one of them died, so that new ones are started on demand."""
+        if cls.chart_rendering_executor is not None:
+            cls.chart_rendering_executor.shutdown(wait=False)
+            cls.chart_rendering_executor = None
+
+    @classmethod
+    def _count_pending_chart(cls, chart_future: asyncio.Future):
+        cls.pending_chart_count += 1
+
+        def uncount_pending_chart(future: asyncio.Future):
+            cls.pending_chart_count -= 1
+            # Mark the outcome of abandoned renderings as retrieved, so that asyncio doesn't log it
+            if not future.cancelled():
+                future.exception()
+
+        chart_future.add_done_callback(uncount_pending_chart)
+
+    @classmethod
+    def warm_up_chart_rendering(cls):
+        """Starts chart rendering processes and has them render a blank chart,
+        so that the first report doesn't wait for process startup and Matplotlib's first draw.
+        """
+        try:
+            executor = cls._get_chart_rendering_executor()
+            for _ in range(cls.CHART_RENDERING_PROCESS_COUNT):
+                executor.submit(
+                    cls.render_activity_chart_png, '', [0] * 24, [0] * 7, {dt.date.today().isoformat(): 0},
+                    list(calendar.day_abbr)
+                )
+        except concurrent.futures.process.BrokenProcessPool:
+            cls._reset_chart_rendering_executor()
+
+    @classmethod
+    def _get_channel_lock(cls, channel_id: int) -> asyncio.Lock:
+        """Returns the lock held while the channel is being loaded or synced, so that concurrent reports
+        wait for each other instead of using or replacing a partially filled channel cache.
+        """
+        if channel_id not in cls.channel_locks:
+            cls.channel_locks[channel_id] = asyncio.Lock()
+        return cls.channel_locks[channel_id]
+
+    async def _load_statistics_cache_for_channel(self, channel: discord.TextChannel):
+        """Loads messages of the channel from the persistent message index into the cache, unless it's cached."""
+        async with self._get_channel_lock(channel.id):
+            if channel.id not in self.statistics_cache[channel.guild.id]:
+                await self._load_statistics_cache_for_channel_unlocked(channel)
+
+    async def _load_statistics_cache_for_channel_unlocked(self, channel: discord.TextChannel):
+        messages, synced_message_id = await asyncio.gather(
+            MessageIndex.get_messages(channel.guild.id, channel.id),
+            MessageIndex.get_synced_message_id(channel.guild.id, channel.id)
         )
-        self.embed.set_image(url=f'attachment://{filename}')
-
-        return self.activity_chart_file
+        channel_cache = self.ChannelCache(channel.id, messages)
+        channel_cache.see(synced_message_id or 0)
+        self.statistics_cache[channel.guild.id][channel.id] = channel_cache
 
-    def _prepare_statistics_cache(self, server: discord.Guild, channel: discord.TextChannel = None):
+    async def _prepare_statistics_cache(self, server: discord.Guild, channel: discord.TextChannel = None):
+        """Loads channels which aren't cached yet from the message index, several at once."""
         if server.id not in self.statistics_cache:
             self.statistics_cache[server.id] = {}
 
         if channel is None:
             # if no channel was specified prepare for caching all channels
-            for server_channel in server.text_channels:
-                if server_channel.id not in self.statistics_cache[server.id]:
-                    self.statistics_cache[server.id][server_channel.id] = []
-            # remove nonexistent channels from the cache
+            await asyncio.gather(*(
+                self._load_statistics_cache_for_channel(server_channel) for server_channel in server.text_channels
+            ))
+            # remove nonexistent channels from the cache and the index
             existent_channels = tuple(map(lambda channel: channel.id, server.text_channels))
             nonexistent_channels = [
                 server_id for server_id in self.statistics_cache[server.id].keys() if server_id not in existent_channels
             ]
             for nonexistent_channel in nonexistent_channels:
                 self.statistics_cache[server.id].pop(nonexistent_channel)
-        elif channel.id not in self.statistics_cache[server.id]:
-            self.statistics_cache[server.id][channel.id] = []
+            MessageIndex.remove_channels_except(server.id, existent_channels)
+        else:
+            await self._load_statistics_cache_for_channel(channel)
 
     def _prepare_active_channels(self, server: discord.Guild, channel: discord.TextChannel = None):
         if channel is None:
@@ -160,9 +794,14 @@ class Report:
             }
 
     def _prepare_messages_over_date(self, start_utc_datetime: dt.datetime):
-        """Prepares the dictionary of messages over date."""
+        """Prepares the dictionary of messages over date, limited to the time window if there is one."""
         subject_creation_date = start_utc_datetime.replace(tzinfo=dt.timezone.utc).astimezone().date()
-        subject_existence_day_count = (dt.date.today() - subject_creation_date).days + 1
+        end_date = dt.date.today()
+        if self.window is not None:
+            end_date = min(end_date, self.window.end_date)
+            if self.window.start_date > subject_creation_date or self.window.end_date < subject_creation_date:
+                subject_creation_date = self.window.start_date
+        subject_existence_day_count = max((end_date - subject_creation_date).days + 1, 1)
         subject_existence_days = [
             date for date in (
                 subject_creation_date + dt.timedelta(n) for n in range(subject_existence_day_count)
@@ -172,61 +811,192 @@ class Report:
             self.messages_over_date[date.isoformat()] = 0
 
     async def _update_statistics_cache_for_channel(self, channel: discord.TextChannel):
+        """Fetches messages sent after the newest seen message of the channel and adds them to the index and the cache.
+        Once a channel has been synced, its new messages are ingested live for the rest of the session.
+        If another report is syncing the channel already, waits for it to finish instead.
+        """
+        async with self._get_channel_lock(channel.id):
+            if channel.id not in self.synced_channel_ids:
+                await self._update_statistics_cache_for_channel_unlocked(channel)
+
+    async def _update_statistics_cache_for_channel_unlocked(self, channel: discord.TextChannel):
+        """Whether history is fetched completely or not, everything added to the cache is also indexed.
+        If fetching stops partway, be it due to an error, missing permissions or cancellation,
+        the channel's newest seen message is set back to the last fetched one, so that the next update
+        fetches the rest of history, instead of skipping to messages which have been ingested live meanwhile.
+        """
+        channel_cache = self.statistics_cache[channel.guild.id][channel.id]
+        # Messages sent while history is being fetched are collected by the live ingestion path
+        self.live_messages_during_sync[channel.id] = []
+        new_messages = []
+        fetched_message_id = channel_cache.newest_message_id
+        is_history_fetched = False
         try:
-            async for message in channel.history(limit=None):
+            # Passing "after" makes history go from old to new, so it can be indexed chunk by chunk without gaps
+            async for message in channel.history(limit=None, after=discord.Object(id=fetched_message_id)):
+                channel_cache.see(message.id)
+                fetched_message_id = message.id
                 if message.type == discord.MessageType.default:
-                    message_local_datetime = message.created_at.replace(tzinfo=dt.timezone.utc).astimezone()
-                    message_object = self.Message(
-                        message.id, message.author.id, message.channel.id, message_local_datetime,
-                        len(message.clean_content.split()), len(message.clean_content)
-                    )
-                    if message_object in self.statistics_cache[channel.guild.id][channel.id]:
-                        break
-                    else:
-                        self.statistics_cache[channel.guild.id][channel.id].append(message_object)
-                        self.messages_cached += 1
+                    message_object = self.Message.from_discord_message(message)
+                    if channel_cache.add(message_object):
+                        new_messages.append(message_object)
+                if len(new_messages) >= self.SYNC_CHUNK_SIZE:
+                    self._index_new_messages(channel, new_messages, fetched_message_id)
+                    new_messages = []
+                    await self._report_progress()
+            is_history_fetched = True
         except discord.Forbidden:
-            pass
+            return
+        finally:
+            for message_object in self.live_messages_during_sync.pop(channel.id):
+                if channel_cache.add(message_object):
+                    new_messages.append(message_object)
+            if not is_history_fetched:
+                channel_cache.newest_message_id = fetched_message_id
+            self._index_new_messages(channel, new_messages, channel_cache.newest_message_id)
+        self.synced_channel_ids.add(channel.id)
+
+    def _index_new_messages(
+            self, channel: discord.TextChannel, new_messages: Sequence['Report.Message'], synced_message_id: int
+    ):
+        """Adds new messages to the index and advances the channel's synced message to the provided one."""
+        MessageIndex.add_messages(channel.guild.id, new_messages)
+        if synced_message_id:
+            MessageIndex.set_synced_message_id(channel.guild.id, channel.id, synced_message_id)
+        self.messages_cached += len(new_messages)
 
     async def _update_statistics_cache(self, server: discord.Guild, channel: discord.TextChannel = None):
-        """Updates the statistics cache."""
-        self._prepare_statistics_cache(server, channel)
-        if channel is None:
-            for server_channel in server.text_channels:
-                await self._update_statistics_cache_for_channel(server_channel)
-        else:
-            await self._update_statistics_cache_for_channel(channel)
-
-    def _update_message_stats(self, message: Message):
+        """Updates the statistics cache, backfilling up to SYNC_CONCURRENCY channels at once.
+        History of each channel is a separate rate limit bucket which discord.py waits out by itself,
+        so the bound is there to keep the bot as a whole clear of the global rate limit.
+        Progress is reported every time a chunk of messages is indexed or a channel is done.
+        If updating a channel fails, the error is raised once the other channels are done.
+        """
+        await self._prepare_statistics_cache(server, channel)
+        channels = server.text_channels if channel is None else [channel]
+        semaphore = asyncio.Semaphore(self.SYNC_CONCURRENCY)
+        self.channel_count = len(channels)
+
+        async def update_channel(channel_to_update: discord.TextChannel):
+            async with semaphore:
+                await self._update_statistics_cache_for_channel(channel_to_update)
+            self.synced_channel_count += 1
+            await self._report_progress()
+
+        # If one channel fails, the others are let finish, so that their progress isn't thrown away
+        results = await asyncio.gather(
+            *(update_channel(channel_to_update) for channel_to_update in channels), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _report_progress(self):
+        """Awaits the progress callback of the report, if there is one."""
+        if self.progress_callback is not None:
+            await self.progress_callback(self)
+
+    @classmethod
+    def ingest_message(cls, message: discord.Message):
+        """Records a newly sent message if its channel has already been synced in this session or is being synced.
+        Messages in channels that haven't been synced yet are picked up by the channel's next update instead.
+        """
+        if message.type != discord.MessageType.default:
+            return
+        if message.channel.id in cls.live_messages_during_sync:
+            cls.live_messages_during_sync[message.channel.id].append(cls.Message.from_discord_message(message))
+            return
+        if message.channel.id not in cls.synced_channel_ids:
+            return
+        message_object = cls.Message.from_discord_message(message)
+        if cls.statistics_cache[message.guild.id][message.channel.id].add(message_object):
+            MessageIndex.add_messages(message.guild.id, (message_object,))
+            MessageIndex.set_synced_message_id(message.guild.id, message.channel.id, message.id)
+
+    @classmethod
+    def ingest_message_edit(cls, message: discord.Message):
+        """Updates word and character counts of an edited message.
+        Only channels cached in this session are kept up to date, so that edits elsewhere don't open server databases.
+        """
+        channel_cache = cls.statistics_cache.get(message.guild.id, {}).get(message.channel.id)
+        if channel_cache is None:
+            return
+        word_count = len(message.clean_content.split())
+        character_count = len(message.clean_content)
+        MessageIndex.update_message(message.guild.id, message.id, word_count, character_count)
+        channel_cache.update_counts(message.id, word_count, character_count)
+
+    @classmethod
+    def ingest_message_deletion(cls, server_id: int, channel_id: int, message_ids: Sequence[int]):
+        """Removes deleted messages. Like edits, only those in channels cached in this session are handled."""
+        channel_cache = cls.statistics_cache.get(server_id, {}).get(channel_id)
+        if channel_cache is None:
+            return
+        MessageIndex.remove_messages(server_id, message_ids)
+        for message_id in message_ids:
+            channel_cache.remove(message_id)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _local_day_to_date_string(local_day: int) -> str:
+        return (dt.date(1970, 1, 1) + dt.timedelta(local_day)).isoformat()
+
+    def _update_message_stats(self, totals: Sequence[int], daily: Dict[int, List[int]], hourly: np.ndarray):
         """Updates message statistics."""
-        self.total_message_count += 1
-        self.total_word_count += message.word_count
-        self.total_character_count += message.character_count
-        self.messages_over_hour[message.local_datetime.hour] += 1
-        self.messages_over_weekday[message.local_datetime.weekday()] += 1
-        try:
-            self.messages_over_date[message.local_datetime.strftime('%Y-%m-%d')] += 1
-        except KeyError:
-            pass
-
-    def _update_active_channels(self, message: Message):
+        self.total_message_count += totals[0]
+        self.total_word_count += totals[1]
+        self.total_character_count += totals[2]
+        for hour, message_count in enumerate(hourly.sum(axis=0).tolist()):
+            self.messages_over_hour[hour] += message_count
+        for weekday, message_count in enumerate(hourly.sum(axis=1).tolist()):
+            self.messages_over_weekday[weekday] += message_count
+        for local_day, (message_count, _, _) in daily.items():
+            date_string = self._local_day_to_date_string(local_day)
+            if date_string in self.messages_over_date:
+                self.messages_over_date[date_string] += message_count
+
+    def _update_active_channels(self, channel_id: int, totals: Sequence[int]):
         """Updates the dictionary of active channels."""
-        self.active_channels[message.channel_id]['message_count'] += 1
-        self.active_channels[message.channel_id]['word_count'] += message.word_count
-        self.active_channels[message.channel_id]['character_count'] += message.character_count
+        if channel_id in self.active_channels:
+            self.active_channels[channel_id]['message_count'] += totals[0]
+            self.active_channels[channel_id]['word_count'] += totals[1]
+            self.active_channels[channel_id]['character_count'] += totals[2]
 
-    def _update_active_users(self, message: Message):
+    def _update_active_users(self, author_id: int, totals: Sequence[int]):
         """Updates the dictionary of active users."""
-        if message.author_id not in self.active_users:
-            self.active_users[message.author_id] = {
-                'author_id': message.author_id, 'message_count': 0, 'word_count': 0, 'character_count': 0
+        if author_id not in self.active_users:
+            self.active_users[author_id] = {
+                'author_id': author_id, 'message_count': 0, 'word_count': 0, 'character_count': 0
             }
-        self.active_users[message.author_id]['message_count'] += 1
-        self.active_users[message.author_id]['word_count'] += message.word_count
-        self.active_users[message.author_id]['character_count'] += message.character_count
+        self.active_users[author_id]['message_count'] += totals[0]
+        self.active_users[author_id]['word_count'] += totals[1]
+        self.active_users[author_id]['character_count'] += totals[2]
+
+    def _update_statistics(self, channel_caches: Dict[int, ChannelCache], author_id: int = None):
+        """Updates all statistics with activity rollups of the provided channels.
+        If an author ID is provided, only activity of that author is taken into account.
+        If the report has a time window, rollups are built from just the messages sent within it.
+        """
+        for channel_id, channel_cache in channel_caches.items():
+            if self.window is None:
+                rollup = channel_cache.rollup
+            else:
+                rollup = self.ActivityRollup.from_columns(
+                    channel_cache.columns(self.window.start_message_id, self.window.end_message_id)
+                )
+            for rollup_author_id in (rollup.daily if author_id is None else (author_id,)):
+                daily = rollup.daily.get(rollup_author_id)
+                if not daily:
+                    continue
+                totals = [sum(column) for column in zip(*daily.values())]
+                self._update_message_stats(totals, daily, rollup.hourly[rollup_author_id])
+                self._update_active_channels(channel_id, totals)
+                self._update_active_users(rollup_author_id, totals)
 
     def _embed_message_stats(self):
         """Adds the usual message statistics to the report embed."""
+        if self.window is not None:
+            self.embed.add_field(name='Okres', value=str(self.window), inline=False)
         self.embed.add_field(
             name='Wysłanych wiadomości',
             value=self.total_message_count
@@ -240,24 +1010,22 @@ class Report:
 
     def _embed_top_active_channels(self):
         """Adds the list of top active channels to the report embed."""
-        sorted_active_channels = sorted(
-            list(self.active_channels.values()), key=lambda active_channel: active_channel['message_count'],
-            reverse=True
+        top_active_channels_with_access = Leaderboard.top(
+            (
+                channel for channel in self.active_channels.values()
+                if channel['message_count'] > 0 and
+                channel['channel'].permissions_for(self.requesting_member).read_messages
+            ), 5, key=lambda active_channel: active_channel['message_count']
         )
-        filtered_sorted_active_channels = [
-            channel for channel in sorted_active_channels
-            if channel['channel'].permissions_for(self.requesting_member).read_messages
-        ]
 
         top_active_channels = []
-        for channel in enumerate(filtered_sorted_active_channels[:5]):
-            if channel[1]['message_count'] > 0:
-                top_active_channels.append(
-                    f'{channel[0]+1}. {channel[1]["channel"].mention} – '
-                    f'{TextFormatter.word_number_variant(channel[1]["message_count"], "wiadomość", "wiadomości")}, '
-                    f'{TextFormatter.word_number_variant(channel[1]["word_count"], "słowo", "słowa", "słów")}, '
-                    f'{TextFormatter.word_number_variant(channel[1]["character_count"], "znak", "znaki", "znaków")}'
-                )
+        for channel in enumerate(top_active_channels_with_access):
+            top_active_channels.append(
+                f'{channel[0]+1}. {channel[1]["channel"].mention} – '
+                f'{TextFormatter.word_number_variant(channel[1]["message_count"], "wiadomość", "wiadomości")}, '
+                f'{TextFormatter.word_number_variant(channel[1]["word_count"], "słowo", "słowa", "słów")}, '
+                f'{TextFormatter.word_number_variant(channel[1]["character_count"], "znak", "znaki", "znaków")}'
+            )
         if top_active_channels:
             field_name = (
                 'Najaktywniejszy na kanałach' if isinstance(self.subject, discord.Member) else 'Najaktywniejsze kanały'
@@ -267,11 +1035,10 @@ class Report:
 
     def _embed_top_active_users(self):
         """Adds the list of top active users to the report embed."""
-        sorted_active_users = sorted(
-            list(self.active_users.values()), key=lambda active_user: active_user['message_count'], reverse=True
-        )
         top_active_users = []
-        for active_user in enumerate(sorted_active_users[:5]):
+        for active_user in enumerate(
+                Leaderboard.top(self.active_users.values(), 5, key=lambda active_user: active_user['message_count'])
+        ):
             top_active_users.append(
                 f'{active_user[0]+1}. <@{active_user[1]["author_id"]}> – '
                 f'{TextFormatter.word_number_variant(active_user[1]["message_count"], "wiadomość", "wiadomości")}, '
@@ -285,11 +1052,7 @@ class Report:
     async def _analyze_server(self):
         """Analyzes the subject as a server."""
         await self._update_statistics_cache(self.subject)
-        for channel in self.statistics_cache[self.subject.id].values():
-            for message in channel:
-                self._update_message_stats(message)
-                self._update_active_channels(message)
-                self._update_active_users(message)
+        self._update_statistics(self.statistics_cache[self.subject.id])
 
         server_creation_datetime_information = TextFormatter.time_difference(self.subject.created_at)
 
@@ -311,10 +1074,7 @@ class Report:
     async def _analyze_channel(self):
         """Analyzes the subject as a channel."""
         await self._update_statistics_cache(self.subject.guild, self.subject)
-        for message in self.statistics_cache[self.subject.guild.id][self.subject.id]:
-            self._update_message_stats(message)
-            self._update_active_channels(message)
-            self._update_active_users(message)
+        self._update_statistics({self.subject.id: self.statistics_cache[self.subject.guild.id][self.subject.id]})
 
         self.embed = discord.Embed(
             title=f':white_check_mark: Przygotowano raport o kanale #{self.subject}',
@@ -332,12 +1092,7 @@ class Report:
     async def _analyze_member(self):
         """Analyzes the subject as a member."""
         await self._update_statistics_cache(self.subject.guild)
-        for channel in self.statistics_cache[self.subject.guild.id].values():
-            for message in channel:
-                if message.author_id == self.subject.id:
-                    self._update_message_stats(message)
-                    self._update_active_channels(message)
-                    self._update_active_users(message)
+        self._update_statistics(self.statistics_cache[self.subject.guild.id], author_id=self.subject.id)
 
         self.embed = discord.Embed(
             title=f':white_check_mark: Przygotowano raport o użytkowniku {self.subject}',
@@ -361,13 +1116,14 @@ class Report:
             )}.'''
         )
 
-    def _plot_activity_by_hour(self, ax):
+    @classmethod
+    def _plot_activity_by_hour(cls, ax, messages_over_hour: Sequence[int]):
         # Plot the chart
         ax.bar(
             [f'{hour}:00'.zfill(5) for hour in list(range(6, 24)) + list(range(0, 6))],
-            self.messages_over_hour[6:] + self.messages_over_hour[:6],
-            color=self.BACKGROUND_COLOR,
-            facecolor=self.FOREGROUND_COLOR,
+            list(messages_over_hour[6:]) + list(messages_over_hour[:6]),
+            color=cls.BACKGROUND_COLOR,
+            facecolor=cls.FOREGROUND_COLOR,
             width=1,
             align='edge'
         )
@@ -380,47 +1136,49 @@ class Report:
 
         # Set proper ticker intervals on the Y axis accounting for the maximum number of messages
         ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins='auto', steps=[10], integer=True))
-        if max(self.messages_over_hour) >= 10:
+        if max(messages_over_hour) >= 10:
             ax.yaxis.set_minor_locator(ticker.AutoMinorLocator(n=10))
 
         # Make it look nice
-        ax.set_facecolor(self.BACKGROUND_COLOR)
-        ax.set_xlabel('Godzina', color=self.FOREGROUND_COLOR, fontsize=11, fontweight='bold')
+        ax.set_facecolor(cls.BACKGROUND_COLOR)
+        ax.set_xlabel('Godzina', color=cls.FOREGROUND_COLOR, fontsize=11, fontweight='bold')
 
         return ax
 
-    def _plot_activity_by_weekday(self, ax):
+    @classmethod
+    def _plot_activity_by_weekday(cls, ax, messages_over_weekday: Sequence[int], weekday_names: Sequence[str]):
         # Plot the chart
         ax.bar(
-            calendar.day_abbr,
-            self.messages_over_weekday,
-            color=self.BACKGROUND_COLOR,
-            facecolor=self.FOREGROUND_COLOR,
+            weekday_names,
+            messages_over_weekday,
+            color=cls.BACKGROUND_COLOR,
+            facecolor=cls.FOREGROUND_COLOR,
             width=1
         )
 
         # Set proper X axis formatting
         ax.set_xlim(-0.5, 6.5)
-        ax.set_xticklabels(calendar.day_abbr, rotation=30, ha='right')
+        ax.set_xticklabels(weekday_names, rotation=30, ha='right')
 
         # Set proper ticker intervals on the Y axis accounting for the maximum number of messages
         ax.yaxis.set_major_locator(ticker.MaxNLocator(nbins='auto', steps=[10], integer=True))
-        if max(self.messages_over_weekday) >= 10:
+        if max(messages_over_weekday) >= 10:
             ax.yaxis.set_minor_locator(ticker.AutoMinorLocator(n=10))
 
         # Make it look nice
-        ax.set_facecolor(self.BACKGROUND_COLOR)
-        ax.set_xlabel('Dzień tygodnia', color=self.FOREGROUND_COLOR, fontsize=11, fontweight='bold')
+        ax.set_facecolor(cls.BACKGROUND_COLOR)
+        ax.set_xlabel('Dzień tygodnia', color=cls.FOREGROUND_COLOR, fontsize=11, fontweight='bold')
         ax.set_ylabel(
-            'Wysłanych wiadomości', color=self.FOREGROUND_COLOR, fontsize=11, fontweight='bold'
+            'Wysłanych wiadomości', color=cls.FOREGROUND_COLOR, fontsize=11, fontweight='bold'
         )
 
         return ax
 
-    def _plot_activity_by_date(self, ax):
+    @classmethod
+    def _plot_activity_by_date(cls, ax, messages_over_date: Dict[str, int]):
         # Convert date strings provided to datetime objects
         sorted_messages_over_date = sorted(
-            self.messages_over_date.items(), key=lambda date: dt.datetime.strptime(date[0], '%Y-%m-%d')
+            messages_over_date.items(), key=lambda date: dt.datetime.strptime(date[0], '%Y-%m-%d')
         )
         dates = [dt.datetime.strptime(date[0], '%Y-%m-%d') for date in sorted_messages_over_date]
         messages_over_date = [date[1] for date in sorted_messages_over_date]
@@ -429,8 +1187,8 @@ class Report:
         ax.bar(
             dates,
             messages_over_date,
-            color=self.BACKGROUND_COLOR,
-            facecolor=self.FOREGROUND_COLOR,
+            color=cls.BACKGROUND_COLOR,
+            facecolor=cls.FOREGROUND_COLOR,
             width=1
         )
 
@@ -483,48 +1241,150 @@ class Report:
             ax.yaxis.set_minor_locator(ticker.AutoMinorLocator(n=10))
 
         # Make it look nice
-        ax.set_facecolor(self.BACKGROUND_COLOR)
-        ax.set_xlabel('Data', color=self.FOREGROUND_COLOR, fontsize=11, fontweight='bold')
+        ax.set_facecolor(cls.BACKGROUND_COLOR)
+        ax.set_xlabel('Data', color=cls.FOREGROUND_COLOR, fontsize=11, fontweight='bold')
 
         return ax
 
 
+class ReportProgressMessage:
+    """A message informing about the progress of a report which takes a while to prepare.
+    It is only sent once the report has been in preparation for DELAY_IN_SECONDS
+    and then edited no more often than every MIN_EDIT_INTERVAL_IN_SECONDS.
+    """
+    DELAY_IN_SECONDS = 3
+    MIN_EDIT_INTERVAL_IN_SECONDS = 3
+
+    def __init__(self, ctx: discord.ext.commands.Context):
+        self.ctx = ctx
+        self.message = None
+        self.init_time = asyncio.get_event_loop().time()
+        self.update_time = None
+        self.is_being_updated = False
+
+    async def update(self, report: Report):
+        """Sends or edits the message if it's been long enough, skipping updates which would come too early."""
+        now = asyncio.get_event_loop().time()
+        if (
+                self.is_being_updated or now - self.init_time < self.DELAY_IN_SECONDS or
+                (self.update_time is not None and now - self.update_time < self.MIN_EDIT_INTERVAL_IN_SECONDS)
+        ):
+            return
+        self.is_being_updated = True
+        self.update_time = now
+        embed = discord.Embed(
+            title=':hourglass_flowing_sand: Przygotowywanie raportu…',
+            description=f'''Zbuforowano dotąd {TextFormatter.word_number_variant(
+                report.messages_cached, "nową wiadomość", "nowe wiadomości", "nowych wiadomości"
+            )}.''',
+            color=somsiad.color
+        )
+        if report.channel_count > 1:
+            embed.add_field(
+                name='Przejrzanych kanałów', value=f'{report.synced_channel_count} z {report.channel_count}'
+            )
+        try:
+            if self.message is None:
+                self.message = await self.ctx.send(self.ctx.author.mention, embed=embed)
+            else:
+                await self.message.edit(embed=embed)
+        except discord.HTTPException:
+            pass
+        finally:
+            self.is_being_updated = False
+
+    async def delete(self):
+        """Deletes the message if it has been sent."""
+        if self.message is not None:
+            try:
+                await self.message.delete()
+            except discord.HTTPException:
+                pass
+
+
+async def send_report(
+        ctx: discord.ext.commands.Context, subject: Union[discord.Guild, discord.TextChannel], window: TimeWindow = None
+):
+    """Prepares a report about the subject and sends it, keeping the invoking user informed about progress meanwhile.
+    Since attachments can't be added to an existing message, the finished report is sent as a new message
+    which replaces the progress message.
+    """
+    progress_message = ReportProgressMessage(ctx)
+    try:
+        async with ctx.typing():
+            report = Report(ctx.author, subject, window, progress_message.update)
+            await report.analyze_subject()
+            await report.render_activity_chart()
+
+        await ctx.send(ctx.author.mention, embed=report.embed, file=report.activity_chart_file)
+    finally:
+        await progress_message.delete()
+
+
+@somsiad.bot.listen()
+async def on_ready():
+    Report.warm_up_chart_rendering()
+
+
+@somsiad.bot.listen()
+async def on_message(message):
+    if message.guild is not None:
+        Report.ingest_message(message)
+
+
+@somsiad.bot.listen()
+async def on_message_edit(before, after):
+    if after.guild is not None and after.type == discord.MessageType.default:
+        Report.ingest_message_edit(after)
+
+
+@somsiad.bot.listen()
+async def on_raw_message_delete(payload):
+    if payload.guild_id is not None:
+        Report.ingest_message_deletion(payload.guild_id, payload.channel_id, (payload.message_id,))
+
+
+@somsiad.bot.listen()
+async def on_raw_bulk_message_delete(payload):
+    if payload.guild_id is not None:
+        Report.ingest_message_deletion(payload.guild_id, payload.channel_id, tuple(payload.message_ids))
+
+
 @somsiad.bot.group(invoke_without_command=True, case_insensitive=True)
 @discord.ext.commands.cooldown(
     1, somsiad.conf['command_cooldown_per_user_in_seconds'], discord.ext.commands.BucketType.user
 )
-async def stat(ctx, *, subject: Union[discord.Member, discord.TextChannel] = None):
+async def stat(
+        ctx, window: Optional[TimeWindow] = None, *, subject: Union[discord.Member, discord.TextChannel] = None
+):
     if subject is None:
         embed = discord.Embed(
             title=f'Dostępne podkomendy {somsiad.conf["command_prefix"]}{ctx.invoked_with}',
             description=f'Użycie: {somsiad.conf["command_prefix"]}{ctx.invoked_with} <podkomenda> lub '
-            f'{somsiad.conf["command_prefix"]}{ctx.invoked_with} <użytkownik/kanał>',
+            f'{somsiad.conf["command_prefix"]}{ctx.invoked_with} <?okres> <użytkownik/kanał>\n'
+            'Okres to liczba dni wstecz, np. 30d, lub zakres dat, np. 1.01.2018-31.03.2018. '
+            'Jeśli nie podano okresu, raport obejmuje całą historię.',
             color=somsiad.color
         )
         embed.add_field(
-            name=f'serwer',
+            name=f'serwer <?okres>',
             value='Wysyła raport o serwerze.',
             inline=False
         )
         embed.add_field(
-            name=f'kanał <?kanał>',
+            name=f'kanał <?okres> <?kanał>',
             value='Wysyła raport o kanale. Jeśli nie podano kanału, przyjmuje kanał na którym użyto komendy.',
             inline=False
         )
         embed.add_field(
-            name=f'użytkownik <?użytkownik>',
+            name=f'użytkownik <?okres> <?użytkownik>',
             value='Wysyła raport o użytkowniku. '
             'Jeśli nie podano użytkownika, przyjmuje użytkownika, który użył komendy.',
             inline=False
         )
         await ctx.send(ctx.author.mention, embed=embed)
     else:
-        async with ctx.typing():
-            report = Report(ctx.author, subject)
-            await report.analyze_subject()
-            report.render_activity_chart()
-
-        await ctx.send(ctx.author.mention, embed=report.embed, file=report.activity_chart_file)
+        await send_report(ctx, subject, window)
 
 
 @stat.error
@@ -542,13 +1402,18 @@ async def stat_error(ctx, error):
     1, Report.COOLDOWN, discord.ext.commands.BucketType.channel
 )
 @discord.ext.commands.guild_only()
-async def stat_server(ctx):
-    async with ctx.typing():
-        report = Report(ctx.author, ctx.guild)
-        await report.analyze_subject()
-        report.render_activity_chart()
+async def stat_server(ctx, window: TimeWindow = None):
+    await send_report(ctx, ctx.guild, window)
 
-    await ctx.send(ctx.author.mention, embed=report.embed, file=report.activity_chart_file)
+
+@stat_server.error
+async def stat_server_error(ctx, error):
+    if isinstance(error, discord.ext.commands.BadArgument):
+        embed = discord.Embed(
+            title=f':warning: Nie rozpoznano okresu!',
+            color=somsiad.color
+        )
+        await ctx.send(ctx.author.mention, embed=embed)
 
 
 @stat.command(aliases=['channel', 'kanał', 'kanal'])
@@ -556,16 +1421,11 @@ async def stat_server(ctx):
     1, Report.COOLDOWN, discord.ext.commands.BucketType.user
 )
 @discord.ext.commands.guild_only()
-async def stat_channel(ctx, *, channel: discord.TextChannel = None):
+async def stat_channel(ctx, window: Optional[TimeWindow] = None, *, channel: discord.TextChannel = None):
     if channel is None:
         channel = ctx.channel
 
-    async with ctx.typing():
-        report = Report(ctx.author, channel)
-        await report.analyze_subject()
-        report.render_activity_chart()
-
-    await ctx.send(ctx.author.mention, embed=report.embed, file=report.activity_chart_file)
+    await send_report(ctx, channel, window)
 
 
 @stat_channel.error
@@ -583,16 +1443,11 @@ async def stat_channel_error(ctx, error):
     1, Report.COOLDOWN, discord.ext.commands.BucketType.user
 )
 @discord.ext.commands.guild_only()
-async def stat_member(ctx, *, member: discord.Member = None):
+async def stat_member(ctx, window: Optional[TimeWindow] = None, *, member: discord.Member = None):
     if member is None:
         member = ctx.author
 
-    async with ctx.typing():
-        report = Report(ctx.author, member)
-        await report.analyze_subject()
-        report.render_activity_chart()
-
-    await ctx.send(ctx.author.mention, embed=report.embed, file=report.activity_chart_file)
+    await send_report(ctx, member, window)
 
 
 @stat_member.error
@@ -38,5 +38,6 @@ def set_locale(iteration: int = 0):
 if __name__ == '__main__':
     print('Budzenie Somsiada...')
     set_locale()
+    server_data.migrate_server_dbs()
     calendar.setfirstweekday(calendar.MONDAY)
     somsiad.somsiad.run()
@@ -12,15 +12,517 @@
 # If not, see <https://www.gnu.org/licenses/>.
 
 import os.path
+import time
+import contextlib
+import functools
+import collections
+import queue
+import atexit
+import asyncio
 import sqlite3
-from typing import Union, Tuple, List
+import threading
+import concurrent.futures
+from typing import Union, Tuple, List, Dict, Iterable, Iterator, ContextManager, Sequence, Callable, Optional, Any
 import discord
 from somsiad import somsiad
 
 
+class Database:
+    """An SQLite database in WAL mode which can be used from any thread.
+    Reads go through a pool of connections. Writes are queued for the writer thread shared by all databases,
+    which commits everything queued for a database in the meantime as a single transaction.
+    Every operation also has a coroutine variant, so that the event loop never waits for the disk.
+    Each connection keeps its prepared statements, so queries repeated with different parameters are only compiled
+    once per connection.
+    """
+    MAX_IDLE_READ_CONNECTION_COUNT = 4
+    MAX_BATCH_SIZE = 512
+    READ_THREAD_COUNT = 4
+    STATEMENT_CACHE_SIZE = 256
+
+    _write_queue = queue.Queue()
+    _writer_thread = None
+    _writer_thread_lock = threading.Lock()
+    _read_executor = concurrent.futures.ThreadPoolExecutor(READ_THREAD_COUNT)
+
+    _CLOSE = object()
+
+    def __init__(self, path: str, *, detect_types: int = 0):
+        """Sets up the database at the path. Passing detect_types=sqlite3.PARSE_DECLTYPES makes SQLite's adapters
+        convert values of columns according to their declared types, such as DATE, on every connection.
+        """
+        self.path = path
+        self.detect_types = detect_types
+        self._writer_connection = None
+        self._open_writer_connection()
+        self._idle_read_connections = []
+        self._read_connections_lock = threading.Lock()
+        self._start_writer_thread()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transactions are managed explicitly by the writer thread
+        connection = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False, cached_statements=self.STATEMENT_CACHE_SIZE,
+            detect_types=self.detect_types
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA foreign_keys = ON')
+        # In WAL mode this only syncs the disk on checkpoints, while still keeping the database consistent
+        connection.execute('PRAGMA synchronous = NORMAL')
+        return connection
+
+    def _open_writer_connection(self) -> sqlite3.Connection:
+        if self._writer_connection is None:
+            self._writer_connection = self._connect()
+            self._writer_connection.execute('PRAGMA journal_mode = WAL')
+        return self._writer_connection
+
+    def _acquire_read_connection(self) -> sqlite3.Connection:
+        with self._read_connections_lock:
+            if self._idle_read_connections:
+                return self._idle_read_connections.pop()
+        connection = self._connect()
+        connection.execute('PRAGMA query_only = ON')
+        return connection
+
+    def _release_read_connection(self, connection: sqlite3.Connection):
+        with self._read_connections_lock:
+            if len(self._idle_read_connections) < self.MAX_IDLE_READ_CONNECTION_COUNT:
+                self._idle_read_connections.append(connection)
+                return
+        connection.close()
+
+    def read(self, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Calls the function with a read connection and returns its result."""
+        connection = self._acquire_read_connection()
+        try:
+            return function(connection)
+        finally:
+            self._release_read_connection(connection)
+
+    def fetch_one(self, sql: str, parameters: Sequence = ()) -> Optional[sqlite3.Row]:
+        """Returns the first row of the query's results, or None if there are none."""
+        return self.read(lambda connection: connection.execute(sql, parameters).fetchone())
+
+    def fetch_all(self, sql: str, parameters: Sequence = ()) -> List[sqlite3.Row]:
+        """Returns all rows of the query's results."""
+        return self.read(lambda connection: connection.execute(sql, parameters).fetchall())
+
+    @classmethod
+    async def run_in_read_executor(cls, function: Callable[..., Any], *args) -> Any:
+        """Calls the function with the arguments in a thread dedicated to database reads and returns its result."""
+        return await asyncio.get_event_loop().run_in_executor(cls._read_executor, function, *args)
+
+    async def read_async(self, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await self.run_in_read_executor(self.read, function)
+
+    async def fetch_one_async(self, sql: str, parameters: Sequence = ()) -> Optional[sqlite3.Row]:
+        return await self.run_in_read_executor(self.fetch_one, sql, parameters)
+
+    async def fetch_all_async(self, sql: str, parameters: Sequence = ()) -> List[sqlite3.Row]:
+        return await self.run_in_read_executor(self.fetch_all, sql, parameters)
+
+    def submit(
+            self, function: Callable[[sqlite3.Connection], Any], *, in_background: bool = False
+    ) -> concurrent.futures.Future:
+        """Queues the function to be called by the writer thread with the writer connection, inside a transaction.
+        Returns a future which is resolved with the function's result once the transaction has been committed.
+        If the write is in background, nobody is expected to wait for it, so a failure is logged instead.
+        The function must not begin, commit or roll back transactions by itself.
+        """
+        future = concurrent.futures.Future()
+        if in_background:
+            future.add_done_callback(self._log_background_failure)
+        self._write_queue.put((self, function, future))
+        return future
+
+    def transaction(self, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Calls the function within a transaction of the writer thread and waits for the commit.
+        Statements executed by the function are committed or rolled back together.
+        """
+        return self.submit(function).result()
+
+    def execute(self, sql: str, parameters: Sequence = ()) -> int:
+        """Executes the statement and waits for the commit. Returns the number of affected rows."""
+        return self.transaction(lambda connection: connection.execute(sql, parameters).rowcount)
+
+    def execute_many(self, sql: str, parameters_sequence: Sequence[Sequence]) -> int:
+        """Executes the statement for every set of parameters and waits for the commit.
+        Returns the number of affected rows.
+        """
+        return self.transaction(lambda connection: connection.executemany(sql, parameters_sequence).rowcount)
+
+    def execute_in_background(self, sql: str, parameters: Sequence = ()) -> concurrent.futures.Future:
+        """Queues the statement without waiting for it. Reads may not see its effect until it's committed,
+        but later writes to the database are always executed after it.
+        """
+        return self.submit(lambda connection: connection.execute(sql, parameters).rowcount, in_background=True)
+
+    def execute_many_in_background(
+            self, sql: str, parameters_sequence: Sequence[Sequence]
+    ) -> concurrent.futures.Future:
+        return self.submit(
+            lambda connection: connection.executemany(sql, parameters_sequence).rowcount, in_background=True
+        )
+
+    async def transaction_async(self, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await asyncio.wrap_future(self.submit(function))
+
+    async def execute_async(self, sql: str, parameters: Sequence = ()) -> int:
+        return await self.transaction_async(lambda connection: connection.execute(sql, parameters).rowcount)
+
+    async def execute_many_async(self, sql: str, parameters_sequence: Sequence[Sequence]) -> int:
+        return await self.transaction_async(
+            lambda connection: connection.executemany(sql, parameters_sequence).rowcount
+        )
+
+    def flush(self):
+        """Waits until all writes queued so far have been committed."""
+        self.transaction(lambda connection: None)
+
+    def close(self):
+        """Waits until all writes queued so far have been committed and closes connections which aren't in use.
+        Connections are opened again if the database is used afterwards.
+        """
+        future = concurrent.futures.Future()
+        self._write_queue.put((self, self._CLOSE, future))
+        future.result()
+        with self._read_connections_lock:
+            idle_read_connections, self._idle_read_connections = self._idle_read_connections, []
+        for connection in idle_read_connections:
+            connection.close()
+
+    @staticmethod
+    def _log_background_failure(future: concurrent.futures.Future):
+        if not future.cancelled() and future.exception() is not None:
+            somsiad.logger.error(f'Background database write failed: {future.exception()}')
+
+    @classmethod
+    def _start_writer_thread(cls):
+        with cls._writer_thread_lock:
+            if cls._writer_thread is None:
+                cls._writer_thread = threading.Thread(target=cls._write_continuously, name='database-writer')
+                cls._writer_thread.daemon = True
+                cls._writer_thread.start()
+                atexit.register(cls._stop_writer_thread)
+
+    @classmethod
+    def _stop_writer_thread(cls):
+        """Lets the writer thread commit everything that has been queued and stop."""
+        cls._write_queue.put(None)
+        cls._writer_thread.join()
+
+    @classmethod
+    def _write_continuously(cls):
+        """Takes writes off the queue in batches and commits each database's part of a batch as one transaction."""
+        while True:
+            batch = [cls._write_queue.get()]
+            while len(batch) < cls.MAX_BATCH_SIZE and batch[-1] is not None:
+                try:
+                    batch.append(cls._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            should_stop = batch[-1] is None
+            writes_by_database = {}
+            for write in batch:
+                if write is not None:
+                    writes_by_database.setdefault(write[0], []).append(write[1:])
+            for database, writes in writes_by_database.items():
+                database._commit_writes(writes)
+            if should_stop:
+                return
+
+    def _commit_writes(self, writes: List[Tuple[Callable[[sqlite3.Connection], Any], concurrent.futures.Future]]):
+        """Commits the writes in a single transaction, unless the database is being closed in the meantime,
+        in which case writes queued before closing are committed first.
+        """
+        transaction_writes = []
+        for function, future in writes:
+            if function is self._CLOSE:
+                if transaction_writes:
+                    self._commit_transaction(transaction_writes)
+                    transaction_writes = []
+                if self._writer_connection is not None:
+                    self._writer_connection.close()
+                    self._writer_connection = None
+                future.set_result(None)
+            else:
+                transaction_writes.append((function, future))
+        if transaction_writes:
+            self._commit_transaction(transaction_writes)
+
+    def _commit_transaction(
+            self, writes: List[Tuple[Callable[[sqlite3.Connection], Any], concurrent.futures.Future]]
+    ):
+        """Runs the writes in a single transaction, each under its own savepoint, so that one failing write
+        is rolled back alone. Futures are only resolved after the commit.
+        """
+        outcomes = []
+        connection = None
+        try:
+            connection = self._open_writer_connection()
+            connection.execute('BEGIN IMMEDIATE')
+            for function, future in writes:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                connection.execute('SAVEPOINT write')
+                try:
+                    result = function(connection)
+                except Exception as e:
+                    connection.execute('ROLLBACK TO write')
+                    connection.execute('RELEASE write')
+                    outcomes.append((future, None, e))
+                else:
+                    connection.execute('RELEASE write')
+                    outcomes.append((future, result, None))
+            connection.execute('COMMIT')
+        except sqlite3.Error as e:
+            if connection is not None and connection.in_transaction:
+                connection.execute('ROLLBACK')
+            for function, future in writes:
+                if not future.done() and (future.running() or future.set_running_or_notify_cancel()):
+                    future.set_exception(e)
+            return
+        for future, result, exception in outcomes:
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
+
+
+class PerServerStorage:
+    """Keeps data of every server in the server's own database file.
+    Databases are opened on first use and only a limited number of them is kept open,
+    with the least recently used ones being closed first, as well as ones which haven't been used for a while.
+    Databases are leased for the duration of each use, so that ones evicted in the meantime are only closed
+    once they're no longer in use.
+    """
+    name = 'per_server'
+    MAX_OPEN_DB_COUNT = 64
+    DB_IDLE_TIMEOUT_IN_SECONDS = 600
+
+    def __init__(self, manager: 'ServerDataManager'):
+        self.manager = manager
+        # Server IDs mapped to open databases and times of their last use, least recently used first
+        self.open_dbs = collections.OrderedDict()
+        # Server IDs mapped to futures of databases which are being opened, so that each one is only opened once
+        self.opening_dbs = {}
+        # Server IDs mapped to databases which have been evicted while leased, to be closed once they're released
+        self.evicted_leased_dbs = {}
+        self.db_lease_counts = collections.Counter()
+        self.open_dbs_lock = threading.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+
+    @staticmethod
+    def get_db_path(server_id: int) -> str:
+        return os.path.join(somsiad.storage_dir_path, f'server_{server_id}.db')
+
+    @contextlib.contextmanager
+    def lease_server_db(self, server_id: int) -> Iterator[Database]:
+        """Provides the specified server's own database, opening and migrating it if it isn't open,
+        and keeps it from being closed until the block is left.
+        """
+        database = self._acquire_server_db(server_id)
+        try:
+            yield database
+        finally:
+            self._release_server_db(server_id, database)
+
+    def get_server_db(self, server_id: int) -> Database:
+        """Returns the specified server's own database, opening and migrating it if it isn't open."""
+        with self.lease_server_db(server_id) as database:
+            return database
+
+    def _acquire_server_db(self, server_id: int) -> Database:
+        """Leases the database. It's opened outside of the lock, so that databases of other servers can be used
+        in the meantime, while others who need the same database wait for it to be opened just once.
+        """
+        while True:
+            with self.open_dbs_lock:
+                database = self._lease_open_db(server_id)
+                if database is not None:
+                    self.hit_count += 1
+                    evicted_dbs = self._pop_evicted_dbs()
+                    break
+                opening = self.opening_dbs.get(server_id)
+                if opening is None:
+                    self.miss_count += 1
+                    opening = self.opening_dbs[server_id] = concurrent.futures.Future()
+                    break
+            # The database may be evicted again before it's leased, so it's looked up anew once it's open
+            opening.result()
+        if database is None:
+            database = self._open_server_db(server_id, opening)
+            with self.open_dbs_lock:
+                evicted_dbs = self._pop_evicted_dbs()
+        for evicted_db in evicted_dbs:
+            evicted_db.close()
+        return database
+
+    def _open_server_db(self, server_id: int, opening: concurrent.futures.Future) -> Database:
+        """Opens and migrates the database, then leases it and lets know those waiting for it to be opened."""
+        database = None
+        try:
+            self.manager.load_server(server_id)
+            database = Database(self.get_db_path(server_id))
+            database.transaction(functools.partial(self.manager.migrate, server_id=server_id))
+        except BaseException as e:
+            with self.open_dbs_lock:
+                del self.opening_dbs[server_id]
+            opening.set_exception(e)
+            if database is not None:
+                database.close()
+            raise
+        with self.open_dbs_lock:
+            del self.opening_dbs[server_id]
+            self.open_dbs[server_id] = (database, time.monotonic())
+            self.db_lease_counts[database] += 1
+        opening.set_result(database)
+        return database
+
+    def _lease_open_db(self, server_id: int) -> Optional[Database]:
+        """Leases the database if it's open, marking it as the most recently used one. Must be called with the lock.
+        A database which has been evicted while leased is brought back instead of being opened again.
+        """
+        if server_id in self.open_dbs:
+            database = self.open_dbs.pop(server_id)[0]
+        elif server_id in self.evicted_leased_dbs:
+            database = self.evicted_leased_dbs.pop(server_id)
+        else:
+            return None
+        self.open_dbs[server_id] = (database, time.monotonic())
+        self.db_lease_counts[database] += 1
+        return database
+
+    def _release_server_db(self, server_id: int, database: Database):
+        """Releases the database, closing it if it's been evicted and this was its last lease."""
+        with self.open_dbs_lock:
+            self.db_lease_counts[database] -= 1
+            if self.db_lease_counts[database]:
+                return
+            del self.db_lease_counts[database]
+            if self.evicted_leased_dbs.get(server_id) is not database:
+                return
+            del self.evicted_leased_dbs[server_id]
+        database.close()
+
+    def evict_idle_dbs(self) -> int:
+        """Closes databases which haven't been used for a while, or marks them to be closed once released
+        if they're in use. Returns the number of databases closed right away.
+        """
+        with self.open_dbs_lock:
+            evicted_dbs = self._pop_evicted_dbs()
+        for evicted_db in evicted_dbs:
+            evicted_db.close()
+        return len(evicted_dbs)
+
+    def _pop_evicted_dbs(self) -> List[Database]:
+        """Evicts databases over the limit or idle for too long. Must be called with the lock.
+        Returns those of them which aren't leased, so that they can be closed once the lock is released.
+        """
+        evicted_dbs = []
+        idle_since = time.monotonic() - self.DB_IDLE_TIMEOUT_IN_SECONDS
+        while self.open_dbs:
+            server_id, (database, last_use_time) = next(iter(self.open_dbs.items()))
+            if len(self.open_dbs) <= self.MAX_OPEN_DB_COUNT and last_use_time > idle_since:
+                break
+            del self.open_dbs[server_id]
+            self.eviction_count += 1
+            if self.db_lease_counts[database]:
+                self.evicted_leased_dbs[server_id] = database
+            else:
+                evicted_dbs.append(database)
+        return evicted_dbs
+
+    def get_open_dbs(self) -> List[Tuple[Optional[int], Database]]:
+        with self.open_dbs_lock:
+            return [
+                *((server_id, database) for server_id, (database, _) in self.open_dbs.items()),
+                *self.evicted_leased_dbs.items()
+            ]
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            'open_db_count': len(self.open_dbs), 'hit_count': self.hit_count, 'miss_count': self.miss_count,
+            'eviction_count': self.eviction_count
+        }
+
+    def migrate(self, *, dry_run: bool = False, thread_count: int = None) -> List[dict]:
+        """Applies pending migrations to databases of all known servers, in parallel.
+        Databases which don't exist yet are skipped, as they get the whole schema when first opened.
+        """
+        with self.open_dbs_lock:
+            in_use_server_ids = {*self.open_dbs, *self.opening_dbs, *self.evicted_leased_dbs}
+        server_ids = [
+            server_id for server_id in self.manager.load_servers_list()
+            if os.path.isfile(self.get_db_path(server_id)) and server_id not in in_use_server_ids
+        ]
+        with concurrent.futures.ThreadPoolExecutor(thread_count or self.manager.MIGRATION_THREAD_COUNT) as executor:
+            return list(executor.map(
+                lambda server_id: self.manager.migrate_db_file(self.get_db_path(server_id), server_id, dry_run),
+                server_ids
+            ))
+
+
+class SharedStorage:
+    """Keeps data of all servers in the servers database, with server IDs being part of primary keys."""
+    name = 'shared'
+
+    def __init__(self, manager: 'ServerDataManager'):
+        self.manager = manager
+        self.db = None
+        self.db_lock = threading.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @contextlib.contextmanager
+    def lease_server_db(self, server_id: int) -> Iterator[Database]:
+        """Provides the servers database, which is never closed."""
+        yield self.get_server_db(server_id)
+
+    def get_server_db(self, server_id: int) -> Database:
+        """Returns the servers database, migrating it first if that hasn't been done yet."""
+        with self.db_lock:
+            if self.db is None:
+                self.miss_count += 1
+                self.manager.servers_db.transaction(self.manager.migrate)
+                self.db = self.manager.servers_db
+            else:
+                self.hit_count += 1
+        return self.db
+
+    def evict_idle_dbs(self) -> int:
+        """Does nothing, as the servers database is always open."""
+        return 0
+
+    def get_open_dbs(self) -> List[Tuple[Optional[int], Database]]:
+        return [] if self.db is None else [(None, self.db)]
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            'open_db_count': 0 if self.db is None else 1, 'hit_count': self.hit_count, 'miss_count': self.miss_count,
+            'eviction_count': 0
+        }
+
+    def migrate(self, *, dry_run: bool = False, thread_count: int = None) -> List[dict]:
+        """Applies pending migrations to the servers database."""
+        if self.db is not None:
+            return []
+        return [self.manager.migrate_db_file(self.manager.servers_db_path, None, dry_run)]
+
+
 class ServerDataManager:
     """Handles server-specific data."""
     servers_db_path = os.path.join(somsiad.storage_dir_path, 'servers.db')
+    SCHEMA_VERSION_TABLE_COLUMNS = (
+        'component TEXT NOT NULL PRIMARY KEY',
+        'version INTEGER NOT NULL'
+    )
+    MIGRATION_THREAD_COUNT = 8
+    IDLE_SERVER_DB_EVICTION_INTERVAL_IN_SECONDS = 60
+    STORAGES = {storage.name: storage for storage in (PerServerStorage, SharedStorage)}
 
     @staticmethod
     def dict_from_row(row: sqlite3.Row) -> dict:
@@ -30,124 +532,707 @@ class ServerDataManager:
         else:
             return dict(zip(row.keys(), row))
 
-    def __init__(self):
+    def __init__(self, storage_name: str = None):
         """Connects to the servers database. Creates it if it doesn't exist yet.
-        Creates a table containing known servers.
+        Creates a table containing known servers. Databases holding server data are opened lazily.
         """
-        self.servers = {
-            'ids': []
-        }
-        self.servers_db = sqlite3.connect(self.servers_db_path)
-        self.servers_db.row_factory = sqlite3.Row
-        self.servers_db_cursor = self.servers_db.cursor()
-        self.servers_db_cursor.execute(
+        self.servers = {}
+        self.table_schemas = {}
+        self.index_schemas = {}
+        self.primary_key_scopes = {}
+        self.migrations = {}
+        self.idle_server_db_eviction = None
+        if storage_name is None:
+            storage_name = somsiad.conf['server_data_storage']
+        try:
+            self.storage = self.STORAGES[storage_name](self)
+        except KeyError:
+            raise ValueError(
+                f'unknown server data storage "{storage_name}", expected one of: {", ".join(self.STORAGES)}'
+            )
+        self.servers_db = Database(self.servers_db_path)
+        # Registered after the writer thread has been started, so that pending submissions are let through before
+        # the writer thread is stopped at exit
+        self._background_submission_executor = concurrent.futures.ThreadPoolExecutor(1)
+        atexit.register(self._background_submission_executor.shutdown)
+        self.servers_db.execute(
             '''CREATE TABLE IF NOT EXISTS servers(
                 server_id INTEGER NOT NULL PRIMARY KEY,
                 log_channel_id INTEGER
             )'''
         )
-        self.servers_db.commit()
-        self.load_all_server_dbs()
+        # Kept in memory from now on, as servers are only ever added through register_servers
+        self.known_server_ids = {
+            server['server_id'] for server in self.servers_db.fetch_all('SELECT server_id FROM servers')
+        }
 
     def is_server_known(self, server_id: int) -> bool:
         """Returns whether the specified server is known."""
-        return bool(server_id in self.load_servers_list())
+        return server_id in self.known_server_ids
 
     def load_servers_list(self) -> list:
-        """Loads IDs of all known servers from the servers database."""
-        self.servers_db_cursor.execute(
-            'SELECT server_id FROM servers'
-        )
-        self.servers['ids'] = [int(server['server_id']) for server in self.servers_db_cursor.fetchall()]
-        return self.servers['ids']
+        """Returns IDs of all known servers."""
+        return list(self.known_server_ids)
 
-    def load_server(self, server_id: int, load_own_db: bool = False) -> dict:
-        """Loads the specified server."""
-        if not self.is_server_known(server_id):
-            self.servers_db_cursor.execute(
-                'INSERT INTO servers(server_id) VALUES(?)',
-                (server_id,)
+    def register_servers(self, server_ids: Iterable[int]):
+        """Makes sure that the specified servers are known, adding the unknown ones with a single statement."""
+        unknown_server_ids = {server_id for server_id in server_ids if server_id not in self.known_server_ids}
+        if unknown_server_ids:
+            self.servers_db.execute_many(
+                'INSERT OR IGNORE INTO servers(server_id) VALUES(?)',
+                [(server_id,) for server_id in unknown_server_ids]
             )
-            self.servers_db.commit()
+            self.known_server_ids.update(unknown_server_ids)
 
-        self.servers[server_id] = {}
-        self.servers_db_cursor.execute(
-            'SELECT * FROM servers WHERE server_id = ?',
-            (server_id,)
-        )
-        self.servers[server_id].update(self.dict_from_row(self.servers_db_cursor.fetchone()))
+    def load_server(self, server_id: int, load_own_db: bool = False) -> dict:
+        """Loads the specified server, registering it first if it's unknown."""
+        if server_id not in self.servers:
+            self.register_servers((server_id,))
+            self.servers[server_id] = self.dict_from_row(self.servers_db.fetch_one(
+                'SELECT * FROM servers WHERE server_id = ?',
+                (server_id,)
+            ))
 
         if load_own_db:
-            self.load_own_server_db(server_id)
+            self.storage.get_server_db(server_id)
 
         return self.servers[server_id]
 
     def load_own_server_db(self, server_id: int) -> dict:
-        """Load the specified server's own database."""
-        server_db_path = os.path.join(somsiad.storage_dir_path, f'server_{server_id}.db')
-
-        self.servers[server_id]['db'] = sqlite3.connect(server_db_path)
-        self.servers[server_id]['db'].row_factory = sqlite3.Row
-        self.servers[server_id]['db_cursor'] = self.servers[server_id]['db'].cursor()
-        self.servers[server_id]['db_cursor'].execute(
-            'PRAGMA foreign_keys = ON'
-        )
-        self.servers[server_id]['db'].commit()
-        self.servers[server_id]['db_cursor'].execute(
-            'SELECT name FROM sqlite_master WHERE type = "table"'
+        """Load the database holding the specified server's data, depending on the storage in use."""
+        return self.load_server(server_id, load_own_db=True)
+
+    def load_all_server_dbs(self) -> dict:
+        """Loads all known servers with a single query. Their databases are still only opened on first use."""
+        for server in self.servers_db.fetch_all('SELECT * FROM servers'):
+            self.servers[server['server_id']] = self.dict_from_row(server)
+        return self.servers
+
+    def lease_server_db(self, server_id: int) -> ContextManager[Database]:
+        """Provides the database holding the specified server's data, opening it if it isn't open,
+        and keeps it from being closed until the block is left.
+        Since databases may be shared between servers, queries must always be limited to the server's ID.
+        """
+        return self.storage.lease_server_db(server_id)
+
+    def get_server_db(self, server_id: int) -> Database:
+        """Returns the database holding the specified server's data, opening it if it isn't open.
+        Databases may be closed when they haven't been used for a while, so they shouldn't be held onto,
+        and using them for longer than it takes to queue a write is better done with lease_server_db.
+        """
+        return self.storage.get_server_db(server_id)
+
+    async def get_server_db_async(self, server_id: int) -> Database:
+        """Returns the database holding the specified server's data, opening it in a thread if it isn't open."""
+        return await Database.run_in_read_executor(self.get_server_db, server_id)
+
+    def read(self, server_id: int, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Calls the function with a read connection to the specified server's database and returns its result."""
+        with self.lease_server_db(server_id) as database:
+            return database.read(function)
+
+    def submit(self, server_id: int, function: Callable[[sqlite3.Connection], Any]) -> concurrent.futures.Future:
+        """Queues the function to be called within a transaction on the specified server's database.
+        Returns a future which is resolved with the function's result once the transaction has been committed.
+        The database doesn't have to stay leased until then, as closing it commits writes queued before.
+        """
+        with self.lease_server_db(server_id) as database:
+            return database.submit(function)
+
+    def submit_in_background(self, server_id: int, function: Callable[[sqlite3.Connection], Any]):
+        """Queues the function to be called within a transaction on the specified server's database
+        without waiting for it, not even for the database to be opened, which may take a while. This makes it safe
+        to use from coroutines. Databases are resolved in a single thread, so that writes are queued in order.
+        """
+        self._background_submission_executor.submit(self._submit_in_background, server_id, function)
+
+    def _submit_in_background(self, server_id: int, function: Callable[[sqlite3.Connection], Any]):
+        try:
+            with self.lease_server_db(server_id) as database:
+                database.submit(function, in_background=True)
+        except Exception as e:
+            somsiad.logger.error(f'Background database write failed: {e}')
+
+    def execute_in_background(self, server_id: int, sql: str, parameters: Sequence = ()):
+        """Queues the statement on the specified server's database without waiting for it."""
+        self.submit_in_background(server_id, lambda connection: connection.execute(sql, parameters).rowcount)
+
+    def execute_many_in_background(self, server_id: int, sql: str, parameters_sequence: Sequence[Sequence]):
+        """Queues the statement for every set of parameters on the specified server's database
+        without waiting for it.
+        """
+        self.submit_in_background(
+            server_id, lambda connection: connection.executemany(sql, parameters_sequence).rowcount
         )
 
-        # tables = [table['name'] for table in self.servers[server_id]['db_cursor'].fetchall()]
+    async def read_async(self, server_id: int, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Calls the function with a read connection to the specified server's database in a thread
+        and returns its result.
+        """
+        return await Database.run_in_read_executor(self.read, server_id, function)
 
-        # for table in tables:
-        #     self.servers[server_id][table] = {}
-        #     self.servers[server_id]['db_cursor'].execute(
-        #         f'SELECT * FROM {table}'
-        #     )
-        #     rows = [self.dict_from_row(row) for row in self.servers[server_id]['db_cursor'].fetchall()]
-        #     self.servers[server_id][table] = rows
+    async def fetch_one_async(self, server_id: int, sql: str, parameters: Sequence = ()) -> Optional[sqlite3.Row]:
+        """Returns the first row of the query's results in the specified server's database,
+        or None if there are none.
+        """
+        return await self.read_async(server_id, lambda connection: connection.execute(sql, parameters).fetchone())
 
-        return self.servers[server_id]
+    async def fetch_all_async(self, server_id: int, sql: str, parameters: Sequence = ()) -> List[sqlite3.Row]:
+        """Returns all rows of the query's results in the specified server's database."""
+        return await self.read_async(server_id, lambda connection: connection.execute(sql, parameters).fetchall())
 
-    def load_all_server_dbs(self) -> dict:
-        """Loads all known servers."""
-        for server_id in self.load_servers_list():
-            self.load_server(server_id)
-        return self.servers
+    async def transaction_async(self, server_id: int, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Calls the function within a transaction on the specified server's database and waits for the commit."""
+        return await asyncio.wrap_future(await Database.run_in_read_executor(self.submit, server_id, function))
+
+    async def execute_async(self, server_id: int, sql: str, parameters: Sequence = ()) -> int:
+        """Executes the statement on the specified server's database and waits for the commit.
+        Returns the number of affected rows.
+        """
+        return await self.transaction_async(server_id, lambda connection: connection.execute(sql, parameters).rowcount)
+
+    def evict_idle_server_dbs(self) -> int:
+        """Closes server databases which haven't been used for a while. Returns the number of closed databases."""
+        return self.storage.evict_idle_dbs()
+
+    def get_server_db_metrics(self) -> Dict[str, int]:
+        """Returns the number of open server databases and how many times they were used while open (hits),
+        had to be opened (misses) and were closed to save resources (evictions).
+        """
+        return self.storage.get_metrics()
+
+    async def evict_idle_server_dbs_continuously(self):
+        """Periodically closes server databases which haven't been used for a while."""
+        while True:
+            await asyncio.sleep(self.IDLE_SERVER_DB_EVICTION_INTERVAL_IN_SECONDS)
+            evicted_db_count = await asyncio.get_event_loop().run_in_executor(None, self.evict_idle_server_dbs)
+            if evicted_db_count:
+                somsiad.logger.info(
+                    f'Closed {evicted_db_count} idle server databases. '
+                    f'Server database metrics: {self.get_server_db_metrics()}'
+                )
+
+    def start_evicting_idle_server_dbs(self):
+        if self.idle_server_db_eviction is None:
+            self.idle_server_db_eviction = asyncio.ensure_future(self.evict_idle_server_dbs_continuously())
+
+    def register_table(
+            self, table_name: str, table_columns: Union[List[str], Tuple[str]],
+            indexes: Dict[str, Union[List[str], Tuple[str]]] = None, *, primary_key_scope: str = 'server'
+    ):
+        """Registers a table, along with its indexes, that databases holding server data should contain.
+        Meant to be called once per table on startup. Tables are created as databases are opened,
+        so that using them later doesn't take any extra statements.
+        Column server_id is added to every table. By default it is made part of the primary key,
+        unless the primary key is unique across servers on its own - either "global", like Discord IDs of messages,
+        or "generated" by the database, like IDs of rows.
+        Later changes to the table belong in migrations.
+        """
+        if primary_key_scope not in ('server', 'global', 'generated'):
+            raise ValueError(f'unknown primary key scope "{primary_key_scope}"')
+        self.primary_key_scopes[table_name] = primary_key_scope
+        if primary_key_scope != 'server':
+            table_columns = ('server_id INTEGER NOT NULL', *table_columns)
+        else:
+            primary_key_column_names = [
+                table_column.split()[0] for table_column in table_columns if ' PRIMARY KEY' in table_column
+            ]
+            table_columns = (
+                'server_id INTEGER NOT NULL',
+                *(table_column.replace(' PRIMARY KEY', '') for table_column in table_columns),
+                f'PRIMARY KEY({", ".join(("server_id", *primary_key_column_names))})'
+            )
+        self.table_schemas[table_name] = table_columns
+        if indexes is not None:
+            for index_name, index_columns in indexes.items():
+                self.index_schemas[index_name] = (table_name, tuple(index_columns))
+        self._migrate_open_dbs()
 
-    def ensure_table_existence_for_server(
-            self, server_id: int, table_name: str, table_columns: Union[List[str], Tuple[str]]
+    def register_migration(
+            self, component: str, version: int, migration: Union[str, Callable[[sqlite3.Connection], Any]]
     ):
-        """Ensures that a table with the provided name exists in the database assigned to the server.
-        If no such table exists, it is created with provided column specs.
+        """Registers a migration of the component's tables, which is either an SQL script
+        or a function taking a connection. Versions of a component start at 1 and each database
+        records the last one applied in table schema_version, so every migration runs once per database,
+        after the registered tables have been created.
+        """
+        if version < 1:
+            raise ValueError('migration versions start at 1')
+        if version in self.migrations.get(component, {}):
+            raise ValueError(f'migration {version} of {component} is already registered')
+        self.migrations.setdefault(component, {})[version] = migration
+        self._migrate_open_dbs()
+
+    @staticmethod
+    def _split_script(script: str) -> List[str]:
+        """Splits the SQL script into statements. Semicolons only end a statement if SQLite deems it complete,
+        so ones in string literals, comments and bodies of triggers are kept in place.
+        """
+        statements = []
+        statement = ''
+        for part in script.split(';'):
+            statement += part
+            if sqlite3.complete_statement(statement + ';'):
+                if statement.strip():
+                    statements.append(statement + ';')
+                statement = ''
+            else:
+                statement += ';'
+        # What's left is an incomplete statement, with a semicolon the script doesn't have at the end
+        if statement[:-1].strip():
+            statements.append(statement[:-1])
+        return statements
+
+    def _migrate_open_dbs(self):
+        for server_id, database in self.storage.get_open_dbs():
+            database.transaction(functools.partial(self.migrate, server_id=server_id))
+
+    def _get_pending_migrations(
+            self, connection: sqlite3.Connection
+    ) -> List[Tuple[str, int, Union[str, Callable[[sqlite3.Connection], Any]]]]:
+        """Returns migrations not applied to the database yet, in order of application."""
+        applied_versions = {
+            row[0]: row[1] for row in connection.execute('SELECT component, version FROM schema_version')
+        }
+        return [
+            (component, version, migration)
+            for component, migrations in sorted(self.migrations.items())
+            for version, migration in sorted(migrations.items())
+            if version > applied_versions.get(component, 0)
+        ]
+
+    def _add_server_id_to_table(self, connection: sqlite3.Connection, table_name: str, server_id: Optional[int]):
+        """Rebuilds a table created before server IDs were stored in tables, with column server_id
+        filled with the ID of the server that the database belongs to. Columns added by migrations are kept.
         """
-        self.load_server(server_id, load_own_db=True)
-        self.servers[server_id]['db_cursor'].execute(
-            f'CREATE TABLE IF NOT EXISTS {table_name}({", ".join(table_columns)})'
+        if server_id is None:
+            raise ValueError(f'table {table_name} has no server IDs and the server it belongs to is unknown')
+        legacy_columns = connection.execute(f'PRAGMA table_info({table_name})').fetchall()
+        legacy_index_statements = [
+            row[1] for row in connection.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (table_name,)
+            ) if row[0] not in self.index_schemas
+        ]
+        column_names = []
+        column_specs = ['server_id INTEGER NOT NULL']
+        for _, column_name, column_type, is_not_null, default_value, _ in legacy_columns:
+            column_names.append(column_name)
+            column_specs.append(
+                f'{column_name} {column_type}{" NOT NULL" if is_not_null else ""}'
+                f'{"" if default_value is None else f" DEFAULT {default_value}"}'
+            )
+        # The last field of a column's info is its position in the primary key, or 0 if it's not part of it
+        primary_key_column_names = [
+            column[1] for column in sorted(legacy_columns, key=lambda column: column[5]) if column[5]
+        ]
+        if primary_key_column_names:
+            if self.primary_key_scopes[table_name] == 'server':
+                primary_key_column_names.insert(0, 'server_id')
+            column_specs.append(f'PRIMARY KEY({", ".join(primary_key_column_names)})')
+        connection.execute(f'ALTER TABLE {table_name} RENAME TO {table_name}_legacy')
+        connection.execute(f'CREATE TABLE {table_name}({", ".join(column_specs)})')
+        connection.execute(
+            f'INSERT INTO {table_name}(server_id, {", ".join(column_names)}) '
+            f'SELECT ?, {", ".join(column_names)} FROM {table_name}_legacy',
+            (server_id,)
         )
-        self.servers[server_id]['db'].commit()
-        self.load_server(server_id, load_own_db=True)
+        connection.execute(f'DROP TABLE {table_name}_legacy')
+        for legacy_index_statement in legacy_index_statements:
+            connection.execute(legacy_index_statement)
+
+    def migrate(self, connection: sqlite3.Connection, server_id: int = None) -> List[Tuple[str, int]]:
+        """Creates registered tables and indexes which don't exist in the database yet and then applies
+        pending migrations. Meant to be run in a transaction. The ID of the server is required for databases
+        belonging to a single server. Returns components and versions of applied migrations.
+        """
+        connection.execute(f'CREATE TABLE IF NOT EXISTS schema_version({", ".join(self.SCHEMA_VERSION_TABLE_COLUMNS)})')
+        for table_name, table_columns in self.table_schemas.items():
+            existing_column_names = [row[1] for row in connection.execute(f'PRAGMA table_info({table_name})')]
+            if existing_column_names and 'server_id' not in existing_column_names:
+                self._add_server_id_to_table(connection, table_name, server_id)
+            else:
+                connection.execute(f'CREATE TABLE IF NOT EXISTS {table_name}({", ".join(table_columns)})')
+        for index_name, (table_name, index_columns) in self.index_schemas.items():
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({", ".join(index_columns)})')
+
+        applied_migrations = []
+        for component, version, migration in self._get_pending_migrations(connection):
+            if callable(migration):
+                migration(connection)
+            else:
+                # executescript() would commit the transaction, so statements are run one by one
+                for statement in self._split_script(migration):
+                    connection.execute(statement)
+            connection.execute(
+                'INSERT OR REPLACE INTO schema_version(component, version) VALUES(?, ?)',
+                (component, version)
+            )
+            applied_migrations.append((component, version))
+        return applied_migrations
+
+    def migrate_db_file(self, path: str, server_id: Optional[int], dry_run: bool) -> dict:
+        """Migrates the database file over its own connection.
+        In a dry run, the migrations are rolled back after being applied, so they are still checked for errors.
+        """
+        result = {'server_id': server_id, 'applied_migrations': [], 'duration_in_seconds': None, 'error': None}
+        start_time = time.perf_counter()
+        connection = sqlite3.connect(path, isolation_level=None)
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                result['applied_migrations'] = self.migrate(connection, server_id)
+            except (sqlite3.Error, ValueError) as error:
+                connection.execute('ROLLBACK')
+                result['error'] = str(error)
+            else:
+                connection.execute('ROLLBACK' if dry_run else 'COMMIT')
+        finally:
+            connection.close()
+        result['duration_in_seconds'] = time.perf_counter() - start_time
+        return result
+
+    def migrate_all_server_dbs(self, *, dry_run: bool = False, thread_count: int = None) -> List[dict]:
+        """Applies pending migrations to databases holding server data, in parallel where there are many.
+        Meant to be run on startup, before server databases are used. Returns a result per migrated database.
+        """
+        return self.storage.migrate(dry_run=dry_run, thread_count=thread_count)
+
+    def copy_server_dbs_to_shared_db(self) -> List[dict]:
+        """Copies data of all known servers from their own database files into the servers database,
+        for switching from per-server to shared storage. The files are migrated first and left untouched otherwise.
+        Rows already present in the servers database are skipped, so the copy can be safely repeated.
+        Generated primary keys are generated anew, so tables with them are only copied if the server
+        doesn't have any rows in them in the servers database yet. Returns a result per copied database.
+        """
+        per_server_storage = PerServerStorage(self)
+        migration_results = per_server_storage.migrate()
+        migration_results += SharedStorage(self).migrate()
+        copy_results = [
+            {
+                'server_id': result['server_id'], 'copied_row_count': 0, 'duration_in_seconds': None,
+                'error': result['error']
+            } for result in migration_results if result['error'] is not None
+        ]
+        if copy_results:
+            return copy_results
+        server_ids = [
+            server_id for server_id in self.load_servers_list()
+            if os.path.isfile(per_server_storage.get_db_path(server_id))
+        ]
+        connection = sqlite3.connect(self.servers_db_path, isolation_level=None)
+        try:
+            for server_id in server_ids:
+                copy_result = {
+                    'server_id': server_id, 'copied_row_count': 0, 'duration_in_seconds': None, 'error': None
+                }
+                start_time = time.perf_counter()
+                connection.execute('ATTACH DATABASE ? AS server_db', (per_server_storage.get_db_path(server_id),))
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    for table_name in self.table_schemas:
+                        # The last field of a column's info is its position in the primary key
+                        is_primary_key_generated = self.primary_key_scopes[table_name] == 'generated'
+                        column_names = ', '.join(
+                            row[1] for row in connection.execute(f'PRAGMA server_db.table_info({table_name})')
+                            if not (is_primary_key_generated and row[5])
+                        )
+                        if is_primary_key_generated and connection.execute(
+                                f'SELECT 1 FROM main.{table_name} WHERE server_id = ? LIMIT 1',
+                                (server_id,)
+                        ).fetchone():
+                            continue
+                        copy_result['copied_row_count'] += connection.execute(
+                            f'INSERT OR IGNORE INTO main.{table_name}({column_names}) '
+                            f'SELECT {column_names} FROM server_db.{table_name}'
+                        ).rowcount
+                    connection.execute('COMMIT')
+                except sqlite3.Error as error:
+                    connection.execute('ROLLBACK')
+                    copy_result['copied_row_count'] = 0
+                    copy_result['error'] = str(error)
+                finally:
+                    connection.execute('DETACH DATABASE server_db')
+                copy_result['duration_in_seconds'] = time.perf_counter() - start_time
+                copy_results.append(copy_result)
+        finally:
+            connection.close()
+        return copy_results
 
     def set_log_channel(self, server_id: int, log_channel_id):
         """Sets the log channel for the specified server."""
         self.load_server(server_id)
-        self.servers_db_cursor.execute(
+        self.servers_db.execute(
             'UPDATE servers SET log_channel_id = ? WHERE server_id = ?',
             (log_channel_id, server_id)
         )
-        self.servers_db.commit()
-        self.load_server(server_id)
+        self.servers[server_id]['log_channel_id'] = log_channel_id
+
+    async def set_log_channel_async(self, server_id: int, log_channel_id):
+        await asyncio.get_event_loop().run_in_executor(None, self.set_log_channel, server_id, log_channel_id)
 
     def get_log_channels(self) -> dict:
-        self.servers_db_cursor.execute(
-            'SELECT server_id, log_channel_id FROM servers WHERE log_channel_id IS NOT NULL'
+        return [
+            self.dict_from_row(server) for server in
+            self.servers_db.fetch_all('SELECT server_id, log_channel_id FROM servers WHERE log_channel_id IS NOT NULL')
+        ]
+
+
+class CounterService:
+    """Keeps counters, such as the number of times a member has done something on a server, in a table of
+    server databases. Increments are only accumulated in memory and written behind, once per flush interval
+    and on exit, with a single transaction per database, so that frequent increments don't each cost a commit.
+    Reads use read connections and add increments which haven't been committed yet to what has been,
+    so they always include every increment made so far.
+    """
+    FLUSH_INTERVAL_IN_SECONDS = 10
+
+    class Flush:
+        """Increments taken out of memory by a flush which hasn't completed yet."""
+        __slots__ = 'deltas', 'is_written', 'completion'
+
+        def __init__(self):
+            self.deltas = {}
+            self.is_written = False
+            self.completion = concurrent.futures.Future()
+
+    _services = []
+    _services_lock = threading.Lock()
+    _continuous_flushing = None
+
+    def __init__(self, table_name: str, key_columns: Sequence[str], count_column: str):
+        """Sets up a counter service for the table, which must have been registered with the server data manager,
+        where counters are identified by the server ID and values of the key columns.
+        """
+        self.table_name = table_name
+        self.key_columns = tuple(key_columns)
+        self.count_column = count_column
+        self._key_condition = ' AND '.join(f'{column} = ?' for column in self.key_columns)
+        self._pending_deltas = {}
+        # Flushes which have taken increments out of memory but haven't completed yet, by server ID
+        self._flushes = {}
+        # Numbers of flushes written so far, by server ID, for reads to tell whether one may have been committed
+        self._written_flush_counts = {}
+        self._pending_deltas_lock = threading.Lock()
+        with self._services_lock:
+            if not self._services:
+                # Registered after the writer thread's own exit handler, so that it runs before it
+                atexit.register(self.flush_all)
+            self._services.append(self)
+
+    def increment(self, server_id: int, key: Sequence, amount: int = 1):
+        """Increments the counter by the amount. This only touches memory, the increment is written later."""
+        key = tuple(key)
+        with self._pending_deltas_lock:
+            server_deltas = self._pending_deltas.setdefault(server_id, {})
+            server_deltas[key] = server_deltas.get(key, 0) + amount
+
+    @staticmethod
+    def _add_deltas(deltas: Dict[tuple, int], added_deltas: Dict[tuple, int]):
+        for key, delta in added_deltas.items():
+            deltas[key] = deltas.get(key, 0) + delta
+
+    def _fetch_count(self, connection: sqlite3.Connection, server_id: int, key: tuple) -> int:
+        row = connection.execute(
+            f'SELECT {self.count_column} FROM {self.table_name} WHERE server_id = ? AND {self._key_condition}',
+            (server_id, *key)
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def _write_deltas(self, connection: sqlite3.Connection, server_id: int, deltas: Dict[tuple, int]):
+        for key, delta in deltas.items():
+            if not connection.execute(
+                    f'''UPDATE {self.table_name} SET {self.count_column} = {self.count_column} + ?
+                    WHERE server_id = ? AND {self._key_condition}''',
+                    (delta, server_id, *key)
+            ).rowcount:
+                connection.execute(
+                    f'''INSERT INTO {self.table_name}(server_id, {", ".join(self.key_columns)}, {self.count_column})
+                    VALUES ({", ".join("?" * (len(self.key_columns) + 2))})''',
+                    (server_id, *key, delta)
+                )
+
+    def _submit_flush(self, server_id: int) -> concurrent.futures.Future:
+        """Queues writing the server's pending increments. They are taken out of memory by the writer thread itself
+        and kept with the flush until it's completed, when they are either forgotten, as they have been committed,
+        or put back, as writing them has failed. Both happen at once, so that reads never see increments neither
+        in memory nor in the database. Once a flush has been written, it may be committed at any moment,
+        so reads wait for it to complete instead of guessing whether they see it.
+        """
+        flush = self.Flush()
+
+        def write_flush(connection):
+            with self._pending_deltas_lock:
+                flush.deltas = self._pending_deltas.pop(server_id, {})
+                self._flushes.setdefault(server_id, []).append(flush)
+            self._write_deltas(connection, server_id, flush.deltas)
+            with self._pending_deltas_lock:
+                flush.is_written = True
+                self._written_flush_counts[server_id] = self._written_flush_counts.get(server_id, 0) + 1
+
+        def complete_flush(future: concurrent.futures.Future):
+            with self._pending_deltas_lock:
+                server_flushes = self._flushes.get(server_id, [])
+                if flush in server_flushes:
+                    server_flushes.remove(flush)
+                    if not server_flushes:
+                        del self._flushes[server_id]
+                if future.cancelled() or future.exception() is not None:
+                    self._add_deltas(self._pending_deltas.setdefault(server_id, {}), flush.deltas)
+            flush.completion.set_result(None)
+
+        future = server_data_manager.submit(server_id, write_flush)
+        future.add_done_callback(complete_flush)
+        return future
+
+    def flush(self, *, wait: bool = True) -> List[concurrent.futures.Future]:
+        """Writes pending increments of every server, waiting for the commit unless told not to."""
+        with self._pending_deltas_lock:
+            server_ids = list(self._pending_deltas)
+        futures = [self._submit_flush(server_id) for server_id in server_ids]
+        if wait:
+            concurrent.futures.wait(futures)
+        return futures
+
+    @classmethod
+    def flush_all(cls):
+        """Writes pending increments of all counter services and waits for the commits."""
+        with cls._services_lock:
+            services = list(cls._services)
+        for service in services:
+            service.flush()
+
+    @classmethod
+    async def flush_all_continuously(cls):
+        """Periodically writes pending increments of all counter services."""
+        while True:
+            await asyncio.sleep(cls.FLUSH_INTERVAL_IN_SECONDS)
+            await asyncio.get_event_loop().run_in_executor(None, cls.flush_all)
+
+    @classmethod
+    def start_flushing_continuously(cls):
+        if cls._continuous_flushing is None:
+            cls._continuous_flushing = asyncio.ensure_future(cls.flush_all_continuously())
+
+    async def _read(self, server_id: int, function: Callable[[sqlite3.Connection, Dict[tuple, int]], Any]) -> Any:
+        """Calls the function with a read connection, within a single read transaction, and the server's increments
+        which haven't been committed, waiting for flushes which may be being committed to complete first.
+        Increments are copied before the transaction's snapshot is taken, so if a flush has been written
+        in the meantime, it may be in both, and the read is tried again once the flush has completed.
+        """
+        def read(connection):
+            with self._pending_deltas_lock:
+                server_flushes = self._flushes.get(server_id, [])
+                written_flush_completions = [flush.completion for flush in server_flushes if flush.is_written]
+                if written_flush_completions:
+                    return False, None, written_flush_completions
+                deltas = dict(self._pending_deltas.get(server_id, {}))
+                for flush in server_flushes:
+                    self._add_deltas(deltas, flush.deltas)
+                written_flush_count = self._written_flush_counts.get(server_id, 0)
+            connection.execute('BEGIN')
+            try:
+                # The snapshot is taken by the transaction's first read
+                connection.execute(f'SELECT 1 FROM {self.table_name} LIMIT 1').fetchall()
+                with self._pending_deltas_lock:
+                    if self._written_flush_counts.get(server_id, 0) != written_flush_count:
+                        return False, None, [
+                            flush.completion for flush in self._flushes.get(server_id, []) if flush.is_written
+                        ]
+                return True, function(connection, deltas), []
+            finally:
+                connection.execute('COMMIT')
+
+        while True:
+            is_read, result, written_flush_completions = await server_data_manager.read_async(server_id, read)
+            if is_read:
+                return result
+            if written_flush_completions:
+                await asyncio.wait([asyncio.wrap_future(completion) for completion in written_flush_completions])
+
+    async def get(self, server_id: int, key: Sequence) -> int:
+        """Returns the value of the counter, including pending increments."""
+        key = tuple(key)
+        return await self._read(
+            server_id, lambda connection, deltas: self._fetch_count(connection, server_id, key) + deltas.get(key, 0)
         )
-        return [self.dict_from_row(server) for server in self.servers_db_cursor.fetchall()]
+
+    async def get_total(self, server_id: int) -> int:
+        """Returns the sum of all of the server's counters, including pending increments."""
+        def get_total(connection, deltas):
+            total = connection.execute(
+                f'SELECT SUM({self.count_column}) FROM {self.table_name} WHERE server_id = ?',
+                (server_id,)
+            ).fetchone()[0]
+            return (total or 0) + sum(deltas.values())
+
+        return await self._read(server_id, get_total)
+
+    async def get_top(self, server_id: int, limit: int) -> List[dict]:
+        """Returns up to limit of the server's counters with the highest values, including pending increments,
+        as dictionaries of key columns and the count column.
+        """
+        def get_top(connection, deltas):
+            # Only counters with pending increments can overtake the ones which are on top in the table
+            counts = {
+                tuple(row)[:-1]: row[-1] for row in connection.execute(
+                    f'''SELECT {", ".join(self.key_columns)}, {self.count_column} FROM {self.table_name}
+                    WHERE server_id = ? ORDER BY {self.count_column} DESC LIMIT ?''',
+                    (server_id, limit + len(deltas))
+                )
+            }
+            for key, delta in deltas.items():
+                counts[key] = (counts[key] if key in counts else self._fetch_count(connection, server_id, key)) + delta
+            top_counts = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [dict(zip((*self.key_columns, self.count_column), (*key, count))) for key, count in top_counts]
+
+        return await self._read(server_id, get_top)
 
 
 server_data_manager = ServerDataManager()
 
 
+def migrate_server_dbs(*, dry_run: bool = False, verbose: bool = False) -> List[dict]:
+    """Applies pending migrations to databases of all known servers and prints a summary."""
+    start_time = time.perf_counter()
+    results = server_data_manager.migrate_all_server_dbs(dry_run=dry_run)
+    migrated_results = [result for result in results if result['applied_migrations'] and result['error'] is None]
+    for result in results:
+        if result['server_id'] is None:
+            db_description, db_description_pl = 'the servers database', 'wspólnej bazy danych'
+        else:
+            db_description = f'database of server {result["server_id"]}'
+            db_description_pl = f'bazy danych serwera {result["server_id"]}'
+        if result['error'] is not None:
+            somsiad.logger.error(f'Migrating {db_description} failed: "{result["error"]}"')
+            print(f'Migracja {db_description_pl} nie powiodła się: {result["error"]}')
+        elif verbose and result['applied_migrations']:
+            applied_migrations = ', '.join(
+                f'{component} {version}' for component, version in result['applied_migrations']
+            )
+            print(f'Migracja {db_description_pl}: {applied_migrations} ({result["duration_in_seconds"]:.3f} s)')
+    if migrated_results or verbose:
+        print(
+            f'{"Próbnie zmigrowano" if dry_run else "Zmigrowano"} {len(migrated_results)} z {len(results)} '
+            f'baz danych serwerów w {time.perf_counter() - start_time:.3f} s'
+        )
+    return results
+
+
+@somsiad.bot.listen()
+async def on_ready():
+    await asyncio.get_event_loop().run_in_executor(
+        None, server_data_manager.register_servers, [server.id for server in somsiad.bot.guilds]
+    )
+    server_data_manager.start_evicting_idle_server_dbs()
+    CounterService.start_flushing_continuously()
+
+
+@somsiad.bot.listen()
+async def on_guild_join(server):
+    await asyncio.get_event_loop().run_in_executor(None, server_data_manager.register_servers, [server.id])
+
+
 @somsiad.bot.command(aliases=['loguj'])
 @discord.ext.commands.cooldown(
     1, somsiad.conf['command_cooldown_per_user_in_seconds'], discord.ext.commands.BucketType.user
@@ -159,7 +1244,7 @@ async def do_log(ctx, channel: discord.TextChannel = None):
     if channel is None:
         channel = ctx.channel
 
-    server_data_manager.set_log_channel(ctx.guild.id, channel.id)
+    await server_data_manager.set_log_channel_async(ctx.guild.id, channel.id)
     embed = discord.Embed(
         title=f':white_check_mark: Ustawiono #{channel} jako kanał logów',
         color=somsiad.color
@@ -175,7 +1260,7 @@ async def do_log(ctx, channel: discord.TextChannel = None):
 @discord.ext.commands.has_permissions(administrator=True)
 async def do_not_log(ctx):
     """Unsets the bot's log channel for the server."""
-    server_data_manager.set_log_channel(ctx.guild.id, None)
+    await server_data_manager.set_log_channel_async(ctx.guild.id, None)
     embed = discord.Embed(
         title=f':white_check_mark: Wyłączono logi na tym serwerze',
         color=somsiad.color
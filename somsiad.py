@@ -51,6 +51,11 @@ class Somsiad:
             'command_cooldown_per_user_in_seconds', description='Cooldown wywołania komendy przez użytkownika',
             input_instruction='Wprowadź cooldown wywołania komendy przez użytkownika w sekundach',
             unit=('sekunda', 'sekund'), value_type='float', default_value=1.0
+        ),
+        Setting(
+            'server_data_storage', description='Przechowywanie danych serwerów',
+            input_instruction='Wprowadź sposób przechowywania danych serwerów: per_server (osobny plik bazy danych '
+            'dla każdego serwera) lub shared (wspólna baza danych)', value_type='str', default_value='per_server'
         )
     ]
 
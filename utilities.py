@@ -15,9 +15,10 @@ import locale
 import re
 import json
 import os
+import heapq
 import datetime as dt
 from numbers import Number
-from typing import Union, Dict
+from typing import Union, Dict, Iterable, Callable, List, Any
 
 
 class TextFormatter:
@@ -179,6 +180,16 @@ class TextFormatter:
         return '\n'.join(info_block)
 
 
+class Leaderboard:
+    """Top N lists of in-memory aggregates."""
+    @staticmethod
+    def top(entries: Iterable[Any], limit: int, key: Callable[[Any], Number]) -> List[Any]:
+        """Returns up to limit entries with the highest keys, highest first.
+        Keeps a heap of limit entries instead of sorting all of them.
+        """
+        return heapq.nlargest(limit, entries, key=key)
+
+
 class Configurator:
     """Handles bot configuration."""
     def __init__(self, configuration_file_path: str, required_settings: tuple = None):